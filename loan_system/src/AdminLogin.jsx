@@ -1,6 +1,6 @@
 // src/AdminLogin.jsx
 import React, { useEffect, useState } from "react";
-import api from "./api";
+import { loginUser } from "./api";
 
 const AdminLogin = ({ onAdminLogin }) => {
   const [username, setUsername] = useState("");
@@ -9,19 +9,6 @@ const AdminLogin = ({ onAdminLogin }) => {
 
   
   useEffect(() => {
-    const fetchCSRF = async () => {
-      try {
-        const res = await api.get("/csrf/");
-        const token = res.data.csrfToken;
-        api.defaults.headers.post["X-CSRFToken"] = token;
-        console.log("CSRF token set:", token);
-      } catch (err) {
-        console.error("Failed to fetch CSRF token:", err);
-      }
-    };
-
-    fetchCSRF();
-
     const storedUser = JSON.parse(localStorage.getItem("currentUser"));
     if (storedUser && (storedUser.is_admin || storedUser.is_superuser || storedUser.is_staff)) {
       onAdminLogin(storedUser);
@@ -33,7 +20,7 @@ const AdminLogin = ({ onAdminLogin }) => {
     setError("");
 
     try {
-      const res = await api.post("/login/", { username, password });
+      const res = await loginUser(username, password);
       const user = res.data.user;
 
       if (user && (user.is_superuser || user.is_staff || user.is_admin)) {
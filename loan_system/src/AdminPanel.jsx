@@ -3,22 +3,19 @@ import api from "./api";
 const isValidNationalId = (id) => /^\d{20}$/.test(id);
 const isValidPhone = (phone) => /^\+255\d{9}$/.test(phone);
 
-const loanTypes = {
-  home: { rate: 0.052, max: 50000000, term: 36 },
-  car: { rate: 0.045, max: 20000000, term: 24 },
-  education: { rate: 0.038, max: 1000000, term: 48 },
-  business: { rate: 0.065, max: 100000000, term: 60 },
-};
-
 const AdminPanel = ({ state, setState, showNotification }) => {
   const [applications, setApplications] = useState([]);
   const [selectedApp, setSelectedApp] = useState(null);
+  const [selected, setSelected] = useState(new Set());
+  // Riskiest first (scores are precomputed server-side; unscored loans are left out)
+  const [rankByRisk, setRankByRisk] = useState(false);
 
  
   const fetchApplications = async () => {
     try {
-      const res = await api.get("/loans/?status=pending");
-      setApplications(res.data);
+      const ordering = rankByRisk ? "&ordering=-risk_score" : "";
+      const res = await api.get(`/loans/?status=pending${ordering}`);
+      setApplications(res.data.results);
     } catch (err) {
       console.error("Fetch applications error:", err);
       showNotification("Failed to fetch applications", "error");
@@ -27,77 +24,94 @@ const AdminPanel = ({ state, setState, showNotification }) => {
 
   useEffect(() => {
     fetchApplications();
-  }, []);
+  }, [rankByRisk]);
+
+
+  // One request for any number of decisions; changed rows leave the queue
+  const decide = async (apps, status) => {
+    const res = await api.post("/loans/decisions/", {
+      decisions: apps.map((app) => ({ id: app.id, status })),
+    });
+    const changed = new Set(res.data.map((loan) => loan.id));
+    setApplications((current) => current.filter((app) => !changed.has(app.id)));
+    setSelected((current) => new Set([...current].filter((id) => !changed.has(id))));
+    return res.data.length;
+  };
 
 
-  const handleApprove = async (app) => {
+  const handleDecision = async (apps, status) => {
+    const label = status === "approved" ? "approve" : "reject";
     try {
-      const loanTypeKey = app.loanType || "home";
-      const loanDetails = loanTypes[loanTypeKey];
-      const requestedAmount = app.requestedAmount || 0;
-      const approvedAmount = Math.min(requestedAmount, loanDetails.max);
-      const interestRate = loanDetails.rate * 100;
-      const monthlyRate = loanDetails.rate / 12;
-
-      const monthlyPayment = Math.max(
-        100000,
-        (approvedAmount * monthlyRate * Math.pow(1 + monthlyRate, loanDetails.term)) /
-          (Math.pow(1 + monthlyRate, loanDetails.term) - 1)
-      ).toFixed(2);
-
-      const totalPayable = monthlyPayment * loanDetails.term;
-
-      const payload = {
-        status: "approved",
-        approvedAmount,
-        interestRate,
-        monthlyPayment: parseFloat(monthlyPayment),
-        totalPayable: parseFloat(totalPayable),
-        remainingBalance: parseFloat(totalPayable),
-        amountPaid: 0,
-        term: loanDetails.term,
-      };
-
-      await api.patch(`/loans/${app.id}/`, payload);
-      showNotification("Application approved!", "success");
-      fetchApplications();
+      // Amounts, rate, term and the schedule are computed by the server
+      const count = await decide(apps, status);
+      showNotification(`${count} application(s) ${status}!`, "success");
     } catch (err) {
-      console.error("Approve error:", err);
-      showNotification("Failed to approve application", "error");
+      console.error(`${label} error:`, err);
+      showNotification(`Failed to ${label} application(s)`, "error");
     }
   };
 
+  const handleApprove = (app) => handleDecision([app], "approved");
+  const handleReject = (app) => handleDecision([app], "rejected");
+  const selectedApps = () => applications.filter((app) => selected.has(app.id));
+
+  const toggleSelected = (id) =>
+    setSelected((current) => {
+      const next = new Set(current);
+      next.has(id) ? next.delete(id) : next.add(id);
+      return next;
+    });
 
-  const handleReject = async (app) => {
+  const toggleAll = () =>
+    setSelected(selected.size === applications.length ? new Set() : new Set(applications.map((app) => app.id)));
+
+ 
+  // The detail carries the sponsor's exposure across all their active loans
+  const viewSponsorDetails = async (app) => {
+    setSelectedApp(app);
     try {
-      await api.patch(`/loans/${app.id}/`, { status: "rejected" });
-      showNotification("Application rejected!", "success");
-      fetchApplications();
+      const res = await api.get(`/loans/${app.id}/`);
+      setSelectedApp({ ...app, sponsorExposure: res.data.sponsor_exposure });
     } catch (err) {
-      console.error("Reject error:", err);
-      showNotification("Failed to reject application", "error");
+      console.error("Fetch sponsor exposure error:", err);
     }
   };
 
  
-  const viewSponsorDetails = (app) => setSelectedApp(app);
-
- 
   return (
     <div className="admin-box">
       <h2>Admin Panel</h2>
 
+      <label>
+        <input type="checkbox" checked={rankByRisk} onChange={(e) => setRankByRisk(e.target.checked)} /> Rank by risk
+      </label>
+
       {applications.length === 0 && <p>No pending applications</p>}
 
+      {applications.length > 0 && (
+        <div className="admin-actions">
+          <button disabled={!selected.size} onClick={() => handleDecision(selectedApps(), "approved")}>
+            Approve selected ({selected.size})
+          </button>
+          <button disabled={!selected.size} onClick={() => handleDecision(selectedApps(), "rejected")}>
+            Reject selected ({selected.size})
+          </button>
+        </div>
+      )}
+
       {applications.length > 0 && (
         <table border="1" cellPadding="8" style={{ width: "100%", borderCollapse: "collapse" }}>
           <thead>
             <tr style={{ backgroundColor: "#f2f2f2" }}>
+              <th>
+                <input type="checkbox" checked={selected.size === applications.length} onChange={toggleAll} />
+              </th>
               <th>Name</th>
               <th>National ID</th>
               <th>Phone Number</th>
               <th>Loan Type</th>
               <th>Requested Amount</th>
+              <th>Risk</th>
               <th>Status</th>
               <th>Actions</th>
             </tr>
@@ -105,6 +119,9 @@ const AdminPanel = ({ state, setState, showNotification }) => {
           <tbody>
             {applications.map((app) => (
               <tr key={app.id}>
+                <td>
+                  <input type="checkbox" checked={selected.has(app.id)} onChange={() => toggleSelected(app.id)} />
+                </td>
                 <td>{app.name || app.username || "N/A"}</td>
                 <td>
                   {app.nationalId || "N/A"}{" "}
@@ -124,6 +141,7 @@ const AdminPanel = ({ state, setState, showNotification }) => {
                 </td>
                 <td>{app.loanType || "N/A"}</td>
                 <td>${(app.requestedAmount ?? 0).toLocaleString()}</td>
+                <td>{app.risk_score == null ? "—" : Math.round(app.risk_score)}</td>
                 <td>{app.status || "pending"}</td>
                 <td>
                   <div className="admin-actions">
@@ -169,6 +187,13 @@ const AdminPanel = ({ state, setState, showNotification }) => {
           <p>
             <strong>Email:</strong> {selectedApp.sponsorEmail || "N/A"}
           </p>
+          {selectedApp.sponsorExposure && (
+            <p>
+              <strong>Guarantees:</strong> {selectedApp.sponsorExposure.active_loans} active loan(s), $
+              {Number(selectedApp.sponsorExposure.outstanding_total).toLocaleString()} outstanding of $
+              {Number(selectedApp.sponsorExposure.approved_total).toLocaleString()} approved
+            </p>
+          )}
           <p>
             <strong>Photo:</strong>
             <br />
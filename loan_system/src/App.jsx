@@ -11,7 +11,7 @@ import Dashboard from "./Dashboard";
 import Repayment from "./Repayment";
 import Notification from "./Notification";
 import Contract from "./Contract";
-import api from "./api"; 
+import api, { getTokens, logoutUser, refreshTokens } from "./api";
 import "./App.css";
 
 function App() {
@@ -42,16 +42,6 @@ function App() {
   
   useEffect(() => {
     const init = async () => {
-      
-      try {
-        const res = await api.get("/csrf/");
-        api.defaults.headers.post["X-CSRFToken"] = res.data.csrfToken;
-        console.log("CSRF token set:", res.data.csrfToken);
-      } catch (err) {
-        console.error("Failed to fetch CSRF token:", err);
-      }
-
-      
       const savedUser = localStorage.getItem("currentUser");
       if (savedUser) {
         const user = JSON.parse(savedUser);
@@ -73,6 +63,7 @@ function App() {
 
   
   const handleLogout = () => {
+    logoutUser();
     setState((prev) => ({ ...prev, currentUser: null, isAdmin: false }));
     localStorage.removeItem("currentUser");
     setPage("home");
@@ -86,7 +77,7 @@ function App() {
     const fetchLoans = async () => {
       try {
         const res = await api.get("loans/");
-        setState((prev) => ({ ...prev, applications: res.data }));
+        setState((prev) => ({ ...prev, applications: res.data.results }));
       } catch (err) {
         console.error("Error fetching loans:", err);
         showNotification("Error fetching loans", "error");
@@ -95,6 +86,63 @@ function App() {
     fetchLoans();
   }, [state.currentUser]);
 
+  // Live updates: the server pushes status changes and payments, so only
+  // the affected loan is refetched instead of polling the whole list
+  useEffect(() => {
+    if (!state.currentUser) return;
+
+    const refreshLoan = async (id) => {
+      try {
+        const res = await api.get(`loans/${id}/`);
+        setState((prev) => {
+          const known = prev.applications.some((app) => app.id === id);
+          return {
+            ...prev,
+            applications: known
+              ? prev.applications.map((app) => (app.id === id ? res.data : app))
+              : [res.data, ...prev.applications],
+          };
+        });
+      } catch (err) {
+        console.error("Error refreshing loan:", err);
+      }
+    };
+
+    // EventSource cannot send an Authorization header: the access token
+    // goes in the URL and is only checked when the stream opens
+    let source = null;
+    let closed = false;
+    const open = () => {
+      const tokens = getTokens();
+      const query = tokens ? `?access_token=${encodeURIComponent(tokens.access)}` : "";
+      source = new EventSource(`${api.defaults.baseURL}/events/${query}`, { withCredentials: true });
+      source.addEventListener("loan.status", (e) => {
+        const event = JSON.parse(e.data);
+        refreshLoan(event.loan);
+        if (event.previous) {
+          showNotification(`Loan #${event.loan} is now ${event.status}`, event.status === "approved" ? "success" : "error");
+        }
+      });
+      source.addEventListener("payment", (e) => {
+        const event = JSON.parse(e.data);
+        refreshLoan(event.loan);
+        showNotification(`Payment of ${event.amount} received on loan #${event.loan}`, "success");
+      });
+      source.onerror = () => {
+        // Refused (e.g. the access token expired): the browser gives up, so reconnect
+        if (source.readyState !== EventSource.CLOSED || !getTokens()) return;
+        refreshTokens()
+          .then(() => setTimeout(() => !closed && open(), 1000))
+          .catch(() => {});
+      };
+    };
+    open();
+    return () => {
+      closed = true;
+      source.close();
+    };
+  }, [state.currentUser]);
+
   
   useEffect(() => {
     if (!state.isAdmin) return;
@@ -1,40 +1,26 @@
 // ApplyLoan.jsx
-import { useState, useEffect } from "react";
-import api from "./api";
+import { useState } from "react";
+import api, { setTokens } from "./api";
 
 export default function ApplyLoan({ state, setState, showNotification, setPage }) {
   const [step, setStep] = useState(1);
   const [preview, setPreview] = useState(null);
   const [sponsorPreview, setSponsorPreview] = useState(null);
+  const [photoFiles, setPhotoFiles] = useState({});
   const [isSubmitting, setIsSubmitting] = useState(false);
-  const [csrfToken, setCsrfToken] = useState("");
-
- 
-  useEffect(() => {
-    api.get("csrf/")
-      .then(res => setCsrfToken(res.data.csrfToken))
-      .catch(err => console.error(err));
-  }, []);
-
-  const fileToBase64 = (file, callback) => {
-    const reader = new FileReader();
-    reader.onloadend = () => callback(reader.result);
-    reader.readAsDataURL(file);
-  };
 
+  // Photos are sent as multipart file parts; previews use object URLs
   const handleFileChange = (e) => {
     const file = e.target.files[0];
     if (!file) return;
 
-    fileToBase64(file, (base64) => {
-      if (e.target.name === "profile_photo") {
-        setPreview(base64);
-        setState(prev => ({ ...prev, tempApplicant: { ...prev.tempApplicant, profile_photo: base64 } }));
-      } else if (e.target.name === "sponsor_photo") {
-        setSponsorPreview(base64);
-        setState(prev => ({ ...prev, tempApplicant: { ...prev.tempApplicant, sponsor_photo: base64 } }));
-      }
-    });
+    const url = URL.createObjectURL(file);
+    setPhotoFiles(prev => ({ ...prev, [e.target.name]: file }));
+    if (e.target.name === "profile_photo") {
+      setPreview(url);
+    } else if (e.target.name === "sponsor_photo") {
+      setSponsorPreview(url);
+    }
   };
 
   const handleApplicantSave = (e) => {
@@ -47,13 +33,12 @@ export default function ApplyLoan({ state, setState, showNotification, setPage }
     if (!/^\+255\d{9}$/.test(data.phone)) return showNotification("Invalid phone number", "error");
     if (data.password !== data.confirm_password) return showNotification("Passwords do not match", "error");
 
-    setState(prev => ({ ...prev, tempApplicant: { ...data, profile_photo: preview } }));
+    setState(prev => ({ ...prev, tempApplicant: data }));
     setStep(2);
   };
 
   const handleSponsorSubmit = async (e) => {
     e.preventDefault();
-    if (!csrfToken) return showNotification("CSRF token missing", "error");
 
     const form = new FormData(e.target);
     const data = Object.fromEntries(form.entries());
@@ -69,7 +54,7 @@ export default function ApplyLoan({ state, setState, showNotification, setPage }
       const last_name = rest.join(" ");
 
       
-     const payload = {
+      const fields = {
         username: state.tempApplicant.username,
         password: state.tempApplicant.password,
         email: state.tempApplicant.email,
@@ -78,26 +63,30 @@ export default function ApplyLoan({ state, setState, showNotification, setPage }
         phone: state.tempApplicant.phone,
         address: state.tempApplicant.address,
         national_id: state.tempApplicant.national_id,
-        profile_photo: preview,
         loan_type: state.tempApplicant.loan_type,
-        requested_amount: parseFloat(state.tempApplicant.requested_amount),
-        assets_value: parseFloat(state.tempApplicant.assets_value),
-        monthly_income: parseFloat(state.tempApplicant.monthly_income),
+        requested_amount: state.tempApplicant.requested_amount,
+        assets_value: state.tempApplicant.assets_value,
+        monthly_income: state.tempApplicant.monthly_income,
         sponsor_name: data.sponsor_name,
         sponsor_address: data.sponsor_address,
         sponsor_national_id: data.sponsor_national_id,
         sponsor_phone: data.sponsor_phone,
         sponsor_email: data.sponsor_email,
-        sponsor_photo: sponsorPreview,
       };
 
+      const payload = new FormData();
+      Object.entries(fields).forEach(([key, value]) => payload.append(key, value));
+      payload.append("profile_photo", photoFiles.profile_photo);
+      payload.append("sponsor_photo", photoFiles.sponsor_photo);
+
       const response = await api.post("register-apply/", payload, {
-        headers: { "X-CSRFToken": csrfToken }
+        headers: { "Content-Type": "multipart/form-data" }
       });
 
       if (response.status === 201) {
         const newUser = response.data.user;
         const newLoan = response.data.loan_application;
+        setTokens(response.data.tokens);
 
         showNotification("Application submitted successfully!", "success");
 
@@ -110,6 +99,7 @@ export default function ApplyLoan({ state, setState, showNotification, setPage }
         setStep(1);
         setPreview(null);
         setSponsorPreview(null);
+        setPhotoFiles({});
         setPage("dashboard");
       }
     } catch (err) {
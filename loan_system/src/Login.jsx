@@ -1,5 +1,5 @@
 import React, { useState } from "react";
-import api from "./api";
+import { loginUser } from "./api";
 
 const Login = ({ state, setState, setPage, showNotification }) => {
   const [username, setUsername] = useState("");
@@ -9,7 +9,7 @@ const Login = ({ state, setState, setPage, showNotification }) => {
   const handleLogin = async (e) => {
     e.preventDefault();
     try {
-      const response = await api.post("login/", { username, password });
+      const response = await loginUser(username, password);
 
       if (response.status === 200) {
         setState({ ...state, currentUser: username });
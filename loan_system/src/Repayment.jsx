@@ -1,9 +1,10 @@
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
 import api from "./api"; 
 
 const Repayment = ({ state, setState, showNotification }) => {
   const [paymentInfo, setPaymentInfo] = useState({ phone: "", amount: "" });
   const [error, setError] = useState("");
+  const [history, setHistory] = useState({ rows: [], next: null });
 
   
   const loans = state.applications.filter(
@@ -12,6 +13,24 @@ const Repayment = ({ state, setState, showNotification }) => {
       loan.applicant === state.currentUser.id &&
       loan.remainingBalance > 0
   );
+  const loanId = loans[0]?.id;
+
+  // Newest first, a page at a time; running balances are computed server-side
+  const fetchHistory = async (url, append = false) => {
+    try {
+      const res = await api.get(url);
+      setHistory((current) => ({
+        rows: append ? [...current.rows, ...res.data.results] : res.data.results,
+        next: res.data.next,
+      }));
+    } catch (err) {
+      console.error("Fetch payment history error:", err);
+    }
+  };
+
+  useEffect(() => {
+    if (loanId) fetchHistory(`/loans/${loanId}/payments/?profile=summary`);
+  }, [loanId]);
 
   const handleChange = (e) => {
     const { name, value } = e.target;
@@ -71,6 +90,7 @@ const Repayment = ({ state, setState, showNotification }) => {
       });
 
       setState({ ...state, applications: updatedApplications });
+      fetchHistory(`/loans/${loan.id}/payments/?profile=summary`);
       setPaymentInfo({ phone: "", amount: "" });
       setError("");
       showNotification(
@@ -144,6 +164,31 @@ const Repayment = ({ state, setState, showNotification }) => {
         />
         <button type="submit">Pay</button>
       </form>
+
+      {history.rows.length > 0 && (
+        <div className="payment-history">
+          <h3>Payment History</h3>
+          <table>
+            <thead>
+              <tr>
+                <th>Date</th>
+                <th>Amount</th>
+                <th>Balance After</th>
+              </tr>
+            </thead>
+            <tbody>
+              {history.rows.map((row) => (
+                <tr key={row.id}>
+                  <td>{new Date(row.date).toLocaleDateString()}</td>
+                  <td>${Number(row.amount).toLocaleString()}</td>
+                  <td>${Number(row.balance).toLocaleString()}</td>
+                </tr>
+              ))}
+            </tbody>
+          </table>
+          {history.next && <button onClick={() => fetchHistory(history.next, true)}>Load more</button>}
+        </div>
+      )}
     </div>
   );
 };
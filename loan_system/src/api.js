@@ -24,8 +24,55 @@ export function getCookie(name) {
 }
 
 
+// Bearer tokens (POST /token/): no session lookup on the server and no
+// CSRF round trip. The access token is short-lived and refreshed on a 401.
+const TOKENS_KEY = "tokens";
+
+export function getTokens() {
+  const saved = localStorage.getItem(TOKENS_KEY);
+  return saved ? JSON.parse(saved) : null;
+}
+
+export function setTokens(tokens) {
+  if (tokens) {
+    localStorage.setItem(TOKENS_KEY, JSON.stringify({ access: tokens.access, refresh: tokens.refresh }));
+  } else {
+    localStorage.removeItem(TOKENS_KEY);
+  }
+}
+
+let refreshing = null;
+
+export function refreshTokens() {
+  // Concurrent 401s share one refresh: a refresh token only works once
+  if (!refreshing) {
+    const tokens = getTokens();
+    refreshing = (tokens
+      ? axios.post(`${api.defaults.baseURL}/token/refresh/`, { refresh: tokens.refresh })
+      : Promise.reject(new Error("Not logged in"))
+    )
+      .then((res) => {
+        setTokens(res.data);
+        return res.data;
+      })
+      .catch((err) => {
+        setTokens(null);
+        throw err;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+}
+
 api.interceptors.request.use(
   (config) => {
+    const tokens = getTokens();
+    if (tokens) {
+      config.headers["Authorization"] = `Bearer ${tokens.access}`;
+      return config;
+    }
     const csrfToken = getCookie("csrftoken");
     if (csrfToken && ["post", "put", "patch", "delete"].includes(config.method?.toLowerCase())) {
       config.headers["X-CSRFToken"] = csrfToken;
@@ -39,7 +86,18 @@ api.interceptors.request.use(
 
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const config = error.config;
+    if (error.response?.status === 401 && config?.headers?.Authorization && !config._retried) {
+      config._retried = true;
+      try {
+        const tokens = await refreshTokens();
+        config.headers["Authorization"] = `Bearer ${tokens.access}`;
+        return api(config);
+      } catch (refreshError) {
+        console.error("⚠️ Session expired, please log in again");
+      }
+    }
     if (error.response) {
       const status = error.response.status;
       if (status === 401) {
@@ -72,9 +130,6 @@ async function fetchCsrfToken() {
 }
 
 
-fetchCsrfToken();
-
-
 export async function safeApiCall(requestFn) {
   try {
     return await requestFn();
@@ -91,9 +146,18 @@ export async function safeApiCall(requestFn) {
 
 
 export async function loginUser(username, password) {
-  return safeApiCall(() =>
-    api.post("/login/", { username, password })
-  );
+  const res = await api.post("/token/", { username, password });
+  setTokens(res.data);
+  return res;
+}
+
+
+export async function logoutUser() {
+  const tokens = getTokens();
+  setTokens(null);
+  if (tokens) {
+    await api.post("/token/revoke/", { refresh: tokens.refresh }).catch(() => {});
+  }
 }
 
 
@@ -0,0 +1,97 @@
+# loan_system_end/database.py
+"""
+DATABASES built from the environment.
+
+    DB_ENGINE          sqlite (default) or postgresql
+    DB_NAME            SQLite file path / database name
+    DB_USER, DB_PASSWORD, DB_HOST, DB_PORT   server databases
+    DB_CONN_MAX_AGE    seconds a connection is kept open (default 60)
+    DB_REPLICA_HOST    adds a 'replica' alias (same credentials) used by
+                       loans.routers for list/export/analytics reads
+    SQLITE_WAL         1 for WAL + tuned pragmas, 0 for stock SQLite; defaults
+                       to 1 when DB_NAME is set and to 0 for the checked-in
+                       db.sqlite3 (WAL mode is written into the file header)
+    SQLITE_READ_ALIAS  1 to add a read-only 'replica' alias on the SQLite file
+"""
+import os
+
+REPLICA = 'replica'
+
+# Applied on every new SQLite connection. WAL lets readers and the single
+# writer run at the same time; NORMAL sync is durable against app crashes
+# (only an OS crash can lose the last commits); mmap serves reads from
+# the page cache; busy_timeout makes writers queue instead of failing
+# with "database is locked".
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY',
+]
+
+
+def env_flag(name, default):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+def sqlite_database(path, wal=True, read_only=False, conn_max_age=60):
+    options = {}
+    if wal:
+        options = {'init_command': ';'.join(SQLITE_PRAGMAS), 'timeout': 5}
+        if not read_only:
+            # Take the write lock at BEGIN, so two transactions that both
+            # read then write can't deadlock into "database is locked"
+            options['transaction_mode'] = 'IMMEDIATE'
+    database = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{path}?mode=ro' if read_only else path,
+        'CONN_MAX_AGE': conn_max_age,
+        'OPTIONS': options,
+    }
+    if read_only:
+        database['TEST'] = {'MIRROR': 'default'}
+    return database
+
+
+def server_database(engine, host, conn_max_age=60):
+    return {
+        'ENGINE': f'django.db.backends.{engine}',
+        'NAME': os.environ.get('DB_NAME', 'loan_system'),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': host,
+        'PORT': os.environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+
+def use_databases(databases):
+    """Point the ORM at `databases` (benchmarks; this thread's connections are closed)."""
+    from django.db import connections
+
+    for alias in list(connections.settings):
+        connections[alias].close()
+        del connections[alias]
+    connections.__dict__['settings'] = connections.configure_settings(databases)
+
+
+def databases_from_env(base_dir):
+    engine = os.environ.get('DB_ENGINE', 'sqlite')
+    conn_max_age = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+    if engine == 'sqlite':
+        path = os.environ.get('DB_NAME')
+        wal = env_flag('SQLITE_WAL', '1' if path else '0')
+        path = path or str(base_dir / 'db.sqlite3')
+        databases = {'default': sqlite_database(path, wal=wal, conn_max_age=conn_max_age)}
+        if env_flag('SQLITE_READ_ALIAS', '0'):
+            databases[REPLICA] = sqlite_database(path, wal=wal, read_only=True, conn_max_age=conn_max_age)
+        return databases
+
+    databases = {'default': server_database(engine, os.environ.get('DB_HOST', ''), conn_max_age)}
+    if os.environ.get('DB_REPLICA_HOST'):
+        databases[REPLICA] = server_database(engine, os.environ['DB_REPLICA_HOST'], conn_max_age)
+        databases[REPLICA]['TEST'] = {'MIRROR': 'default'}
+    return databases
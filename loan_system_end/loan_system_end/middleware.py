@@ -1,4 +1,20 @@
 # loan_system_end/middleware.py
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+request_logger = logging.getLogger('loan_system_end.requests')
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
 class CorsMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -12,4 +28,157 @@ class CorsMiddleware:
         response['Access-Control-Allow-Headers'] = 'Content-Type, X-CSRFToken, Authorization'
         response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
         
-        return response
\ No newline at end of file
+        return response
+
+
+# ==================== REQUEST INSTRUMENTATION ====================
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    """Counters collected for a single request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.timers = {}
+        self._depth = {}
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection; charges the current request."""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.execute_wrapper(execute, sql, params, many, context)
+
+
+def install_query_counter(connection, **kwargs):
+    # Connections are per thread, and async views query from
+    # sync_to_async threads; the ContextVar follows the request there
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+connection_created.connect(install_query_counter)
+
+
+def current_metrics():
+    """Return the RequestMetrics of the request being handled, if any."""
+    return _current_metrics.get()
+
+
+@contextmanager
+def track(name):
+    """Charge the wrapped block to a named timer of the current request.
+
+    Nested blocks with the same name are only counted once.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    metrics._depth[name] = metrics._depth.get(name, 0) + 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._depth[name] -= 1
+        if not metrics._depth[name]:
+            metrics.timers[name] = metrics.timers.get(name, 0.0) + time.perf_counter() - start
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record query count, SQL time, serializer time and response size for
+    every request. The numbers are exposed as a Server-Timing header and
+    logged as one JSON line on the ``loan_system_end.requests`` logger.
+
+    ``REQUEST_QUERY_BUDGETS`` maps ``"METHOD url-name"`` (or a bare URL
+    name, for any method) to the maximum number of queries a request may
+    run; going over is logged, and raises
+    QueryBudgetExceeded when ``QUERY_BUDGET_STRICT`` is on (tests).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @contextmanager
+    def instrument(self):
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        try:
+            yield metrics
+        finally:
+            _current_metrics.reset(token)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Connections opened before this module was imported
+        for connection in connections.all():
+            install_query_counter(connection)
+        start = time.perf_counter()
+        with self.instrument() as metrics:
+            response = self.get_response(request)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with self.instrument() as metrics:
+            response = await self.get_response(request)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    def finish(self, request, response, metrics, total):
+        response_bytes = None if response.streaming else len(response.content)
+        response['Server-Timing'] = self.server_timing(metrics, total)
+        response['X-Query-Count'] = str(metrics.queries)
+
+        view_name = getattr(request.resolver_match, 'view_name', None)
+        request_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'sql_ms': round(metrics.sql_time * 1000, 2),
+            'serialize_ms': round(metrics.timers.get('serialize', 0.0) * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'response_bytes': response_bytes,
+        }))
+
+        self.check_budget(request.method, view_name, metrics.queries)
+        return response
+
+    @staticmethod
+    def server_timing(metrics, total):
+        parts = [f'db;dur={metrics.sql_time * 1000:.2f};desc="{metrics.queries} queries"']
+        for name, elapsed in metrics.timers.items():
+            parts.append(f'{name};dur={elapsed * 1000:.2f}')
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+    @staticmethod
+    def check_budget(method, view_name, queries):
+        budgets = getattr(settings, 'REQUEST_QUERY_BUDGETS', {})
+        budget = budgets.get(f'{method} {view_name}', budgets.get(view_name))
+        if budget is None or queries <= budget:
+            return
+        message = f"{method} {view_name} ran {queries} queries (budget {budget})"
+        request_logger.warning(message)
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
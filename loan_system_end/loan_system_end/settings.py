@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
 
+from loan_system_end.database import databases_from_env
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = 'django-insecure-your-secret-key-here'
@@ -23,6 +25,7 @@ INSTALLED_APPS = [
 # ==================== MIDDLEWARE ====================
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # MUST be first
+    'loan_system_end.middleware.QueryInstrumentationMiddleware',  # query count / Server-Timing
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,12 +57,11 @@ TEMPLATES = [
 WSGI_APPLICATION = 'loan_system_end.wsgi.application'
 
 # ==================== DATABASE ====================
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# Configured from DB_* / SQLITE_* environment variables, see database.py.
+# Defaults to the checked-in db.sqlite3 with persistent connections; WAL
+# mode is on by default once DB_NAME points at a deployment's own file.
+DATABASES = databases_from_env(BASE_DIR)
+DATABASE_ROUTERS = ['loans.routers.ReplicaRouter']
 
 # ==================== AUTH PASSWORD VALIDATORS ====================
 AUTH_PASSWORD_VALIDATORS = [
@@ -69,6 +71,16 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
+# Password hashing runs on a bounded pool (loans/hashing.py), which is also
+# where authenticate() checks passwords. Running + queued hashes are capped
+# at half of SERVER_THREADS (the request threads the server runs, e.g.
+# gunicorn --threads); a login beyond that gets a 503 right away, so a
+# burst never takes every thread.
+AUTHENTICATION_BACKENDS = ['loans.hashing.PooledModelBackend']
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 32))
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1))
+PASSWORD_HASHING_QUEUE = max(SERVER_THREADS // 2 - PASSWORD_HASHING_WORKERS, 0)
+
 # ==================== LANGUAGE & TIME ====================
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -80,18 +92,97 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# ==================== UPLOADS ====================
+MAX_IMAGE_UPLOAD_SIZE = 5 * 1024 * 1024          # per image
+MAX_MULTIPART_BODY_SIZE = 12 * 1024 * 1024       # whole multipart request
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024         # larger parts spool to a temp file
+
+# Thumbnails are generated after commit on a small thread pool (loans/media.py)
+IMAGE_PROCESSING_WORKERS = 2
+IMAGE_PROCESSING_SYNC = False
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'loans.User'
 
+# ==================== CACHE ====================
+# Local memory is per process; set REDIS_URL to share the response cache
+# (and its invalidation) across workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'loan-system',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = 300
+
+# ==================== LIVE EVENTS ====================
+# /api/events/ streams fan out in-process; with a Redis URL every worker
+# relays the same channel, so streams see writes from all workers.
+EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL') or os.environ.get('REDIS_URL')
+EVENTS_KEEPALIVE = 15  # seconds between keepalive comments on idle streams
+
+# ==================== API TOKENS ====================
+# Signed bearer tokens (loans/tokens.py): access tokens are checked without
+# a query; revoked sessions are remembered per process for a few seconds.
+ACCESS_TOKEN_LIFETIME = 300               # seconds
+REFRESH_TOKEN_LIFETIME = 14 * 24 * 3600   # seconds
+TOKEN_REVOCATION_CACHE_SIZE = 10000
+TOKEN_REVOCATION_CACHE_SECONDS = 30
+
 # ==================== DRF ====================
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'loans.authentication.AccessTokenAuthentication',  # Authorization: Bearer
         'rest_framework.authentication.SessionAuthentication',  # ✅ Session + CSRF
         'rest_framework.authentication.BasicAuthentication',    # Optional for testing
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # orjson-backed, same bytes as DRF's JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'loans.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'loans.uploads.ImageMultiPartParser',  # streamed image parts with limits
+        'rest_framework.parsers.FormParser',
+    ],
+}
+
+# ==================== INSTRUMENTATION ====================
+# Max queries per request, keyed by "METHOD url-name" or bare URL name
+# (see QueryInstrumentationMiddleware)
+REQUEST_QUERY_BUDGETS = {
+    'GET loanapplication-list': 5,
+    'GET loanapplication-detail': 5,
+    'GET payment-list': 5,
+    'GET payment-detail': 5,
+    'POST payment-list': 13,
+}
+QUERY_BUDGET_STRICT = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'loan_system_end.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
 }
 
 # ==================== CORS & CSRF ====================
@@ -100,7 +191,7 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",
 ]
 CORS_ALLOW_CREDENTIALS = True
-CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken']
+CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken', 'Server-Timing', 'X-Query-Count', 'ETag', 'Last-Modified']
 
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:5173",
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import User, LoanApplication, Payment
+from .models import User, LoanApplication, Installment, Payment, PortfolioSummary, SponsorExposure, TokenSession
+from .tokens import revoke_sessions
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -9,8 +10,38 @@ class UserAdmin(admin.ModelAdmin):
 class LoanApplicationAdmin(admin.ModelAdmin):
     list_display = ['applicant', 'loan_type', 'requested_amount', 'status', 'created_at']
     list_filter = ['status', 'loan_type', 'created_at']
+    list_select_related = ['applicant']
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ['loan', 'amount', 'phone', 'date']
-    list_filter = ['date']
\ No newline at end of file
+    list_filter = ['date']
+    list_select_related = ['loan__applicant']
+
+@admin.register(Installment)
+class InstallmentAdmin(admin.ModelAdmin):
+    list_display = ['loan', 'number', 'due_date', 'principal', 'interest', 'balance']
+    list_filter = ['due_date']
+    list_select_related = ['loan__applicant']
+
+@admin.register(PortfolioSummary)
+class PortfolioSummaryAdmin(admin.ModelAdmin):
+    list_display = ['month', 'status', 'loan_type', 'loan_count', 'requested_total', 'outstanding_total']
+    list_filter = ['status', 'loan_type']
+
+@admin.register(SponsorExposure)
+class SponsorExposureAdmin(admin.ModelAdmin):
+    list_display = ['sponsor_national_id', 'active_loans', 'approved_total', 'outstanding_total']
+    search_fields = ['=sponsor_national_id']
+    ordering = ['-outstanding_total']
+
+@admin.register(TokenSession)
+class TokenSessionAdmin(admin.ModelAdmin):
+    list_display = ['user', 'created_at', 'expires_at', 'revoked_at', 'generation']
+    list_filter = ['revoked_at']
+    list_select_related = ['user']
+    actions = ['revoke']
+
+    @admin.action(description="Revoke selected API sessions")
+    def revoke(self, request, queryset):
+        self.message_user(request, f"Revoked {revoke_sessions(queryset.filter(revoked_at=None))} session(s).")
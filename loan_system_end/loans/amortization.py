@@ -0,0 +1,257 @@
+# loans/amortization.py
+"""
+Server-side amortization: monthly payment, full installment schedules and
+the approval / rescheduling paths that store them as Installment rows.
+"""
+import calendar
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate
+from .events import loan_status_event, publish
+from .models import LoanApplication, Installment
+from .summary import SUMMARY_FIELDS, loan_values, record_loan_changes
+
+CENT = Decimal('0.01')
+
+# Same product table the admin panel used to apply in the browser:
+# annual rate (percent), maximum approved amount, term in months.
+LOAN_TERMS = {
+    'home': (Decimal('5.2'), Decimal('50000000'), 36),
+    'car': (Decimal('4.5'), Decimal('20000000'), 24),
+    'education': (Decimal('3.8'), Decimal('1000000'), 48),
+    'business': (Decimal('6.5'), Decimal('100000000'), 60),
+}
+
+# Highest annual rate (percent) an approval or reschedule may set
+MAX_INTEREST_RATE = 100
+
+# Floor on the monthly installment; small loans are paid off early
+MIN_MONTHLY_PAYMENT = Decimal('100000')
+
+ScheduleRow = namedtuple('ScheduleRow', 'number due_date principal interest balance')
+
+
+def _cents(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def add_months(start, months):
+    """Return `start` shifted by `months`, clamping to the month's last day."""
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def monthly_payment(principal, annual_rate, term):
+    """Level monthly installment for `principal` at `annual_rate` percent."""
+    principal = Decimal(principal)
+    rate = Decimal(str(annual_rate)) / 1200
+    if rate == 0:
+        payment = principal / term
+    else:
+        growth = (1 + rate) ** term
+        payment = principal * rate * growth / (growth - 1)
+    return _cents(max(payment, min(MIN_MONTHLY_PAYMENT, principal)))
+
+
+def build_schedule(principal, annual_rate, term, start):
+    """
+    Return the list of ScheduleRow for a loan starting on `start`.
+
+    Interest is charged on the running balance and rounded to cents each
+    month; the last installment absorbs the rounding remainder.
+    """
+    principal = _cents(Decimal(principal))
+    rate = Decimal(str(annual_rate)) / 1200
+    payment = monthly_payment(principal, annual_rate, term)
+
+    rows = []
+    balance = principal
+    for number in range(1, term + 1):
+        interest = _cents(balance * rate)
+        paid_principal = payment - interest
+        if number == term or paid_principal >= balance:
+            paid_principal = balance
+        balance -= paid_principal
+        rows.append(ScheduleRow(number, add_months(start, number), paid_principal, interest, balance))
+        if not balance:
+            break
+    return rows
+
+
+def schedule_total(rows):
+    return sum((row.principal + row.interest for row in rows), Decimal('0'))
+
+
+def _installments(loan, rows):
+    return [
+        Installment(
+            loan_id=loan.id,
+            number=row.number,
+            due_date=row.due_date,
+            principal=row.principal,
+            interest=row.interest,
+            balance=row.balance,
+        )
+        for row in rows
+    ]
+
+
+# ===== Approval =====
+def approval_terms(loan, approved_amount=None, interest_rate=None, term=None):
+    """Fill in missing approval figures from the product table."""
+    default_rate, max_amount, default_term = LOAN_TERMS[loan.loan_type]
+    if approved_amount is None:
+        approved_amount = min(loan.requested_amount, max_amount)
+    return (
+        Decimal(approved_amount),
+        interest_rate if interest_rate is not None else float(default_rate),
+        term or default_term,
+    )
+
+
+APPROVAL_FIELDS = [
+    'status', 'approved_at', 'approved_amount', 'interest_rate', 'term',
+    'monthly_payment', 'remaining_balance',
+]
+
+
+def _set_approved(loan, approved_amount, interest_rate, term, approved_at):
+    """Fill in the approval figures of `loan` (unsaved); return its schedule."""
+    approved_amount, interest_rate, term = approval_terms(loan, approved_amount, interest_rate, term)
+    rows = build_schedule(approved_amount, interest_rate, term, timezone.localdate(approved_at))
+
+    loan.status = 'approved'
+    loan.approved_at = approved_at
+    loan.approved_amount = approved_amount
+    loan.interest_rate = interest_rate
+    loan.term = term
+    loan.monthly_payment = monthly_payment(approved_amount, interest_rate, term)
+    loan.remaining_balance = schedule_total(rows) - loan.amount_paid
+    return rows
+
+
+@transaction.atomic
+def approve_loan(loan, approved_amount=None, interest_rate=None, term=None):
+    """Approve `loan`, computing its payment figures and storing its schedule."""
+    rows = _set_approved(loan, approved_amount, interest_rate, term, timezone.now())
+    loan.save(update_fields=APPROVAL_FIELDS)
+
+    Installment.objects.filter(loan_id=loan.id).delete()
+    Installment.objects.bulk_create(_installments(loan, rows))
+    return loan
+
+
+# ===== Batch decisions =====
+class DecisionError(Exception):
+    """Some decisions of a batch can't be applied; ``errors`` maps loan id to reason."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def decide_loans(decisions, batch_size=500):
+    """
+    Approve or reject many pending loans in one transaction.
+
+    `decisions` are dicts with ``id``, ``status`` ('approved' / 'rejected')
+    and optional ``approved_amount``, ``interest_rate`` and ``term``. The
+    batch is all-or-nothing: any unknown or non-pending loan raises
+    DecisionError before anything is written. Returns the changed loans.
+    """
+    with transaction.atomic():
+        ids = [decision['id'] for decision in decisions]
+        loans = LoanApplication.objects.select_for_update().in_bulk(ids)
+
+        errors = {}
+        for loan_id in ids:
+            loan = loans.get(loan_id)
+            if loan is None:
+                errors[loan_id] = 'Loan not found'
+            elif loan.status != 'pending':
+                errors[loan_id] = f'Loan is {loan.status}, not pending'
+        if errors:
+            raise DecisionError(errors)
+
+        now = timezone.now()
+        changed, changes, installments = [], [], []
+        for decision in decisions:
+            loan = loans[decision['id']]
+            before = loan_values(loan)
+            if decision['status'] == 'approved':
+                rows = _set_approved(
+                    loan, decision.get('approved_amount'), decision.get('interest_rate'),
+                    decision.get('term'), now,
+                )
+                installments.extend(_installments(loan, rows))
+            else:
+                loan.status = decision['status']
+            changed.append(loan)
+            changes.append((before, loan_values(loan)))
+
+        LoanApplication.objects.bulk_update(changed, APPROVAL_FIELDS, batch_size=batch_size)
+        Installment.objects.filter(loan_id__in={row.loan_id for row in installments}).delete()
+        Installment.objects.bulk_create(installments, batch_size=5000)
+        # bulk_update bypasses the model signals
+        record_loan_changes(changes)
+        invalidate()
+        for loan in changed:
+            publish(loan_status_event(loan, 'pending'))
+    return changed
+
+
+# ===== Batch rescheduling =====
+def reschedule_loans(queryset, interest_rate=None, term=None, batch_size=1000):
+    """
+    Recompute schedules for every approved loan in `queryset`.
+
+    Loans are processed in batches: one read, one DELETE, one bulk INSERT
+    and one bulk UPDATE per batch, regardless of how many installments the
+    batch holds. Returns the number of loans rescheduled.
+    """
+    fields = ['id', 'interest_rate', 'term', 'approved_at'] + SUMMARY_FIELDS
+    queryset = queryset.filter(status='approved', approved_amount__isnull=False).only(*fields).order_by('id')
+
+    done = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # Locked and read in the same transaction as the write, so a
+            # payment posted meanwhile cannot be lost from remaining_balance
+            batch = list(queryset.select_for_update().filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                return done
+            last_id = batch[-1].id
+
+            installments = []
+            changes = []
+            for loan in batch:
+                before = loan_values(loan)
+                if interest_rate is not None:
+                    loan.interest_rate = interest_rate
+                if term is not None:
+                    loan.term = term
+                start = timezone.localdate(loan.approved_at or loan.created_at)
+                rows = build_schedule(loan.approved_amount, loan.interest_rate or 0, loan.term or 1, start)
+                loan.monthly_payment = monthly_payment(loan.approved_amount, loan.interest_rate or 0, loan.term or 1)
+                loan.remaining_balance = schedule_total(rows) - loan.amount_paid
+                # New due dates: have the delinquency job look at it again
+                loan.delinquency_checked_at = None
+                installments.extend(_installments(loan, rows))
+                changes.append((before, loan_values(loan)))
+
+            Installment.objects.filter(loan_id__in=[loan.id for loan in batch]).delete()
+            Installment.objects.bulk_create(installments, batch_size=5000)
+            LoanApplication.objects.bulk_update(
+                batch, ['interest_rate', 'term', 'monthly_payment', 'remaining_balance', 'delinquency_checked_at'],
+            )
+            record_loan_changes(changes)
+            invalidate()
+        done += len(batch)
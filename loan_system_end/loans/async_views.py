@@ -0,0 +1,221 @@
+# loans/async_views.py
+"""
+Async read path for the hot GET endpoints (loan list/detail, payment list).
+
+Under ASGI these run on the event loop: the ORM is awaited, permission
+checks only compare loaded ids and serialization is plain CPU work, so a
+request waiting on the database no longer holds a worker thread. Output
+is byte-for-byte what the DRF viewsets render, and the response cache is
+shared with them.
+
+/api/events/ is async-only: a Server-Sent Events stream of the caller's
+loan status changes and payments (see loans.events).
+
+Callers authenticate with the session or a bearer access token (checked
+without a query, see loans.tokens). Anything the async path does not
+handle (writes, the browsable API, Basic auth, bad tokens, anonymous
+requests) is passed to the synchronous DRF view, so writes keep their
+transactional sync path and errors look the same.
+"""
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from . import events
+from .cache import CacheEntry, acurrent_version
+from .exposure import asponsor_exposure
+from .fieldsets import narrow, selected_fields
+from .filters import filter_loans
+from .models import LoanApplication
+from .pagination import LoanCursorPagination
+from .permissions import is_owner_or_admin
+from .routers import replica_reads
+from .tokens import TokenError, aauthenticate_token, bearer_token
+from .serializers import PaymentSerializer, SponsorExposureSerializer
+from .views import (
+    LOAN_REQUIRED_COLUMNS, PAYMENT_REQUIRED_COLUMNS, is_admin, json_response, loan_list_rows,
+    loan_list_values, loan_read_queryset, loan_serializer_class, shows_exposure, visible_loans,
+    visible_payments,
+)
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def serves_async(request):
+    """True when the request only needs session / token auth and JSON output."""
+    if request.method not in SAFE_METHODS:
+        return False
+    # Basic auth, and DRF's test client force_authenticate(), are only
+    # understood by DRF's authenticators
+    if 'HTTP_AUTHORIZATION' in request.META and bearer_token(request) is None:
+        return False
+    if getattr(request, '_force_auth_user', None) is not None:
+        return False
+    # Browsable API / ?format= stay with DRF's content negotiation
+    return 'text/html' not in request.headers.get('Accept', '') and 'format' not in request.GET
+
+
+async def request_user(request, token=None):
+    """The bearer token's user, else the session user; None for a bad token."""
+    token = token or bearer_token(request)
+    if token is None:
+        return await request.auser()
+    try:
+        return await aauthenticate_token(token)
+    except TokenError:
+        return None
+
+
+def read_route(sync_view, async_read):
+    """
+    Serve safe requests with `async_read(request, user, **kwargs)` and
+    everything else with the DRF view it replaces in the URLconf.
+    """
+    sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if serves_async(request):
+            user = await request_user(request)
+            if user is not None and user.is_authenticated:
+                response = await async_read(request, user, *args, **kwargs)
+                patch_vary_headers(response, ['Accept'])
+                return response
+        return await sync_view(request, *args, **kwargs)
+
+    # Same as DRF views: SessionAuthentication enforces CSRF for writes
+    view.csrf_exempt = True
+    return view
+
+
+def error_response(exc):
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return json_response(detail, status=exc.status_code)
+
+
+def not_found(model):
+    # Same body as DRF's get_object_or_404
+    return json_response(
+        {'detail': f'No {model._meta.object_name} matches the given query.'},
+        status=status.HTTP_404_NOT_FOUND,
+    )
+
+
+async def cached(request, namespace, user, render):
+    """Conditional GET + response cache around the coroutine `render()`."""
+    entry = CacheEntry(request, namespace, user.pk, *await acurrent_version())
+    if entry.not_modified(request):
+        return entry.not_modified_response()
+    hit = await entry.alookup()
+    if hit is not None:
+        return hit
+    response = await render()
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    return await entry.astore(response)
+
+
+# ===== Loans =====
+async def loan_list(request, user):
+    async def render():
+        # DRF Request only for query_params / absolute URLs; no auth runs
+        drf_request = Request(request)
+        params = drf_request.query_params
+        paginator = LoanCursorPagination()
+        serializer_class = loan_serializer_class(params)
+        try:
+            rows = loan_list_rows(params)
+            fields = selected_fields(serializer_class, params)
+            queryset = filter_loans(loan_read_queryset(user, params), params)
+            if rows is not None:
+                queryset = loan_list_values(queryset, rows)
+            else:
+                queryset = narrow(queryset, serializer_class, fields, LOAN_REQUIRED_COLUMNS)
+            with replica_reads():
+                page = await paginator.apaginate_queryset(queryset, drf_request)
+        except APIException as exc:
+            return error_response(exc)
+        if rows is not None:
+            data = rows.serialize(page)
+        else:
+            data = serializer_class(page, many=True, fields=fields, context={'request': drf_request}).data
+        return json_response(OrderedDict([
+            ('next', paginator.get_next_link()),
+            ('results', data),
+        ]))
+
+    return await cached(request, 'loanapplication', user, render)
+
+
+async def loan_detail(request, user, pk):
+    # Checked before the conditional GET: a 304 must not stand in for a 404
+    try:
+        visible = await visible_loans(user).filter(pk=pk).aexists()
+    except (TypeError, ValueError, DjangoValidationError):
+        visible = False
+    if not visible:
+        return not_found(LoanApplication)
+
+    async def render():
+        params = request.GET
+        serializer_class = loan_serializer_class(params)
+        try:
+            fields = selected_fields(serializer_class, params)
+        except APIException as exc:
+            return error_response(exc)
+        queryset = narrow(loan_read_queryset(user, params), serializer_class, fields, LOAN_REQUIRED_COLUMNS)
+        try:
+            loan = await queryset.aget(pk=pk)
+        except (LoanApplication.DoesNotExist, TypeError, ValueError, DjangoValidationError):
+            return not_found(LoanApplication)
+        if not is_owner_or_admin(user, loan):
+            return json_response({'detail': 'You do not have permission to perform this action.'},
+                                 status=status.HTTP_403_FORBIDDEN)
+        context = {'request': Request(request)}
+        data = serializer_class(loan, fields=fields, context=context).data
+        if shows_exposure(user, fields):
+            exposure = loan.sponsor_national_id and await asponsor_exposure(loan.sponsor_national_id)
+            data['sponsor_exposure'] = SponsorExposureSerializer(exposure).data if exposure else None
+        return json_response(data)
+
+    return await cached(request, 'loanapplication', user, render)
+
+
+# ===== Payments =====
+async def payment_list(request, user):
+    async def render():
+        try:
+            fields = selected_fields(PaymentSerializer, request.GET)
+        except APIException as exc:
+            return error_response(exc)
+        queryset = narrow(visible_payments(user), PaymentSerializer, fields, PAYMENT_REQUIRED_COLUMNS)
+        with replica_reads():
+            payments = [payment async for payment in queryset]
+        context = {'request': Request(request)}
+        return json_response(PaymentSerializer(payments, many=True, fields=fields, context=context).data)
+
+    return await cached(request, 'payment', user, render)
+
+
+# ===== Live events =====
+async def event_stream(request):
+    """
+    Server-Sent Events for the session or token user (admins get every
+    loan). EventSource cannot send headers, so the access token may come
+    as ?access_token=; it is only checked when the stream opens.
+    """
+    user = await request_user(request, request.GET.get('access_token'))
+    if user is None or not user.is_authenticated:
+        return json_response({'detail': 'Authentication credentials were not provided.'},
+                             status=status.HTTP_403_FORBIDDEN)
+    subscription = events.subscribe(user.pk, admin=is_admin(user))
+    response = StreamingHttpResponse(events.stream(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx would otherwise buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
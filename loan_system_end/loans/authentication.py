@@ -0,0 +1,23 @@
+# loans/authentication.py
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .tokens import TokenError, authenticate_token, bearer_token
+
+
+class AccessTokenAuthentication(BaseAuthentication):
+    """``Authorization: Bearer <access token>`` (see loans.tokens); no database hit."""
+
+    def authenticate(self, request):
+        token = bearer_token(request)
+        if token is None:
+            return None
+        try:
+            return authenticate_token(token), token
+        except TokenError as exc:
+            raise AuthenticationFailed(str(exc), code=exc.code)
+
+    def authenticate_header(self, request):
+        # 401 for a bad or expired token, so the client knows to refresh;
+        # requests without one keep getting 403
+        return 'Bearer' if bearer_token(request) else None
@@ -0,0 +1,171 @@
+# loans/cache.py
+"""
+Per-user response cache for loan and payment reads.
+
+Rendered list/detail responses are stored under a key built from the
+user, the request path + query and a data version. Any write to loans,
+payments or installments bumps the version, which orphans every cached
+entry at once (they expire through API_CACHE_TIMEOUT). The version also
+feeds the ETag / Last-Modified headers, so a conditional GET for
+unchanged data is answered with 304 before the queryset is touched
+(details first check that the object exists and may be seen).
+
+The backend is whatever CACHES[API_CACHE_ALIAS] is: local memory by
+default (per process), Redis when REDIS_URL is set (shared by workers).
+"""
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'api-cache:version'
+MODIFIED_KEY = 'api-cache:modified'
+
+CACHED_ACTIONS = {'list', 'retrieve'}
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def _bump():
+    cache = get_cache()
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(VERSION_KEY, 1, timeout=None)
+    cache.set(MODIFIED_KEY, int(time.time()), timeout=None)
+
+
+def invalidate():
+    """Mark every cached response stale.
+
+    Bumped right away and again once the surrounding transaction commits,
+    so a read racing the commit cannot cache pre-commit data under the
+    new version.
+    """
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def current_version():
+    """Return ``(version, last_modified_timestamp)``."""
+    values = get_cache().get_many([VERSION_KEY, MODIFIED_KEY])
+    if len(values) < 2:
+        # Cold or evicted: start a new version rather than trust old ETags
+        _bump()
+        values = get_cache().get_many([VERSION_KEY, MODIFIED_KEY])
+    return values.get(VERSION_KEY, 0), values.get(MODIFIED_KEY, int(time.time()))
+
+
+async def acurrent_version():
+    values = await get_cache().aget_many([VERSION_KEY, MODIFIED_KEY])
+    if len(values) < 2:
+        await sync_to_async(_bump)()
+        values = await get_cache().aget_many([VERSION_KEY, MODIFIED_KEY])
+    return values.get(VERSION_KEY, 0), values.get(MODIFIED_KEY, int(time.time()))
+
+
+class CacheEntry:
+    """Where one request's response is cached, and its validators."""
+
+    def __init__(self, request, namespace, user_pk, version, modified):
+        accept = request.headers.get('Accept', '')
+        digest = hashlib.sha1(f'{request.get_full_path()}|{accept}'.encode()).hexdigest()
+        self.key = f'api-cache:{namespace}:{user_pk}:{digest}:{version}'
+        self.etag = '"%s"' % hashlib.sha1(self.key.encode()).hexdigest()[:20]
+        self.modified = modified
+        # HTTP dates are whole seconds. Once the second of the last write is
+        # over, the next second is a safe validator; until then a later
+        # write in the same second must not compare as "not modified".
+        self.last_modified = min(modified + 1, int(time.time()))
+
+    def not_modified(self, request):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            return if_none_match.strip() == '*' or self.etag in [tag.strip() for tag in if_none_match.split(',')]
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return since is not None and self.modified < since
+
+    def add_headers(self, response):
+        response['ETag'] = self.etag
+        response['Last-Modified'] = http_date(self.last_modified)
+        # Responses are per user: browsers may keep them but must revalidate
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def not_modified_response(self):
+        return self.add_headers(HttpResponseNotModified())
+
+    def _hit(self, value):
+        if value is None:
+            return None
+        content, content_type = value
+        return self.add_headers(HttpResponse(content, content_type=content_type))
+
+    def lookup(self):
+        return self._hit(get_cache().get(self.key))
+
+    async def alookup(self):
+        return self._hit(await get_cache().aget(self.key))
+
+    def store(self, response):
+        timeout = getattr(settings, 'API_CACHE_TIMEOUT', 300)
+        get_cache().set(self.key, (response.content, response['Content-Type']), timeout)
+        return self.add_headers(response)
+
+    async def astore(self, response):
+        timeout = getattr(settings, 'API_CACHE_TIMEOUT', 300)
+        await get_cache().aset(self.key, (response.content, response['Content-Type']), timeout)
+        return self.add_headers(response)
+
+
+class CachedResponseMixin:
+    """Serve list/retrieve from the response cache with conditional GET."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._cache_entry = None
+        if request.method == 'GET' and self.action in CACHED_ACTIONS:
+            self._cache_entry = CacheEntry(request, self.basename, request.user.pk, *current_version())
+
+    def _cached_or(self, handler, request, *args, **kwargs):
+        entry = self._cache_entry
+        if entry is None:
+            return handler(request, *args, **kwargs)
+        if self.action == 'retrieve':
+            # 404 / 403 before any 304 or cached body
+            self.get_object()
+        if entry.not_modified(request):
+            return entry.not_modified_response()
+        hit = entry.lookup()
+        return hit if hit is not None else handler(request, *args, **kwargs)
+
+    def get_object(self):
+        # Once per request: _cached_or checks it before the handler renders it
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_or(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_or(super().retrieve, request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        entry = getattr(self, '_cache_entry', None)
+        if entry is None or not isinstance(response, Response) or response.status_code != status.HTTP_200_OK:
+            return response
+        response.render()
+        return entry.store(response)
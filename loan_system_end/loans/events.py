@@ -0,0 +1,191 @@
+# loans/events.py
+"""
+Live notifications: loan status changes and posted payments, pushed over
+Server-Sent Events to the loan's owner and to every admin.
+
+Writers call publish(); the event goes out once the transaction commits.
+Each worker process keeps a Broker that maps user ids to the queues of
+their open streams, so an event costs one queue put per recipient and an
+idle stream costs one suspended coroutine and an empty queue: no thread,
+no database connection.
+
+With EVENTS_REDIS_URL set (needs the redis package) events are published
+to a Redis channel instead, and every worker relays that channel into its
+own Broker, so a stream also sees writes handled by other workers.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+CHANNEL = 'loan-events'
+QUEUE_SIZE = 100
+RETRY_MS = 5000
+
+
+def loan_status_event(loan, previous):
+    return {
+        'type': 'loan.status', 'user': loan.applicant_id, 'loan': loan.id,
+        'status': loan.status, 'previous': previous,
+    }
+
+
+def payment_event(payment, user_id):
+    return {
+        'type': 'payment', 'user': user_id, 'loan': payment.loan_id,
+        'payment': payment.id, 'amount': str(payment.amount),
+    }
+
+
+# ===== In-process pub/sub =====
+class Subscription:
+    def __init__(self, user_id, admin):
+        self.user_id = user_id
+        self.admin = admin
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event):
+        # Runs on the subscriber's loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Client isn't reading; its stream ends and EventSource reconnects
+            self.overflowed = True
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = defaultdict(set)
+        self._admins = set()
+
+    def subscribe(self, user_id, admin=False):
+        """Register a stream; call from the event loop that will read it."""
+        subscription = Subscription(user_id, admin)
+        with self._lock:
+            (self._admins if admin else self._users[user_id]).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription.admin:
+                self._admins.discard(subscription)
+            else:
+                streams = self._users.get(subscription.user_id, set())
+                streams.discard(subscription)
+                if not streams:
+                    self._users.pop(subscription.user_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._admins) + sum(len(streams) for streams in self._users.values())
+
+    def dispatch(self, event):
+        """Hand `event` to its owner's and the admins' streams (any thread)."""
+        with self._lock:
+            targets = self._admins | self._users.get(event['user'], set())
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # Loop already closed (worker shutting down)
+                self.unsubscribe(subscription)
+
+
+broker = Broker()
+
+
+# ===== Backends =====
+class LocalBackend:
+    def send(self, event):
+        broker.dispatch(event)
+
+    def listen(self):
+        pass
+
+
+class RedisBackend:
+    """Publish through a Redis (or compatible) channel shared by all workers."""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("EVENTS_REDIS_URL is set but the redis package is not installed")
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+        self._relays = {}
+
+    def send(self, event):
+        self.client.publish(CHANNEL, json.dumps(event))
+
+    def listen(self):
+        # One relay task per event loop, started by the first stream
+        loop = asyncio.get_running_loop()
+        relay = self._relays.get(loop)
+        if relay is None or relay.done():
+            self._relays[loop] = loop.create_task(self._relay())
+
+    async def _relay(self):
+        import redis.asyncio
+
+        client = redis.asyncio.from_url(self.url)
+        async with client.pubsub() as pubsub:
+            await pubsub.subscribe(CHANNEL)
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    broker.dispatch(json.loads(message['data']))
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        url = getattr(settings, 'EVENTS_REDIS_URL', None)
+        _backend = RedisBackend(url) if url else LocalBackend()
+    return _backend
+
+
+def send(event):
+    get_backend().send(event)
+
+
+def publish(event):
+    """Send `event` once the current transaction commits (right away outside one)."""
+    transaction.on_commit(lambda: send(event))
+
+
+# ===== SSE stream =====
+def format_event(event):
+    data = {key: value for key, value in event.items() if key != 'user'}
+    return f"event: {event['type']}\ndata: {json.dumps(data)}\n\n"
+
+
+def subscribe(user_id, admin=False):
+    get_backend().listen()
+    return broker.subscribe(user_id, admin)
+
+
+async def stream(subscription, keepalive=None):
+    """SSE body for `subscription`; unsubscribes when the client goes away."""
+    keepalive = keepalive or getattr(settings, 'EVENTS_KEEPALIVE', 15)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        while not subscription.overflowed:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle stream
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
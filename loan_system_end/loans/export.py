@@ -0,0 +1,132 @@
+# loans/export.py
+"""
+Constant-memory CSV / NDJSON exports of loans and payments.
+
+Rows are read with values_list().iterator() and encoded in small batches,
+so neither model instances nor the whole result set are ever held in
+memory.
+
+Django's StreamingHttpResponse buffers a sync iterator completely when it
+is served over ASGI, so on that path the export is handed over as an
+async iterator (aiter_chunks) that pulls one chunk at a time from the
+sync generator in the request's worker thread.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+LOAN_COLUMNS = [
+    'id', 'name', 'loan_type', 'requested_amount', 'approved_amount',
+    'interest_rate', 'term', 'monthly_payment', 'remaining_balance',
+    'amount_paid', 'status', 'contract_accepted', 'created_at',
+    'assets_value', 'monthly_income',
+    'sponsor_name', 'sponsor_address', 'sponsor_national_id',
+    'sponsor_phone', 'sponsor_email', 'sponsor_photo',
+]
+
+PAYMENT_COLUMNS = ['id', 'loan', 'amount', 'phone', 'date']
+
+# Column name -> model field, where they differ
+FIELD_SOURCES = {'loan': 'loan_id'}
+
+CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return value
+
+
+def _media_url(storage):
+    return lambda name: storage.url(name) if name else None
+
+
+def _converter(model, column):
+    if column.endswith('_photo'):
+        return _media_url(model._meta.get_field(column).storage)
+    return _plain
+
+
+def export_rows(queryset, columns):
+    """Yield one tuple of JSON-ready values per row, in column order."""
+    converters = [_converter(queryset.model, column) for column in columns]
+    fields = [FIELD_SOURCES.get(column, column) for column in columns]
+    for row in queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        yield tuple(convert(value) for convert, value in zip(converters, row))
+
+
+class _Buffer:
+    """File-like sink that hands back what csv.writer wrote."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def drain(self):
+        text, self.parts = ''.join(self.parts), []
+        return text
+
+
+def _batched(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= ROWS_PER_WRITE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def encode_csv(columns, rows):
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.drain()
+    for batch in _batched(rows):
+        writer.writerows(batch)
+        yield buffer.drain()
+
+
+def encode_ndjson(columns, rows):
+    for batch in _batched(rows):
+        yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in batch)
+
+
+def gzip_stream(chunks):
+    """Incrementally gzip an iterable of bytes."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(queryset, columns, fmt='csv', compress=False):
+    """Return an iterator of bytes for the whole export."""
+    encode = encode_ndjson if fmt == 'ndjson' else encode_csv
+    chunks = (text.encode('utf-8') for text in encode(columns, export_rows(queryset, columns)))
+    return gzip_stream(chunks) if compress else chunks
+
+
+async def aiter_chunks(chunks):
+    """Serve a sync iterator to an async consumer without collecting it first."""
+    chunks = iter(chunks)
+    done = object()
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(chunks, done)) is not done:
+        yield chunk
@@ -0,0 +1,131 @@
+# loans/exposure.py
+"""
+Per-sponsor exposure for guarantor concentration checks.
+
+A sponsor (sponsor_national_id) may guarantee many loans. SponsorExposure
+keeps, per sponsor, the number of active loans (approved, balance still
+owed), their approved amount and their outstanding balance. Like the
+portfolio summary it is maintained with signed deltas: loans.summary
+passes every loan change (approval, rescheduling, deletion) and every
+payment posting on to this module, so reading a sponsor's exposure is
+one unique-index lookup instead of a scan over LoanApplication.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import LoanApplication, SponsorExposure
+
+# Loan columns that feed the exposure
+EXPOSURE_FIELDS = ['sponsor_national_id', 'status', 'approved_amount', 'remaining_balance']
+
+MEASURES = ['active_loans', 'approved_total', 'outstanding_total']
+
+ZERO = Decimal('0')
+
+ACTIVE = Q(status='approved', remaining_balance__gt=0) & ~Q(sponsor_national_id='')
+
+
+def is_active(values):
+    balance = values['remaining_balance']
+    return (bool(values['sponsor_national_id']) and values['status'] == 'approved'
+            and balance is not None and balance > 0)
+
+
+def contribution(values, sign=1):
+    """Measures a loan (as a dict of EXPOSURE_FIELDS) adds to its sponsor, or None."""
+    if not is_active(values):
+        return None
+    return [sign, sign * (values['approved_amount'] or ZERO), sign * values['remaining_balance']]
+
+
+def _add(deltas, values, sign):
+    measures = contribution(values, sign)
+    if measures is None:
+        return
+    current = deltas[values['sponsor_national_id']]
+    for i, value in enumerate(measures):
+        current[i] += value
+
+
+def _deltas():
+    return defaultdict(lambda: [0, ZERO, ZERO])
+
+
+def apply_sponsor_deltas(deltas):
+    """Add ``{sponsor_national_id: [measures]}`` with one INSERT and one UPDATE."""
+    deltas = {sponsor: delta for sponsor, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    SponsorExposure.objects.bulk_create(
+        [SponsorExposure(sponsor_national_id=sponsor) for sponsor in deltas], ignore_conflicts=True,
+    )
+
+    def per_sponsor(i, output_field):
+        return Case(*[When(sponsor_national_id=sponsor, then=Value(delta[i])) for sponsor, delta in deltas.items()],
+                    output_field=output_field)
+
+    money = DecimalField(max_digits=16, decimal_places=2)
+    SponsorExposure.objects.filter(sponsor_national_id__in=list(deltas)).update(
+        active_loans=F('active_loans') + per_sponsor(0, IntegerField()),
+        approved_total=F('approved_total') + per_sponsor(1, money),
+        outstanding_total=F('outstanding_total') + per_sponsor(2, money),
+    )
+
+
+def record_exposure_changes(changes):
+    """Apply ``(old_values, new_values)`` pairs; either may be None."""
+    deltas = _deltas()
+    for old, new in changes:
+        if old is not None:
+            _add(deltas, old, -1)
+        if new is not None:
+            _add(deltas, new, 1)
+    apply_sponsor_deltas(deltas)
+
+
+def record_exposure_payments(rows, amounts):
+    """Reflect ``{loan_id: amount}`` given the loans' rows as they are after posting."""
+    deltas = _deltas()
+    for row in rows:
+        if row['remaining_balance'] is None:
+            continue
+        before = dict(row, remaining_balance=row['remaining_balance'] + amounts[row['id']])
+        _add(deltas, before, -1)
+        _add(deltas, row, 1)
+    apply_sponsor_deltas(deltas)
+
+
+# ===== Reads =====
+def sponsor_exposures(sponsor_national_ids):
+    """``{sponsor_national_id: SponsorExposure}``; unsaved zeros for sponsors with nothing active."""
+    ids = set(filter(None, sponsor_national_ids))
+    found = SponsorExposure.objects.in_bulk(ids, field_name='sponsor_national_id') if ids else {}
+    return {sponsor: found.get(sponsor) or SponsorExposure(sponsor_national_id=sponsor) for sponsor in ids}
+
+
+async def asponsor_exposure(sponsor_national_id):
+    row = await SponsorExposure.objects.filter(sponsor_national_id=sponsor_national_id).afirst()
+    return row or SponsorExposure(sponsor_national_id=sponsor_national_id)
+
+
+@transaction.atomic
+def rebuild_exposure():
+    """Recompute every sponsor from scratch with one aggregate query."""
+    zero = Value(ZERO)
+    sponsors = (
+        LoanApplication.objects.filter(ACTIVE)
+        .values('sponsor_national_id')
+        .annotate(
+            active_loans=Count('id'),
+            approved_total=Coalesce(Sum('approved_amount'), zero),
+            outstanding_total=Coalesce(Sum('remaining_balance'), zero),
+        )
+        .order_by()
+    )
+    SponsorExposure.objects.all().delete()
+    rows = SponsorExposure.objects.bulk_create(SponsorExposure(**sponsor) for sponsor in sponsors)
+    return len(rows)
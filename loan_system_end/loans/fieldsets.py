@@ -0,0 +1,89 @@
+# loans/fieldsets.py
+"""
+Sparse fieldsets for the read endpoints: ?profile=, ?fields=, ?exclude=.
+
+A serializer names its profiles in ``Meta.profiles``; 'full' (every
+field) is always there and is the default. ?profile= picks one,
+?fields= replaces it with an explicit comma separated list and
+?exclude= drops fields from either. Only the selected fields are
+serialized, and the queryset is narrowed to their columns with only()
+(values() on the row path), so the rest are not fetched either.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+FULL = 'full'
+READ_ACTIONS = {'list', 'retrieve'}
+
+
+def _names(params, key):
+    return [name.strip() for name in params.get(key, '').split(',') if name.strip()]
+
+
+def selected_fields(serializer_class, params):
+    """Field names `params` ask for, in serializer order, or None for all of them."""
+    available = serializer_class.Meta.fields
+    profiles = getattr(serializer_class.Meta, 'profiles', {})
+    profile = params.get('profile') or FULL
+    if profile != FULL and profile not in profiles:
+        raise ValidationError({'profile': f"Use one of {', '.join([FULL, *profiles])}"})
+
+    chosen = _names(params, 'fields') or (None if profile == FULL else profiles[profile])
+    excluded = _names(params, 'exclude')
+    for key, names in (('fields', chosen or ()), ('exclude', excluded)):
+        unknown = sorted(set(names) - set(available))
+        if unknown:
+            raise ValidationError({key: f"Unknown field(s): {', '.join(unknown)}"})
+
+    if chosen is None and not excluded:
+        return None
+    keep = set(available if chosen is None else chosen) - set(excluded)
+    return tuple(name for name in available if name in keep)
+
+
+@lru_cache(maxsize=None)
+def _sources(serializer_class):
+    return {name: field.source for name, field in serializer_class().fields.items()}
+
+
+def model_columns(serializer_class, fields):
+    """Model fields behind `fields` (reverse relations are prefetched, not columns)."""
+    model = serializer_class.Meta.model
+    sources = _sources(serializer_class)
+    columns = []
+    for name in fields:
+        try:
+            model_field = model._meta.get_field(sources[name])
+        except FieldDoesNotExist:
+            continue
+        if model_field.concrete:
+            columns.append(model_field.name)
+    return columns
+
+
+def narrow(queryset, serializer_class, fields, required=()):
+    """Load only the columns `fields` need, plus `required` (permissions, paging)."""
+    if fields is None:
+        return queryset
+    return queryset.only(*dict.fromkeys([*model_columns(serializer_class, fields), *required]))
+
+
+class SparseFieldsetMixin:
+    """Apply the requested fieldset to list and retrieve."""
+    # Columns the view reads itself, whatever is serialized
+    fieldset_required = ()
+
+    def get_fieldset(self):
+        if self.action not in READ_ACTIONS:
+            return None
+        return selected_fields(self.get_serializer_class(), self.request.query_params)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return narrow(queryset, self.get_serializer_class(), self.get_fieldset(), self.fieldset_required)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_fieldset())
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,106 @@
+# loans/filters.py
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import filters, serializers
+
+from .delinquency import OVERDUE_STATUSES
+from .models import LoanApplication
+
+
+# ===== Query param parsing =====
+def _parse_choice(value, choices, param):
+    values = [v.strip() for v in value.split(',') if v.strip()]
+    allowed = {key for key, _ in choices}
+    invalid = [v for v in values if v not in allowed]
+    if invalid:
+        raise serializers.ValidationError({param: f"Invalid value(s): {', '.join(invalid)}"})
+    return values
+
+
+def _parse_amount(value, param):
+    try:
+        amount = Decimal(value)
+    except (InvalidOperation, TypeError):
+        amount = None
+    if amount is None or not amount.is_finite():  # NaN / Infinity
+        raise serializers.ValidationError({param: "Must be a number"})
+    return amount
+
+
+def _parse_bool(value, param):
+    value = value.strip().lower()
+    if value not in ('true', 'false', '1', '0'):
+        raise serializers.ValidationError({param: "Must be true or false"})
+    return value in ('true', '1')
+
+
+def _parse_moment(value, param, end_of_day=False):
+    # Dates become aware datetimes so the created_at index stays usable
+    try:
+        # Bare dates first: parse_datetime also accepts them, as midnight
+        day = parse_date(value)
+        if day is not None:
+            if end_of_day:
+                day += timedelta(days=1)
+            moment = datetime.combine(day, time.min)
+        else:
+            moment = parse_datetime(value)
+            if moment is None:
+                raise ValueError(value)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+    except (ValueError, OverflowError):
+        # Unparseable, or well-formed but out of range (2020-13-45)
+        raise serializers.ValidationError({param: "Must be an ISO date or datetime"})
+    return moment
+
+
+# ===== Loan filtering =====
+def filter_loans(queryset, params):
+    """Apply the /loans/ query parameters to a LoanApplication queryset.
+
+    Supported: status, loan_type (comma separated), created_after,
+    created_before, min_amount, max_amount (on requested_amount),
+    overdue (true/false, from the last delinquency run).
+    """
+    if params.get('status'):
+        queryset = queryset.filter(
+            status__in=_parse_choice(params['status'], LoanApplication.STATUS_CHOICES, 'status')
+        )
+    if params.get('loan_type'):
+        queryset = queryset.filter(
+            loan_type__in=_parse_choice(params['loan_type'], LoanApplication.LOAN_TYPES, 'loan_type')
+        )
+
+    if params.get('created_after'):
+        queryset = queryset.filter(
+            created_at__gte=_parse_moment(params['created_after'], 'created_after')
+        )
+    if params.get('created_before'):
+        # A bare date is inclusive: created_before=2025-09-10 keeps the whole day
+        queryset = queryset.filter(
+            created_at__lt=_parse_moment(params['created_before'], 'created_before', end_of_day=True)
+        )
+
+    if params.get('min_amount'):
+        queryset = queryset.filter(requested_amount__gte=_parse_amount(params['min_amount'], 'min_amount'))
+    if params.get('max_amount'):
+        queryset = queryset.filter(requested_amount__lte=_parse_amount(params['max_amount'], 'max_amount'))
+
+    if params.get('overdue'):
+        # IN on the leading column keeps the (delinquency_status, created_at, id) seek
+        if _parse_bool(params['overdue'], 'overdue'):
+            queryset = queryset.filter(delinquency_status__in=OVERDUE_STATUSES)
+        else:
+            queryset = queryset.filter(delinquency_status='current')
+    return queryset
+
+
+class LoanFilterBackend(filters.BaseFilterBackend):
+    """DRF filter backend wrapping filter_loans for the list endpoint."""
+
+    def filter_queryset(self, request, queryset, view):
+        return filter_loans(queryset, request.query_params)
@@ -0,0 +1,86 @@
+# loans/hashing.py
+"""
+Password hashing on a bounded worker pool.
+
+PBKDF2 is deliberately slow. Running it on a small dedicated pool caps
+how many CPU cores a burst of logins/registrations can take. At most
+PASSWORD_HASHING_WORKERS + PASSWORD_HASHING_QUEUE calls are admitted
+(running or queued); the next one fails at once with HashingBusy (503)
+instead of waiting, so hashing never holds more request threads than
+that and the settings keep it below the server's thread count.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+
+_pool = None
+_slots = None
+_lock = threading.Lock()
+
+
+class HashingBusy(Exception):
+    """Every hashing slot (running or queued) is taken."""
+
+
+def _get_pool():
+    global _pool, _slots
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', None) or os.cpu_count() or 1
+                queue = getattr(settings, 'PASSWORD_HASHING_QUEUE', 8)
+                _slots = threading.BoundedSemaphore(workers + queue)
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+    return _pool, _slots
+
+
+def run_hashing(func, *args):
+    """Run a CPU-bound hashing call on the pool and wait for its result."""
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return pool.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_password(raw_password):
+    return run_hashing(make_password, raw_password)
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend with the password check moved to the pool; database
+    access stays on the request thread. Used through authenticate(), so
+    user_login_failed and the rest of AUTHENTICATION_BACKENDS still apply.
+    Raises HashingBusy when the pool is full.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        User = get_user_model()
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            # Spend the same time as a real check so usernames can't be probed
+            hash_password(password)
+            return None
+
+        outdated = []
+        valid = run_hashing(check_password, password, user.password, outdated.append)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if outdated:
+            # Hasher or iteration count changed since this password was set
+            user.password = hash_password(password)
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,193 @@
+# loans/ingest.py
+"""
+Bulk payment ingestion from provider settlement files (CSV or NDJSON).
+
+Rows are read lazily and handled in chunks: each chunk costs one loan
+lookup, one idempotency-key lookup, one bulk INSERT and one UPDATE of the
+affected loans' totals, all in a single transaction.
+"""
+import csv
+import json
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+
+from .events import payment_event, publish
+from .ledger import IdempotencyConflict, PaymentRejected, apply_deltas, lacks_room, post_payment
+from .models import LoanApplication, Payment
+
+PHONE_MAX_LENGTH = Payment._meta.get_field('phone').max_length
+KEY_MAX_LENGTH = Payment._meta.get_field('idempotency_key').max_length
+
+
+class UndecodableFile(ValueError):
+    """The file is not valid text; `report` covers the rows posted before the bad bytes."""
+
+    def __init__(self, report):
+        super().__init__(f"File is not valid UTF-8; stopped after {report.rows} rows")
+        self.report = report
+
+
+class IngestReport:
+    def __init__(self):
+        self.rows = 0
+        self.posted = 0
+        self.duplicates = 0
+        self.errors = []  # (line number, message)
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self, max_errors=None):
+        errors = self.errors if max_errors is None else self.errors[:max_errors]
+        return {
+            'rows': self.rows,
+            'posted': self.posted,
+            'duplicates': self.duplicates,
+            'failed': len(self.errors),
+            'elapsed_sec': round(self.elapsed, 3),
+            'rows_per_sec': round(self.rows_per_sec, 1),
+            'errors': [{'line': line, 'error': message} for line, message in errors],
+            'errors_truncated': len(errors) < len(self.errors),
+        }
+
+
+# ===== Readers =====
+def iter_rows(lines, fmt='csv'):
+    """Yield ``(line_number, dict)`` from an iterable of text lines."""
+    if fmt == 'ndjson':
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def detect_format(filename):
+    return 'ndjson' if filename.lower().endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+# ===== Validation =====
+def _clean(row):
+    """Return (loan_id, amount, phone, key) or raise ValueError."""
+    if row is None:
+        raise ValueError("Malformed row")
+    try:
+        loan_id = int(row.get('loan') or row.get('loan_id'))
+    except (TypeError, ValueError):
+        raise ValueError("loan must be an integer id")
+    try:
+        amount = Decimal(str(row.get('amount'))).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise ValueError("amount must be a number")
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError("amount must be positive")
+    phone = str(row.get('phone') or '').strip()
+    if not phone or len(phone) > PHONE_MAX_LENGTH:
+        raise ValueError(f"phone is required (max {PHONE_MAX_LENGTH} characters)")
+    key = str(row.get('idempotency_key') or row.get('reference') or '').strip() or None
+    if key and len(key) > KEY_MAX_LENGTH:
+        raise ValueError(f"reference longer than {KEY_MAX_LENGTH} characters")
+    return loan_id, amount, phone, key
+
+
+# ===== Ingestion =====
+def _post_chunk(chunk, report):
+    first_error = len(report.errors)
+    valid = []
+    for number, row in chunk:
+        try:
+            valid.append((number,) + _clean(row))
+        except ValueError as exc:
+            report.errors.append((number, str(exc)))
+
+    loans = LoanApplication.objects.only(
+        'id', 'applicant_id', 'amount_paid', 'remaining_balance',
+    ).in_bulk({row[1] for row in valid})
+    keys = {row[4] for row in valid if row[4]}
+    # Key -> (loan, amount) it was posted with, so a reused key can be told from a retry
+    seen = {
+        key: (loan_id, amount)
+        for key, loan_id, amount in Payment.objects.filter(idempotency_key__in=keys)
+        .values_list('idempotency_key', 'loan_id', 'amount')
+    }
+
+    payments = []
+    deltas = defaultdict(Decimal)
+    for number, loan_id, amount, phone, key in valid:
+        if loan_id not in loans:
+            report.errors.append((number, f"Loan {loan_id} not found"))
+            continue
+        if key:
+            if key in seen:
+                if seen[key] == (loan_id, amount):
+                    report.duplicates += 1
+                else:
+                    report.errors.append((number, f"Idempotency key {key!r} was used for a different payment"))
+                continue
+        loan = loans[loan_id]
+        if lacks_room(loan.amount_paid, loan.remaining_balance, deltas[loan_id] + amount):
+            report.errors.append((number, f"Payment of {amount} exceeds the remaining balance of loan {loan_id}"))
+            continue
+        if key:
+            seen[key] = (loan_id, amount)
+        payments.append((number, Payment(loan_id=loan_id, amount=amount, phone=phone, idempotency_key=key)))
+        deltas[loan_id] += amount
+
+    try:
+        with transaction.atomic():
+            Payment.objects.bulk_create([payment for _, payment in payments])
+            apply_deltas(deltas)
+            for _, payment in payments:
+                publish(payment_event(payment, loans[payment.loan_id].applicant_id))
+        report.posted += len(payments)
+    except (IntegrityError, PaymentRejected):
+        # A key or a payment was posted concurrently; fall back to the row-at-a-time path
+        for number, payment in payments:
+            try:
+                _, created = post_payment(payment.loan_id, payment.amount, payment.phone, payment.idempotency_key)
+            except (IdempotencyConflict, PaymentRejected) as exc:
+                report.errors.append((number, str(exc)))
+                continue
+            if created:
+                report.posted += 1
+            else:
+                report.duplicates += 1
+
+    report.errors[first_error:] = sorted(report.errors[first_error:])
+
+
+def ingest_payments(rows, chunk_size=1000):
+    """
+    Post an iterable of ``(line_number, dict)`` rows; return an IngestReport.
+
+    Raises UndecodableFile if reading the rows fails to decode; the chunks
+    before it stay posted.
+    """
+    report = IngestReport()
+    start = time.perf_counter()
+    rows = iter(rows)
+    while True:
+        try:
+            chunk = list(islice(rows, chunk_size))
+        except UnicodeDecodeError:
+            report.elapsed = time.perf_counter() - start
+            raise UndecodableFile(report)
+        if not chunk:
+            break
+        report.rows += len(chunk)
+        _post_chunk(chunk, report)
+    report.elapsed = time.perf_counter() - start
+    return report
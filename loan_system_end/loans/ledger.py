@@ -0,0 +1,178 @@
+# loans/ledger.py
+"""
+Payment posting. A payment row and the loan's running totals
+(amount_paid, remaining_balance) always change in the same transaction,
+so balance reads never have to sum payments. A loan's history with the
+balance after each payment is derived from those totals (payment_history).
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, F, Q, RowRange, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Coalesce
+
+from .cache import invalidate
+from .models import LoanApplication, Payment
+from .summary import record_payments
+
+# Largest amount_paid the column holds (max_digits=12, decimal_places=2)
+MAX_TOTAL = Decimal('9999999999.99')
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused for a different payment."""
+
+
+class PaymentRejected(Exception):
+    """A payment is more than the loan still owes (or than its totals can hold)."""
+
+
+def has_room(amount):
+    """Loans that can take `amount` more: not beyond the balance, nor the column size."""
+    return Q(amount_paid__lte=MAX_TOTAL - amount) & (Q(remaining_balance=None) | Q(remaining_balance__gte=amount))
+
+
+def lacks_room(amount_paid, remaining_balance, amount):
+    """The negation of has_room, for totals already read."""
+    return amount_paid + amount > MAX_TOTAL or (remaining_balance is not None and amount > remaining_balance)
+
+
+def apply_to_loan(loan_id, amount):
+    """Add `amount` to a loan's running totals with a single UPDATE.
+
+    F() expressions let the database do the arithmetic, so concurrent
+    postings cannot overwrite each other. A NULL remaining_balance (loan
+    not approved yet) stays NULL. A payment the loan has no room for
+    (has_room) raises PaymentRejected. Callers hold a transaction.
+    """
+    loans = LoanApplication.objects.filter(pk=loan_id)
+    if amount > 0:
+        loans = loans.filter(has_room(amount))
+    updated = loans.update(
+        amount_paid=F('amount_paid') + amount,
+        remaining_balance=F('remaining_balance') - amount,
+    )
+    if amount > 0 and not updated:
+        raise PaymentRejected(f"Payment of {amount} exceeds the remaining balance of loan {loan_id}")
+    record_payments({loan_id: amount})
+    return updated
+
+
+@transaction.atomic
+def apply_deltas(deltas):
+    """Apply ``{loan_id: amount}`` to many loans with one UPDATE statement.
+
+    Raises PaymentRejected, before anything is written, if a loan has no
+    room for its amount (see has_room).
+    """
+    if not deltas:
+        return 0
+    totals = LoanApplication.objects.select_for_update().filter(pk__in=list(deltas)).values_list(
+        'pk', 'amount_paid', 'remaining_balance',
+    )
+    full = sorted(loan_id for loan_id, paid, balance in totals if lacks_room(paid, balance, deltas[loan_id]))
+    if full:
+        raise PaymentRejected(f"Payments exceed the remaining balance of loans {full}")
+    delta = Case(
+        *[When(pk=loan_id, then=Value(amount)) for loan_id, amount in deltas.items()],
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    updated = LoanApplication.objects.filter(pk__in=list(deltas)).update(
+        amount_paid=F('amount_paid') + delta,
+        remaining_balance=F('remaining_balance') - delta,
+    )
+    record_payments(deltas)
+    # Bulk paths bypass the model signals
+    invalidate()
+    return updated
+
+
+def _replay(idempotency_key, loan_id, amount):
+    payment = Payment.objects.get(idempotency_key=idempotency_key)
+    if payment.loan_id != int(loan_id) or payment.amount != amount:
+        raise IdempotencyConflict(f"Idempotency key {idempotency_key!r} was used for a different payment")
+    return payment
+
+
+def post_payment(loan_id, amount, phone, idempotency_key=None, loans=None):
+    """
+    Insert a payment and update its loan's totals atomically.
+
+    `loans` restricts which loans may be paid (e.g. the caller's own);
+    LoanApplication.DoesNotExist is raised otherwise, and PaymentRejected
+    if the amount exceeds the loan's remaining balance. Returns
+    ``(payment, created)``; a retry with an already-used idempotency key
+    returns the original payment with ``created=False``.
+    """
+    if loans is None:
+        loans = LoanApplication.objects.all()
+
+    if idempotency_key and Payment.objects.filter(idempotency_key=idempotency_key).exists():
+        # A replay only hands back payments on loans the caller may pay
+        if not loans.filter(pk=loan_id).exists():
+            raise LoanApplication.DoesNotExist("Loan not found or not payable by the caller")
+        return _replay(idempotency_key, loan_id, amount), False
+
+    try:
+        with transaction.atomic():
+            # Row lock where the backend supports it; the F() update is
+            # safe on its own where it does not (SQLite).
+            loan = loans.select_for_update().only('id', 'applicant_id').get(pk=loan_id)
+            payment = Payment.objects.create(
+                loan=loan,
+                amount=amount,
+                phone=phone,
+                idempotency_key=idempotency_key or None,
+            )
+            apply_to_loan(loan.id, amount)
+    except IntegrityError:
+        # Lost a race against a concurrent retry carrying the same key
+        if not idempotency_key:
+            raise
+        return _replay(idempotency_key, loan_id, amount), False
+    return payment, True
+
+
+@transaction.atomic
+def reverse_payment(payment):
+    """Delete a payment and take it back out of the loan's totals."""
+    apply_to_loan(payment.loan_id, -payment.amount)
+    # No payment row is left for the delinquency job to notice
+    LoanApplication.objects.filter(pk=payment.loan_id).update(delinquency_checked_at=None)
+    payment.delete()
+
+
+# ===== History =====
+def payment_history(page, newer):
+    """
+    A page of one loan's payments, newest first, with ``paid_to_date`` and
+    ``balance`` (the loan's totals right after each payment).
+
+    `page` is the sliced seek query for the page and `newer` the same
+    loan's payments ahead of it. Both figures are the loan's current totals with
+    every newer payment taken back out: a window sum over the page rows
+    before each one, plus one aggregate over `newer`. The window only
+    runs over the page, so a deep page costs about what the first does.
+    """
+    money = DecimalField(max_digits=14, decimal_places=2)
+    # Not correlated with the outer row, so it is evaluated once
+    ahead_of_page = Subquery(
+        newer.order_by().values('loan_id').annotate(total=Sum('amount')).values('total'),
+        output_field=money,
+    )
+    ahead_in_page = Window(
+        Sum('amount'), order_by=[F('date').desc(), F('id').desc()],
+        frame=RowRange(start=None, end=-1), output_field=money,
+    )
+    zero = Value(Decimal('0'), output_field=money)
+    return (
+        Payment.objects.filter(pk__in=page.values('pk'))
+        .alias(newer_total=Coalesce(ahead_of_page, zero) + Coalesce(ahead_in_page, zero))
+        .annotate(
+            paid_to_date=F('loan__amount_paid') - F('newer_total'),
+            # NULL until the loan is approved
+            balance=F('loan__remaining_balance') + F('newer_total'),
+        )
+        .order_by('-date', '-id')
+    )
+
@@ -0,0 +1,252 @@
+import itertools
+import json
+import logging
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from loan_system_end.database import sqlite_database, use_databases
+from loans.models import User, LoanApplication
+from loans.seeding import FIRST_NAMES, LAST_NAMES, SEED_PASSWORD, USERNAME_PREFIX, seed
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+SCENARIOS = ['login', 'register-apply', 'loan-list', 'loan-list-admin', 'loan-detail',
+             'payment-post', 'admin-decisions', 'user-search', 'loan-search', 'loan-payments']
+DECISION_BATCH = 10
+
+
+def percentile(sorted_values, pct):
+    # Nearest rank
+    index = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[index]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main endpoints (latency percentiles, throughput, queries per "
+        "request) on freshly seeded SQLite databases of each size, and write the "
+        "results as JSON for comparing versions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000',
+                            help="Comma separated loan counts, one seeded database each")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+        parser.add_argument('--output', default='bench-results.json')
+        parser.add_argument('--compare', help="Earlier results file to diff p95 latency against")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        scenarios = options['scenarios'].split(',')
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+        logging.getLogger('loan_system_end.requests').setLevel(logging.ERROR)
+        setup_test_environment()
+        original = dict(connections.settings)
+        workdir = Path(tempfile.mkdtemp(prefix='bench-api-'))
+        results = []
+        try:
+            # Every request renders: the response cache would only measure the cache
+            with override_settings(CACHES=NO_CACHE):
+                for size in sizes:
+                    use_databases({'default': sqlite_database(workdir / f'{size}.sqlite3')})
+                    call_command('migrate', verbosity=0)
+                    start = time.perf_counter()
+                    seed(max(size // 5, 1), size, seed=options['seed'])
+                    self.stdout.write(f"\n{size} loans (seeded in {time.perf_counter() - start:.0f}s)")
+                    bench = Bench(random.Random(options['seed']), options['requests'])
+                    for scenario in scenarios:
+                        result = dict(rows=size, scenario=scenario, **bench.run(scenario))
+                        self.report(result)
+                        results.append(result)
+                    connections.close_all()
+        finally:
+            use_databases(original)
+            teardown_test_environment()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        document = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': 'sqlite',
+                'requests_per_scenario': options['requests'],
+            },
+            'results': results,
+        }
+        Path(options['output']).write_text(json.dumps(document, indent=2) + '\n')
+        self.stdout.write(self.style.SUCCESS(f"\nWrote {options['output']}"))
+        if options['compare']:
+            self.compare(json.loads(Path(options['compare']).read_text()), document)
+
+    def report(self, result):
+        self.stdout.write(
+            f"  {result['scenario']:<17}{result['throughput_rps']:8.1f} req/s   "
+            f"p50 {result['p50_ms']:7.1f}  p95 {result['p95_ms']:7.1f}  p99 {result['p99_ms']:7.1f} ms   "
+            f"{result['queries_mean']:5.1f} queries   errors {result['errors']}"
+        )
+
+    def compare(self, before, after):
+        earlier = {(row['rows'], row['scenario']): row for row in before['results']}
+        label = before['meta'].get('revision') or before['meta'].get('created')
+        self.stdout.write(f"\np95 vs {label}:")
+        for row in after['results']:
+            old = earlier.get((row['rows'], row['scenario']))
+            if old is None:
+                continue
+            change = (row['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+            line = f"  {row['rows']:>8} {row['scenario']:<17}{old['p95_ms']:8.1f} -> {row['p95_ms']:8.1f} ms ({change:+.0f}%)"
+            self.stdout.write(self.style.WARNING(line) if change > 20 else line)
+
+
+class Bench:
+    """Runs one scenario at a time against the current database, in process."""
+
+    def __init__(self, rng, requests):
+        self.rng = rng
+        self.requests = requests
+        self.clients = {}
+        self.registrations = itertools.count()
+        self.admin = User.objects.create_user('bench-admin', password=SEED_PASSWORD, is_staff=True)
+        approved = LoanApplication.objects.filter(status='approved')
+        self.owned = list(approved.order_by('?').values_list('id', 'applicant_id')[:500])
+        self.loan_ids = list(LoanApplication.objects.order_by('?').values_list('id', flat=True)[:1000])
+        self.usernames = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('?')
+            .values_list('username', flat=True)[:500]
+        )
+        self.national_ids = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('?')
+            .values_list('national_id', flat=True)[:500]
+        )
+
+    def client_for(self, user_id):
+        client = self.clients.get(user_id)
+        if client is None:
+            client = self.clients[user_id] = Client()
+            client.force_login(User.objects.get(pk=user_id))
+        return client
+
+    def run(self, scenario):
+        make_request = getattr(self, scenario.replace('-', '_'))
+        latencies, queries, errors = [], [], 0
+        for _ in range(self.requests):
+            request = make_request()
+            if request is None:
+                break  # scenario ran out of data (e.g. pending loans)
+            start = time.perf_counter()
+            response = request()
+            latencies.append(time.perf_counter() - start)
+            queries.append(int(response.get('X-Query-Count', 0)))
+            errors += response.status_code >= 400
+        # Time spent in requests only, not in preparing them
+        elapsed = sum(latencies)
+        latencies = sorted(latency * 1000 for latency in latencies) or [0.0]
+        return {
+            'requests': len(queries),
+            'errors': errors,
+            'throughput_rps': round(len(queries) / elapsed, 1) if elapsed else 0.0,
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'queries_mean': round(statistics.fmean(queries), 1) if queries else 0.0,
+        }
+
+    # ===== Scenarios: each returns a zero-argument request, or None when out of data =====
+    def login(self):
+        username = self.rng.choice(self.usernames)
+        return lambda: Client().post('/api/login/', {'username': username, 'password': SEED_PASSWORD},
+                                     content_type='application/json')
+
+    def register_apply(self):
+        n = next(self.registrations)
+        data = {
+            'username': f'bench-applicant-{n}', 'password': SEED_PASSWORD,
+            'email': f'bench-applicant-{n}@example.com', 'first_name': 'Bench', 'last_name': 'Applicant',
+            'phone': '+255700000000', 'address': 'Dodoma', 'national_id': f'{n:012d}',
+            'loan_type': 'car', 'requested_amount': '2500000.00', 'assets_value': '9000000.00',
+            'monthly_income': '800000.00', 'sponsor_name': 'Sponsor', 'sponsor_address': 'Dodoma',
+            'sponsor_national_id': '000000000000', 'sponsor_phone': '+255700000001',
+            'sponsor_email': 'sponsor@example.com',
+        }
+        return lambda: Client().post('/api/register-apply/', data, content_type='application/json')
+
+    def loan_list(self):
+        client = self.client_for(self.rng.choice(self.owned)[1])
+        return lambda: client.get('/api/loans/')
+
+    def loan_list_admin(self):
+        client = self.client_for(self.admin.id)
+        return lambda: client.get('/api/loans/', {'status': 'pending', 'ordering': '-risk_score'})
+
+    def loan_detail(self):
+        client = self.client_for(self.admin.id)
+        loan_id = self.rng.choice(self.loan_ids)
+        return lambda: client.get(f'/api/loans/{loan_id}/')
+
+    def loan_payments(self):
+        loan_id, owner_id = self.rng.choice(self.owned)
+        client = self.client_for(owner_id)
+        return lambda: client.get(f'/api/loans/{loan_id}/payments/')
+
+    def payment_post(self):
+        loan_id, owner_id = self.rng.choice(self.owned)
+        client = self.client_for(owner_id)
+        data = {'loan': loan_id, 'amount': '10000.00', 'phone': '+255700000000'}
+        return lambda: client.post('/api/payments/', data, content_type='application/json')
+
+    def admin_decisions(self):
+        pending = list(
+            LoanApplication.objects.filter(status='pending').order_by('id')
+            .values_list('id', flat=True)[:DECISION_BATCH]
+        )
+        if not pending:
+            return None
+        client = self.client_for(self.admin.id)
+        data = {'decisions': [{'id': loan_id, 'status': self.rng.choice(['approved', 'rejected'])}
+                              for loan_id in pending]}
+        return lambda: client.post('/api/loans/decisions/', data, content_type='application/json')
+
+    def search_query(self):
+        # National ID, first name prefix or "first l" (a page of a large match set)
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        return self.rng.choice([self.rng.choice(self.national_ids), first[:3], f'{first} {last[0]}'])
+
+    def user_search(self):
+        client = self.client_for(self.admin.id)
+        query = self.search_query()
+        return lambda: client.get('/api/users/search/', {'q': query})
+
+    def loan_search(self):
+        client = self.client_for(self.admin.id)
+        query = self.search_query()
+        return lambda: client.get('/api/loans/search/', {'q': query})
+
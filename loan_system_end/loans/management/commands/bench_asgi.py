@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from loans.models import User, LoanApplication
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class InFlight:
+    def __init__(self):
+        self.now = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.now += 1
+            self.peak = max(self.peak, self.now)
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.now -= 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the read endpoints through the WSGI handler (one thread per "
+        "request) and the ASGI handler (one event loop) on a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/loans/?page_size=20')
+        parser.add_argument('--loans', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--connections', type=int, default=50,
+                            help="Concurrent client connections")
+        parser.add_argument('--threads', type=int, default=8,
+                            help="Request threads of the WSGI worker")
+        parser.add_argument('--cached', action='store_true',
+                            help="Keep the response cache on (default: every request renders)")
+
+    def handle(self, *args, **options):
+        logging.getLogger('loan_system_end.requests').setLevel(logging.WARNING)
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(**({} if options['cached'] else {'CACHES': NO_CACHE})):
+                session = self.seed(options['loans'])
+                self.stdout.write(
+                    f"{options['requests']} x GET {options['path']}, "
+                    f"{options['connections']} connections\n"
+                )
+                self.report(f"WSGI ({options['threads']} threads)", *self.run_wsgi(session, options))
+                # Run the loop on a fresh thread: like a real ASGI server, each
+                # request then opens its own connections instead of sharing
+                # this thread's
+                with ThreadPoolExecutor(1) as loop_thread:
+                    results = loop_thread.submit(asyncio.run, self.run_asgi(session, options)).result()
+                self.report('ASGI (1 event loop)', *results)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, count):
+        user = User.objects.create_user('bench-borrower', password='bench')
+        LoanApplication.objects.bulk_create(
+            LoanApplication(applicant=user, name='bench-borrower', loan_type='home',
+                            requested_amount=Decimal('1000000.00') + i)
+            for i in range(count)
+        )
+        client = Client()
+        client.force_login(user)
+        return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def run_wsgi(self, session, options):
+        local = threading.local()
+        in_flight = InFlight()
+
+        def get(submitted):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.cookies[settings.SESSION_COOKIE_NAME] = session
+            with in_flight:
+                status = local.client.get(options['path']).status_code
+            return status, time.perf_counter() - submitted
+
+        # All connections arrive up front; the worker serves `threads` at a time
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as worker:
+            results = []
+            for batch in range(0, options['requests'], options['connections']):
+                size = min(options['connections'], options['requests'] - batch)
+                submitted = time.perf_counter()
+                results.extend(worker.map(lambda _: get(submitted), range(size)))
+        return results, time.perf_counter() - start, in_flight.peak
+
+    async def run_asgi(self, session, options):
+        in_flight = InFlight()
+        client = AsyncClient()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session
+
+        async def get(submitted):
+            with in_flight:
+                res = await client.get(options['path'])
+            return res.status_code, time.perf_counter() - submitted
+
+        start = time.perf_counter()
+        results = []
+        for batch in range(0, options['requests'], options['connections']):
+            size = min(options['connections'], options['requests'] - batch)
+            submitted = time.perf_counter()
+            results.extend(await asyncio.gather(*(get(submitted) for _ in range(size))))
+        return results, time.perf_counter() - start, in_flight.peak
+
+    def report(self, label, results, elapsed, peak):
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for status, _ in results if status != 200)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:<22}{len(results) / elapsed:8.1f} req/s   "
+            f"p50 {statistics.median(latencies) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms   "
+            f"peak in-flight {peak:4d}   errors {errors}"
+        )
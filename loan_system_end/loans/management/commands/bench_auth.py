@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+
+from loans.hashing import HashingBusy, run_hashing
+
+
+class Command(BaseCommand):
+    help = "Benchmark password hashing cost: logins/sec per core and register-apply before/after."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=8)
+
+    def handle(self, *args, **options):
+        rounds = options['rounds']
+        encoded = make_password('benchmark-password')
+
+        def per_sec(func):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                func()
+            return rounds / (time.perf_counter() - start)
+
+        login = per_sec(lambda: check_password('benchmark-password', encoded))
+        before = per_sec(lambda: check_password('benchmark-password', make_password('benchmark-password')))
+        after = per_sec(lambda: make_password('benchmark-password'))
+
+        self.stdout.write(f"{'login (1 verify)':<42}{login:8.1f} /sec per core")
+        self.stdout.write(f"{'register-apply before (hash + verify)':<42}{before:8.1f} /sec per core")
+        self.stdout.write(f"{'register-apply after (hash only)':<42}{after:8.1f} /sec per core")
+
+        # Burst through the bounded pool: throughput is capped at
+        # PASSWORD_HASHING_WORKERS cores however many callers there are,
+        # and callers beyond the queue are turned away (503 in the views)
+        def attempt(_):
+            try:
+                return run_hashing(check_password, 'benchmark-password', encoded)
+            except HashingBusy:
+                return None
+
+        total = rounds * options['concurrency']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as callers:
+            results = list(callers.map(attempt, range(total)))
+        elapsed = time.perf_counter() - start
+        rejected = results.count(None)
+        label = f"login burst via pool ({options['concurrency']} callers)"
+        self.stdout.write(f"{label:<42}{(total - rejected) / elapsed:8.1f} /sec   {rejected} rejected")
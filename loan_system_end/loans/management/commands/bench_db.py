@@ -0,0 +1,111 @@
+import random
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from loan_system_end.database import REPLICA, sqlite_database, use_databases
+from loans.ledger import post_payment
+from loans.models import User, LoanApplication
+from loans.routers import replica_reads
+
+SCENARIOS = [
+    ('stock SQLite', {'wal': False}, False),
+    ('WAL + pragmas', {'wal': True}, False),
+    ('WAL + read alias', {'wal': True}, True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mixed read/write throughput on throwaway SQLite files: stock settings, "
+        "WAL + tuned pragmas, and WAL with list reads routed to a read-only alias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--loans', type=int, default=500)
+
+    def handle(self, *args, **options):
+        original = dict(connections.settings)
+        workdir = Path(tempfile.mkdtemp(prefix='bench-db-'))
+        try:
+            template = workdir / 'template.sqlite3'
+            use_databases({'default': sqlite_database(template, wal=False)})
+            call_command('migrate', verbosity=0)
+            self.seed(options['loans'])
+            connections['default'].close()
+
+            self.stdout.write(
+                f"{options['readers']} readers (list query) + {options['writers']} writers "
+                f"(post_payment), {options['seconds']:.0f}s each\n"
+            )
+            for label, sqlite_options, read_alias in SCENARIOS:
+                path = workdir / f"{label.replace(' ', '-').replace('+', '')}.sqlite3"
+                shutil.copy(template, path)
+                databases = {'default': sqlite_database(path, **sqlite_options)}
+                if read_alias:
+                    databases[REPLICA] = sqlite_database(path, read_only=True, **sqlite_options)
+                use_databases(databases)
+                self.report(label, self.run_mixed(options))
+        finally:
+            use_databases(original)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def seed(self, count):
+        user = User.objects.create_user('bench-borrower', password='bench')
+        LoanApplication.objects.bulk_create(
+            LoanApplication(applicant=user, name='bench-borrower', loan_type='home', status='approved',
+                            requested_amount=Decimal('1000000.00'), approved_amount=Decimal('1000000.00'),
+                            remaining_balance=Decimal('1000000.00'))
+            for _ in range(count)
+        )
+
+    def run_mixed(self, options):
+        loan_ids = list(LoanApplication.objects.values_list('id', flat=True))
+        counts = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['seconds']
+
+        def count(name):
+            with lock:
+                counts[name] += 1
+
+        def reader():
+            while time.perf_counter() < deadline:
+                with replica_reads():
+                    list(LoanApplication.objects.filter(status='approved').order_by('-created_at', '-id')[:50])
+                count('reads')
+            connections.close_all()
+
+        def writer():
+            while time.perf_counter() < deadline:
+                try:
+                    post_payment(random.choice(loan_ids), Decimal('1.00'), '+255700000000')
+                    count('writes')
+                except OperationalError:
+                    # "database is locked"
+                    count('locked')
+            connections.close_all()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {name: value / options['seconds'] for name, value in counts.items()}
+
+    def report(self, label, rates):
+        self.stdout.write(
+            f"{label:<20}{rates['reads']:9.1f} reads/s{rates['writes']:9.1f} writes/s"
+            f"{rates['locked']:9.1f} locked errors/s"
+        )
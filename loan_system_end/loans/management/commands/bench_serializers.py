@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework.renderers import JSONRenderer
+
+from loan_system_end.database import sqlite_database, use_databases
+from loans.models import LoanApplication
+from loans.renderers import FastJSONRenderer
+from loans.rows import ValuesSerializer
+from loans.seeding import seed
+from loans.serializers import LoanApplicationSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Rows serialized per second for a page of loans: LoanApplicationSerializer + "
+        "JSONRenderer against values() rows + FastJSONRenderer, on a throwaway seeded "
+        "SQLite file. Fails if the two outputs differ by a byte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loans', type=int, default=5000)
+        parser.add_argument('--page-size', type=int, default=1000)
+        parser.add_argument('--rounds', type=int, default=10)
+
+    def handle(self, *args, **options):
+        original = dict(connections.settings)
+        workdir = Path(tempfile.mkdtemp(prefix='bench-serializers-'))
+        try:
+            use_databases({'default': sqlite_database(workdir / 'bench.sqlite3')})
+            call_command('migrate', verbosity=0)
+            seed(max(options['loans'] // 5, 1), options['loans'], seed=1)
+            self.run(options['page_size'], options['rounds'])
+        finally:
+            connections.close_all()
+            use_databases(original)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run(self, page_size, rounds):
+        queryset = LoanApplication.objects.order_by('-created_at', '-id')
+        rows = ValuesSerializer(LoanApplicationSerializer)
+
+        def serializer():
+            return JSONRenderer().render(LoanApplicationSerializer(queryset[:page_size], many=True).data)
+
+        def values():
+            return FastJSONRenderer().render(rows.serialize(queryset.values(*rows.columns)[:page_size]))
+
+        if serializer() != values():
+            raise CommandError("values() rows render differently from the serializer")
+
+        self.stdout.write(f"{page_size} loans per page, best of {rounds} (query + serialize + render)\n")
+        baseline = None
+        for label, func in (('ModelSerializer + JSONRenderer', serializer),
+                            ('values() rows + FastJSONRenderer', values)):
+            best = min(self.time(func) for _ in range(rounds))
+            rate = page_size / best
+            baseline = baseline or rate
+            self.stdout.write(f"{label:<36}{rate:10.0f} rows/sec   {best * 1000:7.1f} ms/page   "
+                              f"x{rate / baseline:.1f}")
+
+    @staticmethod
+    def time(func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
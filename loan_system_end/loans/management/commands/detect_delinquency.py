@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from loans.delinquency import detect_delinquency
+
+
+class Command(BaseCommand):
+    help = (
+        "Update days past due, arrears and delinquency status (daily). Only loans "
+        "with payments or due dates since the last run are read, unless --full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Ignore the watermark and check every approved loan")
+        parser.add_argument('--as-of', help="Date to compute positions for (default: today)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['as_of']:
+            as_of = parse_date(options['as_of'])
+            if as_of is None:
+                raise CommandError("--as-of must be an ISO date")
+        start = time.perf_counter()
+        count = detect_delinquency(as_of, full=options['full'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f"Checked {count} loans in {elapsed:.2f}s ({rate:.0f} loans/sec)"))
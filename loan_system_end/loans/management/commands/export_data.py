@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from loans.export import LOAN_COLUMNS, PAYMENT_COLUMNS, export_stream
+from loans.filters import filter_loans
+from loans.models import LoanApplication, Payment
+
+
+class Command(BaseCommand):
+    help = "Stream loans or payments to a CSV/NDJSON file (or stdout) in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=['loans', 'payments'])
+        parser.add_argument('--output', '-o', help="Output file; defaults to stdout")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--status')
+        parser.add_argument('--loan-type')
+        parser.add_argument('--created-after')
+        parser.add_argument('--created-before')
+        parser.add_argument('--min-amount')
+        parser.add_argument('--max-amount')
+
+    def handle(self, *args, **options):
+        if options['table'] == 'loans':
+            params = {key: options[key] for key in (
+                'status', 'loan_type', 'created_after', 'created_before', 'min_amount', 'max_amount',
+            )}
+            try:
+                queryset = filter_loans(LoanApplication.objects.all(), params).order_by('created_at', 'id')
+            except ValidationError as exc:
+                raise CommandError(exc.detail)
+            columns = LOAN_COLUMNS
+        else:
+            queryset = Payment.objects.order_by('date', 'id')
+            columns = PAYMENT_COLUMNS
+
+        chunks = export_stream(queryset, columns, options['format'], options['gzip'])
+        if options['output']:
+            with open(options['output'], 'wb') as out:
+                for chunk in chunks:
+                    out.write(chunk)
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
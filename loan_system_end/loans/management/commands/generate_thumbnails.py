@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from loans.media import process_photo, thumbnail_name
+from loans.models import User, LoanApplication
+
+
+class Command(BaseCommand):
+    help = "Generate missing WebP thumbnails for profile and sponsor photos."
+
+    def handle(self, *args, **options):
+        done = 0
+        for model, photo_field, thumb_field in (
+            (User, 'profile_photo', 'profile_thumbnail'),
+            (LoanApplication, 'sponsor_photo', 'sponsor_thumbnail'),
+        ):
+            rows = (
+                model.objects.exclude(**{photo_field: ''}).exclude(**{f'{photo_field}__isnull': True})
+                .values_list('pk', photo_field, thumb_field).iterator(chunk_size=1000)
+            )
+            for pk, photo, thumb in rows:
+                if thumb != thumbnail_name(photo):
+                    process_photo(model, pk, photo_field, photo)
+                    done += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} photos"))
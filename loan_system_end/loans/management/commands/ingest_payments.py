@@ -0,0 +1,38 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loans.ingest import UndecodableFile, detect_format, ingest_payments, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Post payments from a provider settlement file (CSV or NDJSON)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--errors', help="Write the per-row error report to this CSV file")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as lines:
+                report = ingest_payments(iter_rows(lines, fmt), chunk_size=options['chunk_size'])
+        except (OSError, UndecodableFile) as exc:
+            raise CommandError(str(exc))
+
+        if options['errors']:
+            with open(options['errors'], 'w', newline='') as out:
+                writer = csv.writer(out)
+                writer.writerow(['line', 'error'])
+                writer.writerows(report.errors)
+        else:
+            for line, message in report.errors:
+                self.stderr.write(f"line {line}: {message}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.rows} rows: {report.posted} posted, {report.duplicates} duplicates, "
+            f"{len(report.errors)} failed in {report.elapsed:.2f}s ({report.rows_per_sec:.0f} rows/sec)"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from loans.summary import rebuild_summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild PortfolioSummary from LoanApplication with a single aggregate query."
+
+    def handle(self, *args, **options):
+        count = rebuild_summary()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} summary buckets"))
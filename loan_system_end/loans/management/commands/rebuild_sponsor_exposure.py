@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from loans.exposure import rebuild_exposure
+
+
+class Command(BaseCommand):
+    help = "Rebuild SponsorExposure from LoanApplication with a single aggregate query."
+
+    def handle(self, *args, **options):
+        count = rebuild_exposure()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt exposure for {count} sponsors"))
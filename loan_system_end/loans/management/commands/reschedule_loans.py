@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from loans.amortization import MAX_INTEREST_RATE, reschedule_loans
+from loans.filters import filter_loans
+from loans.models import LoanApplication
+
+
+class Command(BaseCommand):
+    help = "Recompute stored installment schedules for approved loans, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loan-type', help="Only loans of this type (comma separated)")
+        parser.add_argument('--created-after', help="Only loans created on/after this date")
+        parser.add_argument('--created-before', help="Only loans created on/before this date")
+        parser.add_argument('--rate', type=float, help="New annual interest rate (percent)")
+        parser.add_argument('--term', type=int, help="New term in months")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['rate'] is not None and not 0 <= options['rate'] <= MAX_INTEREST_RATE:
+            raise CommandError(f"--rate must be between 0 and {MAX_INTEREST_RATE}")
+        params = {
+            'loan_type': options['loan_type'],
+            'created_after': options['created_after'],
+            'created_before': options['created_before'],
+        }
+        try:
+            queryset = filter_loans(LoanApplication.objects.all(), params)
+        except ValidationError as exc:
+            raise CommandError(exc.detail)
+
+        start = time.perf_counter()
+        count = reschedule_loans(
+            queryset,
+            interest_rate=options['rate'],
+            term=options['term'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Rescheduled {count} loans in {elapsed:.2f}s ({rate:.0f} loans/sec)"
+        ))
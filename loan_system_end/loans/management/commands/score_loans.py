@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from loans.models import LoanApplication
+from loans.scoring import score_loans
+
+
+class Command(BaseCommand):
+    help = "Recompute affordability ratios and risk scores (nightly), pending loans by default."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Score every loan, not just pending ones")
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        queryset = LoanApplication.objects.all() if options['all'] else None
+        start = time.perf_counter()
+        count = score_loans(queryset, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f"Scored {count} loans in {elapsed:.2f}s ({rate:.0f} loans/sec)"))
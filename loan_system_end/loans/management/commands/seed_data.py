@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from loans.seeding import SEED_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic borrowers, loans across every status and type, installment "
+        "schedules and payment histories in bulk (load tests / benchmarks)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loans', type=int, default=10000)
+        parser.add_argument('--users', type=int, help="Borrowers to create (default: one per 5 loans)")
+        parser.add_argument('--months', type=int, default=24, help="History that created_at is spread over")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, help="Random seed, for a reproducible dataset")
+
+    def handle(self, *args, **options):
+        users = options['users'] or max(options['loans'] // 5, 1)
+        start = time.perf_counter()
+        counts = seed(users, options['loans'], months=options['months'],
+                      batch_size=options['batch_size'], seed=options['seed'])
+        elapsed = time.perf_counter() - start
+        rows = sum(counts.values())
+        summary = ', '.join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Seeded {summary} in {elapsed:.1f}s ({rows / elapsed:.0f} rows/sec)"))
+        self.stdout.write(f"Every synthetic user's password is {SEED_PASSWORD!r}")
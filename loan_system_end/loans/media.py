@@ -0,0 +1,96 @@
+# loans/media.py
+"""
+Post-commit image processing: WebP thumbnails for profile and sponsor
+photos, generated off the request thread.
+
+Thumbnail names derive from the (content-addressed) original name, so a
+photo shared by several loans is resized once.
+"""
+import io
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .cache import invalidate
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+
+# (model label, photo field) -> thumbnail field
+THUMBNAIL_FIELDS = {
+    ('loans.User', 'profile_photo'): 'profile_thumbnail',
+    ('loans.LoanApplication', 'sponsor_photo'): 'sponsor_thumbnail',
+}
+
+_executor = None
+
+
+def thumbnail_name(photo_name):
+    stem = posixpath.splitext(posixpath.basename(photo_name))[0]
+    return f"thumbs/{stem}_{THUMBNAIL_SIZE[0]}.webp"
+
+
+def make_thumbnail(photo_name):
+    """Write the WebP thumbnail of a stored photo unless it already exists."""
+    name = thumbnail_name(photo_name)
+    if image_storage.exists(name):
+        return name
+    with image_storage.open(photo_name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        out = io.BytesIO()
+        image.save(out, format='WEBP', quality=80)
+    # Stored under the derived name, not its own hash, so it can be found again
+    return image_storage.save_exact(name, ContentFile(out.getvalue()))
+
+
+def process_photo(model, pk, photo_field, photo_name):
+    """Generate a thumbnail and point the row at it, if the photo is unchanged."""
+    thumb_field = THUMBNAIL_FIELDS[(model._meta.label, photo_field)]
+    try:
+        thumb = make_thumbnail(photo_name)
+        if model.objects.filter(pk=pk, **{photo_field: photo_name}).update(**{thumb_field: thumb}):
+            # update() sends no signals; cached responses still lack the thumbnail
+            invalidate()
+    except Exception:
+        logger.exception("Thumbnail failed for %s %s %s", model._meta.label, pk, photo_name)
+
+
+def _run_in_background(*args):
+    close_old_connections()
+    try:
+        process_photo(*args)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2),
+            thread_name_prefix='image-processing',
+        )
+    return _executor
+
+
+def schedule_thumbnail(instance, photo_field):
+    """Queue thumbnail generation for after the current transaction commits."""
+    photo = getattr(instance, photo_field)
+    thumb_field = THUMBNAIL_FIELDS[(instance._meta.label, photo_field)]
+    if not photo or getattr(instance, thumb_field).name == thumbnail_name(photo.name):
+        return
+    args = (type(instance), instance.pk, photo_field, photo.name)
+    if getattr(settings, 'IMAGE_PROCESSING_SYNC', False):
+        transaction.on_commit(lambda: process_photo(*args))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_background, *args))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:02
+
+from django.db import migrations
+
+
+def backfill_names(apps, schema_editor):
+    # The serializer now reads the stored name instead of joining applicant
+    LoanApplication = apps.get_model('loans', 'LoanApplication')
+    pending = []
+    for loan in LoanApplication.objects.filter(name='').select_related('applicant').iterator(chunk_size=2000):
+        applicant = loan.applicant
+        loan.name = f"{applicant.first_name} {applicant.last_name}".strip() or applicant.username
+        pending.append(loan)
+        if len(pending) >= 2000:
+            LoanApplication.objects.bulk_update(pending, ['name'])
+            pending = []
+    if pending:
+        LoanApplication.objects.bulk_update(pending, ['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0004_loanapplication_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:46
+
+import loans.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0007_payment_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanapplication',
+            name='sponsor_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, storage=loans.storage.get_image_storage, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, storage=loans.storage.get_image_storage, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='loanapplication',
+            name='sponsor_photo',
+            field=models.ImageField(blank=True, null=True, storage=loans.storage.get_image_storage, upload_to='sponsors/'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='profile_photo',
+            field=models.ImageField(blank=True, null=True, storage=loans.storage.get_image_storage, upload_to='profiles/'),
+        ),
+    ]
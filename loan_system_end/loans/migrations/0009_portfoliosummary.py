@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:49
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+
+def build_summary(apps, schema_editor):
+    # Same aggregate as loans.summary.rebuild_summary, on historical models
+    LoanApplication = apps.get_model('loans', 'LoanApplication')
+    PortfolioSummary = apps.get_model('loans', 'PortfolioSummary')
+    zero = Value(Decimal('0'))
+    buckets = (
+        LoanApplication.objects
+        .annotate(month=TruncMonth('created_at', output_field=DateField()))
+        .values('status', 'loan_type', 'month')
+        .annotate(
+            loan_count=Count('id'),
+            requested_total=Coalesce(Sum('requested_amount'), zero),
+            approved_total=Coalesce(Sum('approved_amount'), zero),
+            amount_paid_total=Coalesce(Sum('amount_paid'), zero),
+            outstanding_total=Coalesce(Sum('remaining_balance'), zero),
+        )
+        .order_by()
+    )
+    PortfolioSummary.objects.bulk_create(PortfolioSummary(**bucket) for bucket in buckets)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0008_content_addressed_images_and_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('contract_rejected', 'Contract Rejected')], max_length=20)),
+                ('loan_type', models.CharField(choices=[('home', 'Home'), ('car', 'Car'), ('education', 'Education'), ('business', 'Business')], max_length=20)),
+                ('month', models.DateField()),
+                ('loan_count', models.IntegerField(default=0)),
+                ('requested_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('approved_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('amount_paid_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('outstanding_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('status', 'loan_type', 'month'), name='summary_bucket_uniq')],
+            },
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0010_loan_risk_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='loanapplication',
+            name='arrears',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='loanapplication',
+            name='days_past_due',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='loanapplication',
+            name='delinquency_checked_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='loanapplication',
+            name='delinquency_status',
+            field=models.CharField(choices=[('current', 'Current'), ('late', 'Late'), ('delinquent', 'Delinquent'), ('defaulted', 'Defaulted')], default='current', editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='installment',
+            index=models.Index(fields=['due_date'], name='installment_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['delinquency_status', 'created_at', 'id'], name='loan_delinquency_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['delinquency_checked_at'], name='loan_delinquency_checked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['date'], name='payment_date_idx'),
+        ),
+    ]
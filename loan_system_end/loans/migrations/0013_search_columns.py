@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:10
+
+from django.db import migrations, models
+
+from loans.models import search_key
+
+
+def _backfill(model, sources, fields, compute):
+    pending = []
+    for obj in model.objects.only('id', *sources).iterator(chunk_size=2000):
+        compute(obj)
+        pending.append(obj)
+        if len(pending) >= 2000:
+            model.objects.bulk_update(pending, fields)
+            pending = []
+    if pending:
+        model.objects.bulk_update(pending, fields)
+
+
+def backfill_search_columns(apps, schema_editor):
+    # Filled before the indexes are built
+    def user_names(user):
+        user.search_name = search_key(user.first_name, user.last_name) or search_key(user.username)
+        user.search_surname = search_key(user.last_name, user.first_name) or user.search_name
+
+    def loan_name(loan):
+        loan.search_name = search_key(loan.name)
+
+    _backfill(apps.get_model('loans', 'User'), ['first_name', 'last_name', 'username'],
+              ['search_name', 'search_surname'], user_names)
+    _backfill(apps.get_model('loans', 'LoanApplication'), ['name'], ['search_name'], loan_name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('loans', '0012_tokensession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanapplication',
+            name='search_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='search_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='search_surname',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_search_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['sponsor_national_id'], name='loan_sponsor_national_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['search_name', 'id'], name='loan_search_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['national_id'], name='user_national_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['phone'], name='user_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['search_name', 'id'], name='user_search_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['search_surname', 'id'], name='user_search_surname_idx'),
+        ),
+    ]
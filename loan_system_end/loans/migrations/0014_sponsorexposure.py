@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:26
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def build_exposure(apps, schema_editor):
+    # Same aggregate as loans.exposure.rebuild_exposure, on historical models
+    LoanApplication = apps.get_model('loans', 'LoanApplication')
+    SponsorExposure = apps.get_model('loans', 'SponsorExposure')
+    zero = Value(Decimal('0'))
+    sponsors = (
+        LoanApplication.objects
+        .filter(Q(status='approved', remaining_balance__gt=0) & ~Q(sponsor_national_id=''))
+        .values('sponsor_national_id')
+        .annotate(
+            active_loans=Count('id'),
+            approved_total=Coalesce(Sum('approved_amount'), zero),
+            outstanding_total=Coalesce(Sum('remaining_balance'), zero),
+        )
+        .order_by()
+    )
+    SponsorExposure.objects.bulk_create(SponsorExposure(**sponsor) for sponsor in sponsors)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0013_search_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SponsorExposure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sponsor_national_id', models.CharField(max_length=20, unique=True)),
+                ('active_loans', models.IntegerField(default=0)),
+                ('approved_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('outstanding_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+        ),
+        migrations.RunPython(build_exposure, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,52 @@
 # loans/models.py
+import re
+import unicodedata
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from .storage import get_image_storage
+
+
+def search_key(*parts):
+    """Lowercase, accent-free words of `parts`, as stored in the search columns (loans.search)."""
+    text = unicodedata.normalize('NFKD', ' '.join(part for part in parts if part))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    text = re.sub(r"['\u2019]", '', text)  # N'gowi -> ngowi
+    return re.sub(r'[\W_]+', ' ', text).strip()[:255]
+
+
 class User(AbstractUser):
     is_admin = models.BooleanField(default=False)
     phone = models.CharField(max_length=13, blank=True)
     address = models.CharField(max_length=255, blank=True)
-    profile_photo = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    profile_photo = models.ImageField(upload_to='profiles/', storage=get_image_storage, blank=True, null=True)
+    profile_thumbnail = models.ImageField(storage=get_image_storage, blank=True, null=True, editable=False)
     national_id = models.CharField(max_length=20, blank=True)  # new field
 
+    # Name search (loans.search): "first last" and "last first", or the username
+    search_name = models.CharField(max_length=255, blank=True, editable=False)
+    search_surname = models.CharField(max_length=255, blank=True, editable=False)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['national_id'], name='user_national_id_idx'),
+            models.Index(fields=['phone'], name='user_phone_idx'),
+            models.Index(fields=['search_name', 'id'], name='user_search_name_idx'),
+            models.Index(fields=['search_surname', 'id'], name='user_search_surname_idx'),
+        ]
+
+    def set_search_names(self):
+        self.search_name = search_key(self.first_name, self.last_name) or search_key(self.username)
+        self.search_surname = search_key(self.last_name, self.first_name) or self.search_name
+
+    def save(self, *args, **kwargs):
+        self.set_search_names()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'first_name', 'last_name', 'username'}.isdisjoint(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'search_name', 'search_surname'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.username
 
@@ -40,6 +78,7 @@ class LoanApplication(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     contract_accepted = models.BooleanField(null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    approved_at = models.DateTimeField(null=True, blank=True)
 
     # Extra applicant financial info
     assets_value = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
@@ -51,25 +90,156 @@ class LoanApplication(models.Model):
     sponsor_national_id = models.CharField(max_length=20, blank=True)
     sponsor_phone = models.CharField(max_length=13, blank=True)
     sponsor_email = models.EmailField(blank=True)
-    sponsor_photo = models.ImageField(upload_to='sponsors/', blank=True, null=True)
+    sponsor_photo = models.ImageField(upload_to='sponsors/', storage=get_image_storage, blank=True, null=True)
+    sponsor_thumbnail = models.ImageField(storage=get_image_storage, blank=True, null=True, editable=False)
 
     # Optional: store applicant's name directly (automatic copy from user)
     name = models.CharField(max_length=255, blank=True)
+    search_name = models.CharField(max_length=255, blank=True, editable=False)  # search_key(name)
+
+    # Affordability / risk, written in bulk by loans.scoring (NULL = not scored)
+    debt_to_income = models.FloatField(null=True, blank=True, editable=False)
+    loan_to_assets = models.FloatField(null=True, blank=True, editable=False)
+    exposure_ratio = models.FloatField(null=True, blank=True, editable=False)
+    risk_score = models.FloatField(null=True, blank=True, editable=False)
+    scored_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Written by loans.delinquency (NULL checked_at = due for a check)
+    DELINQUENCY_CHOICES = [
+        ('current', 'Current'),
+        ('late', 'Late'),              # 1-29 days past due
+        ('delinquent', 'Delinquent'),  # 30-89
+        ('defaulted', 'Defaulted'),    # 90+
+    ]
+    days_past_due = models.IntegerField(default=0, editable=False)
+    arrears = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    delinquency_status = models.CharField(max_length=20, choices=DELINQUENCY_CHOICES, default='current', editable=False)
+    delinquency_checked_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks on (created_at, id); the filtered
+            # variants let status/loan_type lists use the same seek.
+            models.Index(fields=['created_at', 'id'], name='loan_created_id_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='loan_status_created_idx'),
+            models.Index(fields=['loan_type', 'created_at', 'id'], name='loan_type_created_idx'),
+            models.Index(fields=['applicant', 'created_at', 'id'], name='loan_applicant_created_idx'),
+            models.Index(fields=['status', 'requested_amount'], name='loan_status_amount_idx'),
+            # Review queue ranked by risk (?status=pending&ordering=-risk_score)
+            models.Index(fields=['status', 'risk_score', 'id'], name='loan_status_risk_idx'),
+            # Covers the per-applicant outstanding balance sum used by scoring
+            models.Index(fields=['applicant', 'status', 'remaining_balance'], name='loan_applicant_exposure_idx'),
+            # ?overdue=true lists, and the loans the delinquency job re-checks daily
+            models.Index(fields=['delinquency_status', 'created_at', 'id'], name='loan_delinquency_created_idx'),
+            models.Index(fields=['delinquency_checked_at'], name='loan_delinquency_checked_idx'),
+            # Search (loans.search): sponsor ID lookups, applicant name prefixes
+            models.Index(fields=['sponsor_national_id'], name='loan_sponsor_national_id_idx'),
+            models.Index(fields=['search_name', 'id'], name='loan_search_name_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.name and self.applicant:
             self.name = self.applicant.get_full_name() or self.applicant.username
+        self.search_name = search_key(self.name)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.applicant.username} - {self.loan_type}"
 
 
+class Installment(models.Model):
+    """One row of a loan's repayment schedule, written on approval."""
+    loan = models.ForeignKey(LoanApplication, on_delete=models.CASCADE, related_name='installments')
+    number = models.PositiveSmallIntegerField()
+    due_date = models.DateField()
+    principal = models.DecimalField(max_digits=12, decimal_places=2)
+    interest = models.DecimalField(max_digits=12, decimal_places=2)
+    balance = models.DecimalField(max_digits=12, decimal_places=2)  # principal left after this installment
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['loan', 'number'], name='installment_loan_number_uniq'),
+        ]
+        indexes = [
+            # Installments falling due since the delinquency job's last run
+            models.Index(fields=['due_date'], name='installment_due_idx'),
+        ]
+
+    @property
+    def amount(self):
+        return self.principal + self.interest
+
+    def __str__(self):
+        return f"{self.loan_id} #{self.number} - {self.due_date}"
+
+
 class Payment(models.Model):
     loan = models.ForeignKey(LoanApplication, on_delete=models.CASCADE, related_name='payments')
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     phone = models.CharField(max_length=13)
     date = models.DateTimeField(auto_now_add=True)
+    # Provider reference; retries with the same key are not posted twice
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Payments posted since the delinquency job's last run
+            models.Index(fields=['date'], name='payment_date_idx'),
+            # A loan's history, newest first (/api/loans/{id}/payments/)
+            models.Index(fields=['loan', 'date', 'id'], name='payment_loan_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.loan} - {self.amount}"
+
+
+class PortfolioSummary(models.Model):
+    """Loan totals per (status, loan_type, month), kept current by loans.summary."""
+    status = models.CharField(max_length=20, choices=LoanApplication.STATUS_CHOICES)
+    loan_type = models.CharField(max_length=20, choices=LoanApplication.LOAN_TYPES)
+    month = models.DateField()  # first day of the month the loan was created
+    loan_count = models.IntegerField(default=0)
+    requested_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    approved_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    amount_paid_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    outstanding_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'loan_type', 'month'], name='summary_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.status} {self.loan_type}"
+
+
+class SponsorExposure(models.Model):
+    """Active (approved, unpaid) loans a sponsor guarantees, kept current by loans.exposure."""
+    sponsor_national_id = models.CharField(max_length=20, unique=True)
+    active_loans = models.IntegerField(default=0)
+    approved_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    outstanding_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.sponsor_national_id}: {self.active_loans} active"
+
+
+class JobWatermark(models.Model):
+    """Where an incremental job stopped: the start time of its last completed run."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
+
+
+class TokenSession(models.Model):
+    """One API login: its refresh token's generation and whether it was revoked (loans.tokens)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='token_sessions')
+    generation = models.PositiveIntegerField(default=0)  # bumped by every refresh
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user} #{self.pk}"
@@ -0,0 +1,213 @@
+# loans/pagination.py
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique (field, pk) key.
+
+    Each page is fetched with an indexed ``WHERE (a, b) < (x, y)`` seek
+    instead of an OFFSET, so deep pages cost the same as the first one.
+    Both ordering fields must share a direction. ``orderings`` lists the
+    alternatives a client may pick with ``?ordering=``; ordering on a
+    nullable field pages through the rows where it is set, then the NULLs
+    (by id), in both directions.
+    """
+    ordering = ('-created_at', '-id')
+    orderings = {}
+    ordering_query_param = 'ordering'
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+    nulls_last = False  # set per request: the first ordering field is nullable
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, request):
+        value = request.query_params.get(self.ordering_query_param)
+        if not value:
+            return type(self).ordering
+        if value not in self.orderings:
+            raise ValidationError({self.ordering_query_param: f"Use one of {', '.join(self.orderings)}"})
+        return self.orderings[value]
+
+    def encode_cursor(self, obj):
+        # Model instances, or values() rows
+        get = obj.__getitem__ if isinstance(obj, dict) else obj.__getattribute__
+        values = [get(field.lstrip('-')) for field in self.ordering]
+        values = [None if value is None else str(value) for value in values]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request):
+        raw = request.query_params.get(self.cursor_query_param)
+        if not raw:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(raw.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering) or not self.cursor_is_valid(values):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def cursor_is_valid(self, values):
+        # encode_cursor writes strings, and None for a NULL first field
+        return (values[0] is None or isinstance(values[0], str)) and all(isinstance(v, str) for v in values[1:])
+
+    def seek_filter(self, values):
+        (first, second) = [field.lstrip('-') for field in self.ordering]
+        op = 'lt' if self.ordering[0].startswith('-') else 'gt'
+        if values[0] is None:
+            # Past the last set value: walking the NULLs by id
+            return Q(**{f'{first}__isnull': True, f'{second}__{op}': values[1]})
+        seek = Q(**{f'{first}__{op}': values[0]}) | Q(**{first: values[0], f'{second}__{op}': values[1]})
+        if self.nulls_last:
+            seek |= Q(**{f'{first}__isnull': True})
+        return seek
+
+    def page_queryset(self, queryset, request):
+        """The seek query for the requested page, one row longer than the page."""
+        self.request = request
+        self.current_page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        first = self.ordering[0].lstrip('-')
+        self.nulls_last = queryset.model._meta.get_field(first).null
+        if self.nulls_last:
+            # NULLs sort last in either direction, so every row is reached
+            direction = 'desc' if self.ordering[0].startswith('-') else 'asc'
+            queryset = queryset.order_by(getattr(F(first), direction)(nulls_last=True), self.ordering[1])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        values = self.decode_cursor(request)
+        if values is not None:
+            try:
+                queryset = queryset.filter(self.seek_filter(values))
+            except (TypeError, ValueError, DjangoValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        # Fetch one extra row to know whether a next page exists
+        return queryset[:self.current_page_size + 1]
+
+    def finish_page(self, rows):
+        self.has_next = len(rows) > self.current_page_size
+        page = rows[:self.current_page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        return self.finish_page([obj async for obj in self.page_queryset(queryset, request)])
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class LoanCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+    orderings = {
+        '-created_at': ('-created_at', '-id'),
+        'created_at': ('created_at', 'id'),
+        '-risk_score': ('-risk_score', '-id'),
+        'risk_score': ('risk_score', 'id'),
+    }
+
+
+class PaymentHistoryPagination(KeysetPagination):
+    """One loan's payments, newest first, along the (loan, date, id) index."""
+    ordering = ('-date', '-id')
+    max_page_size = 200
+
+    def preceding(self, queryset):
+        """Rows of `queryset` on the pages before the current one."""
+        values = self.decode_cursor(self.request)
+        if values is None:
+            return queryset.none()
+        try:
+            return queryset.exclude(self.seek_filter(values))
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class SearchPagination(KeysetPagination):
+    """
+    Pages through ranked search matches (see loans.search): the cursor is
+    (rank, key, id), and each rank is walked along its (key, id) index.
+    """
+    ordering = ('rank', 'key', 'id')
+    page_size = 20
+    max_page_size = 100
+
+    def encode_cursor(self, entry):
+        rank, _, key, obj = entry
+        values = [rank, str(getattr(obj, key)), obj.pk]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def cursor_is_valid(self, values):
+        rank, key_value, pk = values
+        # Match keys are strings (encode_cursor); JSON true/false would pass as ints
+        return _is_int(rank) and rank >= 0 and isinstance(key_value, str) and _is_int(pk)
+
+    def paginate_matches(self, matches, request):
+        """``[(rank, label, key, obj), ...]`` for the requested page."""
+        self.request = request
+        self.current_page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        start = 0
+        if cursor is not None:
+            start = cursor[0]
+            if start >= len(matches):
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = []
+        for rank, (label, queryset, key) in enumerate(matches[start:], start):
+            if cursor is not None and rank == start:
+                queryset = queryset.filter(Q(**{f'{key}__gt': cursor[1]}) | Q(**{key: cursor[1], 'id__gt': cursor[2]}))
+            limit = self.current_page_size + 1 - len(rows)
+            try:
+                rows.extend((rank, label, key, obj) for obj in queryset.order_by(key, 'id')[:limit])
+            except (TypeError, ValueError, DjangoValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            if len(rows) > self.current_page_size:
+                break
+        return self.finish_page(rows)
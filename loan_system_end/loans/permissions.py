@@ -1,22 +1,31 @@
 from rest_framework import permissions
 
-class IsOwnerOrAdmin(permissions.BasePermission):
+
+def is_owner_or_admin(user, obj):
     """
-    Custom permission to allow only the owner of an object or admin users to access/edit it.
+    Object check shared by IsOwnerOrAdmin and the async read views. Only
+    compares ids already loaded on `obj`, so it never queries.
     """
+    # Admin users or custom is_admin can do anything
+    if user.is_staff or getattr(user, 'is_admin', False):
+        return True
 
-    def has_object_permission(self, request, view, obj):
-        # Admin users or custom is_admin can do anything
-        if request.user.is_staff or getattr(request.user, 'is_admin', False):
-            return True
+    # Check kama ni owner wa LoanApplication (FK id, no extra query)
+    if hasattr(obj, 'applicant_id'):
+        return obj.applicant_id == user.id
+
+    # Check kama ni owner wa Payment (views select_related('loan'))
+    if hasattr(obj, 'loan_id'):
+        return obj.loan.applicant_id == user.id
 
-        # Check kama ni owner wa LoanApplication
-        if hasattr(obj, 'applicant'):
-            return obj.applicant == request.user
+    # Default deny
+    return False
 
-        # Check kama ni owner wa Payment
-        if hasattr(obj, 'loan'):
-            return obj.loan.applicant == request.user
 
-        # Default deny
-        return False
+class IsOwnerOrAdmin(permissions.BasePermission):
+    """
+    Custom permission to allow only the owner of an object or admin users to access/edit it.
+    """
+
+    def has_object_permission(self, request, view, obj):
+        return is_owner_or_admin(request.user, obj)
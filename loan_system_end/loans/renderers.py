@@ -0,0 +1,56 @@
+# loans/renderers.py
+"""
+DRF's JSONRenderer, with orjson doing the encoding whenever it can.
+
+The bytes are exactly what JSONRenderer writes: compact separators,
+unescaped UTF-8, U+2028 / U+2029 escaped. orjson only disagrees with
+json.dumps on floats that need an exponent, NaN / infinity, non-string
+keys and values json.dumps hands to DRF's encoder (Decimal, datetime,
+...); data holding any of those, and indented output, goes through the
+stock renderer.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+# Both libraries write floats in this range (and 0) without an exponent
+FLOAT_RANGE = (1e-4, 1e16)
+PLAIN_TYPES = (str, int, type(None))  # bool is an int
+
+
+def orjson_compatible(data):
+    """True if orjson.dumps(data) matches json.dumps for JSONRenderer."""
+    low, high = FLOAT_RANGE
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, PLAIN_TYPES):
+            continue
+        if isinstance(value, dict):
+            if not all(type(key) is str for key in value):
+                return False
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, float):
+            # NaN fails both comparisons
+            if value != 0 and not low <= abs(value) < high:
+                return False
+        else:
+            return False
+    return True
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is None and self.compact and not self.ensure_ascii and orjson_compatible(data):
+            try:
+                encoded = orjson.dumps(data)
+            except orjson.JSONEncodeError:
+                # Integers over 64 bits, lone surrogates
+                pass
+            else:
+                return encoded.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return super().render(data, accepted_media_type, renderer_context)
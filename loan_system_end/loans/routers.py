@@ -0,0 +1,53 @@
+# loans/routers.py
+"""
+Read replica routing.
+
+Reads go to the 'replica' alias only inside ``replica_reads()``, which
+the list, export and analytics views enter; everything else (writes,
+detail reads, read-your-own-write paths in the ledger) stays on
+'default'. Without a replica alias configured the router is a no-op.
+
+Replicas can lag: a list read right after a write may briefly miss it.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from loan_system_end.database import REPLICA
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def has_replica():
+    return REPLICA in connections.settings
+
+
+@contextmanager
+def replica_reads():
+    """Route ORM reads in the block (and sync_to_async calls from it) to the replica."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def on_replica(queryset):
+    """Pin `queryset` to the replica, for querysets evaluated after the view returns (streams)."""
+    return queryset.using(REPLICA if has_replica() else DEFAULT_DB_ALIAS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return REPLICA if _replica_reads.get() and has_replica() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db != REPLICA
@@ -0,0 +1,56 @@
+# loans/search.py
+"""
+Ranked search over users and loans (?q= on /api/users/search/ and
+/api/loans/search/).
+
+A query is matched in rank order: exact identifiers first (national ID,
+phone, username; sponsor national ID for loans), then names starting
+with it, then (users) surnames starting with it. Names are compared on
+the precomputed search columns (models.search_key: lowercase, no accents
+or punctuation) as a range, ``search_name >= 'jo' AND < 'jp'``, which a
+plain B-tree index serves; SQLite does not use an index for LIKE 'jo%'.
+Each rank is read in index order with a LIMIT and pages continue from a
+(rank, key, id) cursor (SearchPagination), so a page costs a few index
+seeks however many rows match, and only the page leaves the database.
+"""
+import re
+
+from django.db.models import Q
+
+from .models import User, search_key
+
+
+def prefix(field, value):
+    """`field` starts with `value`, as an indexable range."""
+    return Q(**{f'{field}__gte': value, f'{field}__lt': value[:-1] + chr(ord(value[-1]) + 1)})
+
+
+def _identifier(query):
+    # National IDs and phone numbers are stored without spaces
+    return re.sub(r'\s+', '', query)
+
+
+def user_matches(users, query):
+    """``[(label, queryset, key), ...]`` in rank order, each rank without the earlier ones."""
+    identifier = _identifier(query)
+    exact = Q(national_id=identifier) | Q(phone=identifier) | Q(username=query)
+    matches = [('exact', users.filter(exact), 'id')]
+    key = search_key(query)
+    if key:
+        name = prefix('search_name', key)
+        matches.append(('name', users.filter(name).exclude(exact), 'search_name'))
+        matches.append(('surname', users.filter(prefix('search_surname', key)).exclude(exact).exclude(name),
+                        'search_surname'))
+    return matches
+
+
+def loan_matches(loans, query):
+    """As user_matches, for loans (applicant IDs and phone, sponsor ID, applicant name)."""
+    identifier = _identifier(query)
+    applicants = User.objects.filter(Q(national_id=identifier) | Q(phone=identifier)).values('id')
+    exact = Q(sponsor_national_id=identifier) | Q(applicant__in=applicants)
+    matches = [('exact', loans.filter(exact), 'id')]
+    key = search_key(query)
+    if key:
+        matches.append(('name', loans.filter(prefix('search_name', key)).exclude(exact), 'search_name'))
+    return matches
@@ -0,0 +1,171 @@
+# loans/seeding.py
+"""
+Synthetic portfolio for load tests and benchmarks, written in bulk.
+
+Every user shares SEED_PASSWORD (hashed once), so a benchmark can log in
+as any of them. Loans cover every status and loan type, with created_at
+spread over the last `months`. Approved loans get their installment
+schedule and a payment history: most borrowers pay on time, some are an
+installment or two behind and a few stopped paying. Sponsors guarantee
+LOANS_PER_SPONSOR loans on average, some many more. amount_paid,
+remaining_balance, the portfolio summary, sponsor exposure, risk scores
+and delinquency figures are filled in as the application itself would
+have.
+"""
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .amortization import LOAN_TERMS, build_schedule, monthly_payment, schedule_total
+from .cache import invalidate
+from .delinquency import detect_delinquency
+from .exposure import rebuild_exposure
+from .models import User, LoanApplication, Installment, Payment, search_key
+from .scoring import score_loans
+from .summary import rebuild_summary
+
+SEED_PASSWORD = 'synthetic-password'
+USERNAME_PREFIX = 'synthetic-'
+
+STATUS_WEIGHTS = {'pending': 30, 'approved': 50, 'rejected': 15, 'contract_rejected': 5}
+# Installments missed at the end of the history: on time / behind / stopped paying
+ARREARS_WEIGHTS = {0: 80, 1: 10, 2: 5, None: 5}
+LOANS_PER_SPONSOR = 3
+FIRST_NAMES = ['Amani', 'Baraka', 'Neema', 'Juma', 'Rehema', 'Halima', 'Daudi', 'Zawadi', 'Furaha', 'Salim',
+               'Upendo', 'Imani', 'Hamisi', 'Mwajuma', 'Joseph', 'Grace', 'Emmanuel', 'Asha', 'Peter', 'Anna']
+LAST_NAMES = ['Mushi', 'Kimaro', 'Mwakyusa', 'Massawe', 'Nyerere', 'Mollel', 'Lyimo', 'Shirima', 'Swai', 'Komba',
+              'Mrema', 'Kisanga', 'Magesa', 'Temba', 'Mbwambo', 'Ngowi', 'Chacha', 'Mtui', 'Urassa', 'Minja']
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Keep the given values of auto_now_add fields (bulk_create stamps now() otherwise)."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def _pick(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _round(value, step=1000):
+    return Decimal(int(value) // step * step)
+
+
+def _user(rng, n, password):
+    user = User(username=f'{USERNAME_PREFIX}{n}', password=password, email=f'{USERNAME_PREFIX}{n}@example.com',
+                first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                phone=f'+2557{rng.randrange(10 ** 8):08d}', national_id=f'{rng.randrange(10 ** 12):012d}')
+    user.set_search_names()  # bulk_create skips save()
+    return user
+
+
+def seed_users(count, rng, batch_size=2000):
+    """Create `count` borrowers; returns ``[(id, full name), ...]``."""
+    password = make_password(SEED_PASSWORD)
+    offset = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+    created = []
+    for start in range(offset, offset + count, batch_size):
+        users = [_user(rng, n, password) for n in range(start, min(start + batch_size, offset + count))]
+        created.extend((user.id, user.get_full_name()) for user in User.objects.bulk_create(users))
+    return created
+
+
+def _loan(rng, applicant, now, months, sponsors):
+    applicant_id, name = applicant
+    # Skewed towards low numbers: a few sponsors back many loans
+    sponsor = int(sponsors * rng.random() ** 2)
+    loan_type = rng.choice(list(LOAN_TERMS))
+    rate, maximum, term = LOAN_TERMS[loan_type]
+    income = _round(rng.lognormvariate(13.5, 0.6))
+    loan = LoanApplication(
+        applicant_id=applicant_id, name=name, search_name=search_key(name), loan_type=loan_type,
+        status=_pick(rng, STATUS_WEIGHTS),
+        requested_amount=max(_round(maximum * Decimal(rng.uniform(0.02, 0.6))), Decimal(100000)),
+        monthly_income=income,
+        assets_value=_round(income * Decimal(rng.uniform(0, 60))),
+        created_at=now - timedelta(days=rng.uniform(0, months * 30.4)),
+        sponsor_name=f'Sponsor {sponsor}', sponsor_national_id=f'9{sponsor:011d}',
+    )
+    if loan.status in ('approved', 'contract_rejected'):
+        loan.contract_accepted = loan.status == 'approved'
+    if loan.status != 'approved':
+        return loan, [], []
+
+    loan.approved_at = min(loan.created_at + timedelta(days=rng.uniform(1, 10)), now)
+    loan.approved_amount = min(loan.requested_amount, maximum)
+    loan.interest_rate = float(rate)
+    loan.term = term
+    loan.monthly_payment = monthly_payment(loan.approved_amount, rate, term)
+    rows = build_schedule(loan.approved_amount, rate, term, timezone.localdate(loan.approved_at))
+
+    due = [row for row in rows if row.due_date < timezone.localdate(now)]
+    behind = _pick(rng, ARREARS_WEIGHTS)
+    paid = due[:rng.randrange(len(due) + 1)] if behind is None else due[:max(len(due) - behind, 0)]
+    payments = [
+        Payment(amount=row.principal + row.interest, phone=f'+2557{rng.randrange(10 ** 8):08d}',
+                date=timezone.make_aware(datetime.combine(row.due_date - timedelta(days=rng.randrange(5)), time(12))))
+        for row in paid
+    ]
+    loan.amount_paid = sum((payment.amount for payment in payments), Decimal(0))
+    loan.remaining_balance = schedule_total(rows) - loan.amount_paid
+    return loan, rows, payments
+
+
+def seed_loans(count, applicants, rng, months=24, batch_size=2000):
+    """Create `count` loans for random `applicants`; returns ``(loans, installments, payments)``."""
+    now = timezone.now()
+    sponsors = max(count // LOANS_PER_SPONSOR, 1)
+    totals = [0, 0, 0]
+    for start in range(0, count, batch_size):
+        generated = [_loan(rng, rng.choice(applicants), now, months, sponsors) for _ in range(min(batch_size, count - start))]
+        with transaction.atomic(), explicit_timestamps(LoanApplication._meta.get_field('created_at'),
+                                                       Payment._meta.get_field('date')):
+            loans = LoanApplication.objects.bulk_create([loan for loan, _, _ in generated])
+            installments, payments = [], []
+            for loan, (_, rows, loan_payments) in zip(loans, generated):
+                installments.extend(
+                    Installment(loan_id=loan.id, number=row.number, due_date=row.due_date,
+                                principal=row.principal, interest=row.interest, balance=row.balance)
+                    for row in rows
+                )
+                for payment in loan_payments:
+                    payment.loan_id = loan.id
+                payments.extend(loan_payments)
+            Installment.objects.bulk_create(installments, batch_size=5000)
+            Payment.objects.bulk_create(payments, batch_size=5000)
+        totals[0] += len(loans)
+        totals[1] += len(installments)
+        totals[2] += len(payments)
+    return tuple(totals)
+
+
+def seed(users, loans, months=24, batch_size=2000, seed=None):
+    """
+    Seed `users` borrowers and `loans` applications with their schedules
+    and payments, then bring the derived tables up to date. Returns the
+    row counts written.
+    """
+    rng = random.Random(seed)
+    applicants = seed_users(users, rng, batch_size=batch_size)
+    loan_count, installment_count, payment_count = seed_loans(loans, applicants, rng, months, batch_size)
+
+    # bulk_create bypasses the signals that maintain these
+    rebuild_summary()
+    rebuild_exposure()
+    score_loans()
+    detect_delinquency(full=True)
+    invalidate()
+    return {'users': len(applicants), 'loans': loan_count,
+            'installments': installment_count, 'payments': payment_count}
@@ -1,31 +1,113 @@
 # loans/serializers.py
 from rest_framework import serializers
-from django.contrib.auth.hashers import make_password
 from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from decimal import Decimal
 import base64
-from .models import User, LoanApplication, Payment
+import binascii
+from loan_system_end.middleware import track
+from .amortization import MAX_INTEREST_RATE
+from .models import User, LoanApplication, Installment, Payment, SponsorExposure
+from .uploads import max_image_size, sniff_image_type
+from .hashing import hash_password
+
+
+# ===== Timing helpers =====
+class TimedSerializerMixin:
+    """Charge time spent building `.data` to the request's serialize timer."""
+
+    @property
+    def data(self):
+        with track('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+# ===== Sparse fieldsets =====
+class SparseFieldsMixin:
+    """Accept ``fields=``: the names to keep, or None for all (see loans.fieldsets)."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+# ===== Image field =====
+class ImageUploadField(serializers.Field):
+    """
+    Image accepted as a multipart file part (streamed to storage by the
+    upload handlers) or, for older clients, a base64 / data-URL string.
+    Represented as the stored file's URL.
+    """
+    default_error_messages = {
+        'invalid': 'Upload an image file or a base64 encoded image.',
+        'too_large': 'Image exceeds {max_size} bytes.',
+        'type': 'Image must be JPEG, PNG or WebP.',
+    }
+
+    def to_representation(self, value):
+        return value.url if value else None
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            # Already checked while streaming (uploads.py); re-check cheaply
+            # in case a parser without the limit handler was used
+            if data.size > max_image_size():
+                self.fail('too_large', max_size=max_image_size())
+            head = data.read(16)
+            data.seek(0)
+            if sniff_image_type(head) is None:
+                self.fail('type')
+            return data
+        if isinstance(data, str) and data:
+            return self.decode_base64(data)
+        self.fail('invalid')
+
+    def decode_base64(self, data):
+        if ';base64,' in data:
+            data = data.split(';base64,', 1)[1]
+        # Reject on the encoded length before decoding anything
+        if len(data) * 3 // 4 > max_image_size():
+            self.fail('too_large', max_size=max_image_size())
+        try:
+            raw = base64.b64decode(data)
+        except (binascii.Error, ValueError):
+            self.fail('invalid')
+        content_type = sniff_image_type(raw[:16])
+        if content_type is None:
+            self.fail('type')
+        return ContentFile(raw, name=f"upload.{content_type.split('/')[-1].replace('jpeg', 'jpg')}")
+
+
+def image_name(prefix, field_name, upload):
+    ext = upload.name.rsplit('.', 1)[-1].lower() if '.' in upload.name else 'jpg'
+    return f"{prefix}_{field_name}.{ext}"
 
 
 # ===== User Serializers =====
-class UserSerializer(serializers.ModelSerializer):
-    profile_photo = serializers.SerializerMethodField()
+class UserSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
+    profile_photo = ImageUploadField(required=False, allow_null=True)
+    profile_thumbnail = ImageUploadField(read_only=True)  # WebP, filled in after upload
 
     class Meta:
         model = User
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'username', 'email', 'phone', 'address', 
-            'profile_photo', 'is_admin', 'national_id', 'first_name', 'last_name'
+            'profile_photo', 'profile_thumbnail', 'is_admin', 'national_id', 'first_name', 'last_name'
         ]
         read_only_fields = ['is_admin']
-
-    def get_profile_photo(self, obj):
-        if obj.profile_photo:
-            return obj.profile_photo.url
-        return None
+        profiles = {'summary': ['id', 'username', 'is_admin', 'first_name', 'last_name']}
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
+    profile_photo = ImageUploadField(required=False, allow_null=True)
 
     class Meta:
         model = User
@@ -35,35 +117,34 @@ class UserCreateSerializer(serializers.ModelSerializer):
         ]
 
     def create(self, validated_data):
-        validated_data['password'] = make_password(validated_data['password'])
+        validated_data['password'] = hash_password(validated_data['password'])
         return super().create(validated_data)
 
 
 # ===== Loan Application Serializer =====
-class LoanApplicationSerializer(serializers.ModelSerializer):
-    sponsor_photo = serializers.SerializerMethodField()
-    name = serializers.SerializerMethodField()
+class LoanApplicationSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
+    sponsor_photo = ImageUploadField(required=False, allow_null=True)
+    sponsor_thumbnail = ImageUploadField(read_only=True)  # WebP, filled in after upload
+    name = serializers.CharField(read_only=True)  # denormalized from applicant on save
 
     class Meta:
         model = LoanApplication
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'name', 'loan_type', 'requested_amount', 'approved_amount',
             'interest_rate', 'term', 'monthly_payment', 'remaining_balance',
             'amount_paid', 'status', 'contract_accepted', 'created_at',
             'assets_value', 'monthly_income',
             'sponsor_name', 'sponsor_address', 'sponsor_national_id',
-            'sponsor_phone', 'sponsor_email', 'sponsor_photo'
+            'sponsor_phone', 'sponsor_email', 'sponsor_photo', 'sponsor_thumbnail',
+            'debt_to_income', 'loan_to_assets', 'exposure_ratio', 'risk_score', 'scored_at',
+            'days_past_due', 'arrears', 'delinquency_status',
         ]
-
-    def get_sponsor_photo(self, obj):
-        if obj.sponsor_photo:
-            return obj.sponsor_photo.url
-        return None
-
-    def get_name(self, obj):
-        if obj.applicant:
-            return obj.applicant.get_full_name() or obj.applicant.username
-        return None
+        # Dashboard cards and the admin review queue
+        profiles = {'summary': ['id', 'name', 'loan_type', 'requested_amount', 'approved_amount',
+                                'remaining_balance', 'status', 'created_at']}
+        # Approving through PATCH builds the schedule from the stored rate
+        extra_kwargs = {'interest_rate': {'min_value': 0, 'max_value': MAX_INTEREST_RATE}}
 
 
 # ===== Register & Apply Serializer =====
@@ -77,7 +158,7 @@ class RegisterAndApplySerializer(serializers.Serializer):
     phone = serializers.CharField()
     address = serializers.CharField()
     national_id = serializers.CharField()
-    profile_photo = serializers.CharField(required=False, allow_null=True)  # base64
+    profile_photo = ImageUploadField(required=False, allow_null=True)  # file part or base64
 
     # --- Loan fields ---
     loan_type = serializers.ChoiceField(choices=LoanApplication.LOAN_TYPES)
@@ -91,35 +172,24 @@ class RegisterAndApplySerializer(serializers.Serializer):
     sponsor_national_id = serializers.CharField()
     sponsor_phone = serializers.CharField()
     sponsor_email = serializers.EmailField()
-    sponsor_photo = serializers.CharField(required=False, allow_null=True)  # base64
-
-    # ===== Helper: save base64 image =====
-    def save_base64_image(self, instance, base64_data, filename_field, prefix):
-        if base64_data:
-            try:
-                if ';base64,' in base64_data:
-                    format, imgstr = base64_data.split(';base64,')
-                else:
-                    imgstr = base64_data
-                    format = 'data:image/png'
-                ext = format.split('/')[-1]
-                getattr(instance, filename_field).save(
-                    f"{prefix}_{filename_field}.{ext}",
-                    ContentFile(base64.b64decode(imgstr))
-                )
-                instance.save()
-            except Exception as e:
-                print(f"Error saving image {filename_field}: {e}")
+    sponsor_photo = ImageUploadField(required=False, allow_null=True)  # file part or base64
+
+    # ===== Helper: attach image before the INSERT =====
+    def attach_image(self, instance, upload, field_name, prefix):
+        # Copies the upload to storage in chunks; save=False so the row
+        # is written once by the caller's save()
+        if upload:
+            getattr(instance, field_name).save(image_name(prefix, field_name, upload), upload, save=False)
 
     # ===== Create method =====
     def create(self, validated_data):
-        profile_photo_data = validated_data.pop('profile_photo', None)
-        sponsor_photo_data = validated_data.pop('sponsor_photo', None)
+        profile_photo = validated_data.pop('profile_photo', None)
+        sponsor_photo = validated_data.pop('sponsor_photo', None)
 
         # --- Create user ---
-        user = User.objects.create(
+        user = User(
             username=validated_data['username'],
-            password=make_password(validated_data['password']),
+            password=hash_password(validated_data['password']),
             email=validated_data['email'],
             first_name=validated_data['first_name'],
             last_name=validated_data['last_name'],
@@ -127,10 +197,11 @@ class RegisterAndApplySerializer(serializers.Serializer):
             address=validated_data['address'],
             national_id=validated_data['national_id'],
         )
-        self.save_base64_image(user, profile_photo_data, 'profile_photo', user.username)
+        self.attach_image(user, profile_photo, 'profile_photo', user.username)
+        user.save()
 
         # --- Create loan application ---
-        loan = LoanApplication.objects.create(
+        loan = LoanApplication(
             applicant=user,
             loan_type=validated_data['loan_type'],
             requested_amount=validated_data['requested_amount'],
@@ -142,16 +213,79 @@ class RegisterAndApplySerializer(serializers.Serializer):
             sponsor_phone=validated_data['sponsor_phone'],
             sponsor_email=validated_data['sponsor_email'],
         )
-        self.save_base64_image(loan, sponsor_photo_data, 'sponsor_photo', user.username)
+        self.attach_image(loan, sponsor_photo, 'sponsor_photo', user.username)
+        loan.save()
 
         return {'user': user, 'loan_application': loan}
 
 
 # ===== Payment Serializer =====
-from rest_framework import serializers
-from .models import Payment
-
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
-        fields = ['id', 'loan', 'amount', 'phone', 'date']
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'loan', 'amount', 'phone', 'date', 'idempotency_key']
+        profiles = {'summary': ['id', 'loan', 'amount', 'date']}
+        extra_kwargs = {
+            'amount': {'min_value': Decimal('0.01')},
+            # Uniqueness is handled by the ledger (replay), not as a 400
+            'idempotency_key': {'validators': []},
+        }
+
+
+# ===== Loan + payments (?include=payments) =====
+class LoanApplicationWithPaymentsSerializer(LoanApplicationSerializer):
+    payments = PaymentSerializer(many=True, read_only=True)
+
+    class Meta(LoanApplicationSerializer.Meta):
+        fields = LoanApplicationSerializer.Meta.fields + ['payments']
+        profiles = {'summary': LoanApplicationSerializer.Meta.profiles['summary'] + ['payments']}
+
+
+# ===== Loan payment history (/api/loans/{id}/payments/) =====
+class PaymentHistorySerializer(PaymentSerializer):
+    """A payment with the loan's totals right after it (ledger.payment_history)."""
+    paid_to_date = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    balance = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+    class Meta(PaymentSerializer.Meta):
+        fields = ['id', 'amount', 'phone', 'date', 'paid_to_date', 'balance']
+        profiles = {'summary': ['id', 'amount', 'date', 'balance']}
+
+
+# ===== Amortization =====
+class InstallmentSerializer(serializers.ModelSerializer):
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Installment
+        fields = ['number', 'due_date', 'principal', 'interest', 'amount', 'balance']
+
+
+class SponsorExposureSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SponsorExposure
+        fields = ['sponsor_national_id', 'active_loans', 'approved_total', 'outstanding_total']
+
+
+class ApprovalSerializer(serializers.Serializer):
+    """Optional overrides; anything omitted comes from the product table."""
+    approved_amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+    interest_rate = serializers.FloatField(min_value=0, max_value=MAX_INTEREST_RATE, required=False)
+    term = serializers.IntegerField(min_value=1, max_value=600, required=False)
+
+
+class DecisionSerializer(ApprovalSerializer):
+    """One admin decision; approval overrides are ignored for rejections."""
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=['approved', 'rejected'])
+
+
+class BulkDecisionSerializer(serializers.Serializer):
+    decisions = DecisionSerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate_decisions(self, decisions):
+        ids = [decision['id'] for decision in decisions]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("Each loan may only appear once")
+        return decisions
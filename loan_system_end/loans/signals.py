@@ -0,0 +1,112 @@
+# loans/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate
+from .events import loan_status_event, payment_event, publish
+from .media import schedule_thumbnail
+from .models import User, LoanApplication, Installment, Payment
+from .scoring import score_loans
+from .summary import SUMMARY_FIELDS, loan_values, record_loan_changes
+from .tokens import revoke_user_tokens
+
+
+@receiver(post_save, sender=User)
+def user_photo_saved(sender, instance, **kwargs):
+    schedule_thumbnail(instance, 'profile_photo')
+
+
+@receiver(post_save, sender=LoanApplication)
+def sponsor_photo_saved(sender, instance, **kwargs):
+    schedule_thumbnail(instance, 'sponsor_photo')
+
+
+# ===== Portfolio summary =====
+def _touches_summary(update_fields):
+    return update_fields is None or not set(update_fields).isdisjoint(SUMMARY_FIELDS)
+
+
+@receiver(pre_save, sender=LoanApplication)
+def loan_before_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._summary_before = None
+    if raw or instance.pk is None or not _touches_summary(update_fields):
+        return
+    instance._summary_before = (
+        LoanApplication.objects.filter(pk=instance.pk).values(*SUMMARY_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=LoanApplication)
+def loan_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not (created or _touches_summary(update_fields)):
+        return
+    before = None if created else getattr(instance, '_summary_before', None)
+    record_loan_changes([(before, loan_values(instance))])
+
+
+@receiver(post_delete, sender=LoanApplication)
+def loan_deleted(sender, instance, **kwargs):
+    record_loan_changes([(loan_values(instance), None)])
+
+
+# ===== Response cache =====
+@receiver(post_save, sender=LoanApplication)
+@receiver(post_delete, sender=LoanApplication)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=Installment)
+@receiver(post_delete, sender=Installment)
+def loan_data_changed(sender, **kwargs):
+    invalidate()
+
+
+# ===== Token sessions =====
+# Access tokens carry the user and are not re-checked against the row, so a
+# new password or a deactivated account has to end the API logins itself
+CREDENTIAL_FIELDS = ('password', 'is_active')
+
+
+@receiver(pre_save, sender=User)
+def user_before_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._credentials_before = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and set(update_fields).isdisjoint(CREDENTIAL_FIELDS):
+        return
+    instance._credentials_before = User.objects.filter(pk=instance.pk).values_list(*CREDENTIAL_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    before = getattr(instance, '_credentials_before', None)
+    if created or before is None:
+        return
+    password, was_active = before
+    if instance.password != password or (was_active and not instance.is_active):
+        transaction.on_commit(lambda: revoke_user_tokens(instance))
+
+
+# ===== Risk scoring =====
+@receiver(post_save, sender=LoanApplication)
+def score_new_loan(sender, instance, created, raw=False, **kwargs):
+    # New applications join the ranked queue right away; the nightly
+    # score_loans run refreshes everything else
+    if created and not raw:
+        transaction.on_commit(lambda: score_loans(LoanApplication.objects.filter(pk=instance.pk)))
+
+
+# ===== Live events =====
+@receiver(post_save, sender=LoanApplication)
+def loan_status_changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, '_summary_before', None)
+    if created or (before and before['status'] != instance.status):
+        publish(loan_status_event(instance, None if created else before['status']))
+
+
+@receiver(post_save, sender=Payment)
+def payment_posted(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        publish(payment_event(instance, instance.loan.applicant_id))
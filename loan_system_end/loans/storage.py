@@ -0,0 +1,46 @@
+# loans/storage.py
+import hashlib
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Store files under the SHA-256 of their content, keeping only the
+    directory and extension of the requested name:
+    ``sponsors/x.jpeg`` -> ``sponsors/ab/ab12...ef.jpeg``.
+    Saving bytes that are already stored returns the existing name
+    without writing anything, so identical uploads share one file.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+
+        folder = posixpath.dirname(name)
+        ext = posixpath.splitext(name)[1].lower()
+        name = posixpath.join(folder, digest[:2], digest + ext)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def save_exact(self, name, content):
+        """Plain save under `name`, for derived files such as thumbnails."""
+        return super().save(name, content)
+
+
+image_storage = ContentAddressedStorage()
+
+
+def get_image_storage():
+    return image_storage
@@ -0,0 +1,120 @@
+# loans/summary.py
+"""
+Incrementally maintained portfolio totals.
+
+Every change to a loan (or its running totals) is turned into a signed
+delta on its (status, loan_type, month) bucket, so analytics read a few
+PortfolioSummary rows instead of scanning LoanApplication. The same
+changes feed the per-sponsor exposure (loans.exposure).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .exposure import EXPOSURE_FIELDS, record_exposure_changes, record_exposure_payments
+from .models import LoanApplication, PortfolioSummary
+
+# Loan columns that feed the summary and the sponsor exposure
+SUMMARY_FIELDS = list(dict.fromkeys([
+    'status', 'loan_type', 'created_at',
+    'requested_amount', 'approved_amount', 'amount_paid', 'remaining_balance',
+    *EXPOSURE_FIELDS,
+]))
+
+MEASURES = ['loan_count', 'requested_total', 'approved_total', 'amount_paid_total', 'outstanding_total']
+
+ZERO = Decimal('0')
+
+
+def bucket_key(values):
+    month = timezone.localtime(values['created_at']).date().replace(day=1)
+    return values['status'], values['loan_type'], month
+
+
+def contribution(values, sign=1):
+    """Measures a loan (as a dict of SUMMARY_FIELDS) adds to its bucket."""
+    return [
+        sign,
+        sign * (values['requested_amount'] or ZERO),
+        sign * (values['approved_amount'] or ZERO),
+        sign * (values['amount_paid'] or ZERO),
+        sign * (values['remaining_balance'] or ZERO),
+    ]
+
+
+def loan_values(loan):
+    return {field: getattr(loan, field) for field in SUMMARY_FIELDS}
+
+
+def apply_bucket_deltas(deltas):
+    """Add ``{bucket_key: [measures]}`` to the summary table."""
+    for (status, loan_type, month), delta in deltas.items():
+        if not any(delta):
+            continue
+        row, _ = PortfolioSummary.objects.get_or_create(status=status, loan_type=loan_type, month=month)
+        PortfolioSummary.objects.filter(pk=row.pk).update(**{
+            measure: F(measure) + value for measure, value in zip(MEASURES, delta)
+        })
+
+
+def _add(deltas, key, values):
+    current = deltas[key]
+    for i, value in enumerate(values):
+        current[i] += value
+
+
+def record_loan_changes(changes):
+    """Apply a batch of ``(old_values, new_values)`` pairs; either may be None."""
+    deltas = defaultdict(lambda: [0, ZERO, ZERO, ZERO, ZERO])
+    for old, new in changes:
+        if old is not None:
+            _add(deltas, bucket_key(old), contribution(old, -1))
+        if new is not None:
+            _add(deltas, bucket_key(new), contribution(new))
+    apply_bucket_deltas(deltas)
+    record_exposure_changes(changes)
+
+
+def record_payments(amounts):
+    """Reflect ``{loan_id: amount}`` posted through the ledger."""
+    if not amounts:
+        return
+    deltas = defaultdict(lambda: [0, ZERO, ZERO, ZERO, ZERO])
+    rows = list(LoanApplication.objects.filter(pk__in=list(amounts)).values(
+        'id', 'loan_type', 'created_at', *EXPOSURE_FIELDS,
+    ))
+    for row in rows:
+        amount = amounts[row['id']]
+        # Unapproved loans have no balance yet (NULL stays NULL in the ledger)
+        outstanding = -amount if row['remaining_balance'] is not None else ZERO
+        _add(deltas, bucket_key(row), [0, ZERO, ZERO, amount, outstanding])
+    apply_bucket_deltas(deltas)
+    record_exposure_payments(rows, amounts)
+
+
+@transaction.atomic
+def rebuild_summary():
+    """Recompute every bucket from scratch with one aggregate query."""
+    zero = Value(ZERO)
+    buckets = (
+        LoanApplication.objects
+        .annotate(month=TruncMonth('created_at', output_field=DateField()))
+        .values('status', 'loan_type', 'month')
+        .annotate(
+            loan_count=Count('id'),
+            requested_total=Coalesce(Sum('requested_amount'), zero),
+            approved_total=Coalesce(Sum('approved_amount'), zero),
+            amount_paid_total=Coalesce(Sum('amount_paid'), zero),
+            outstanding_total=Coalesce(Sum('remaining_balance'), zero),
+        )
+        .order_by()
+    )
+    PortfolioSummary.objects.all().delete()
+    rows = PortfolioSummary.objects.bulk_create(
+        PortfolioSummary(**bucket) for bucket in buckets
+    )
+    return len(rows)
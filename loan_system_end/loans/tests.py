@@ -1,3 +1,1461 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import io
+import itertools
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from loan_system_end.database import databases_from_env, sqlite_database
+from loan_system_end.middleware import QueryBudgetExceeded
+from .hashing import HashingBusy, run_hashing
+from .amortization import approve_loan, build_schedule, monthly_payment, reschedule_loans
+from .delinquency import detect_delinquency, loan_position
+from .events import broker
+from .export import aiter_chunks
+from .exposure import MEASURES as EXPOSURE_MEASURES, rebuild_exposure
+from .seeding import SEED_PASSWORD, seed
+from .media import process_photo
+from .pagination import PaymentHistoryPagination
+from .ledger import PaymentRejected, apply_deltas, post_payment, reverse_payment
+from .renderers import FastJSONRenderer, orjson_compatible
+from .rows import ValuesSerializer
+from .serializers import LoanApplicationSerializer, UserSerializer
+from .models import User, LoanApplication, Installment, Payment, PortfolioSummary, SponsorExposure, TokenSession
+from .routers import ReplicaRouter, on_replica, replica_reads
+from .scoring import annuity_factor, score_loans
+from .search import user_matches
+from .summary import MEASURES, rebuild_summary
+from .tokens import TokenError, authenticate_token, issue_tokens, revocations, revoke_user_tokens
+
+
+def setUpModule():
+    # Keep the per-request JSON log lines out of the test output
+    logging.getLogger('loan_system_end.requests').setLevel(logging.WARNING)
+
+
+def tearDownModule():
+    logging.getLogger('loan_system_end.requests').setLevel(logging.INFO)
+
+
+def make_loan(applicant, **kwargs):
+    fields = {'loan_type': 'home', 'requested_amount': Decimal('1000000.00')}
+    fields.update(kwargs)
+    return LoanApplication.objects.create(applicant=applicant, **fields)
+
+
+class LoanListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_status_and_type_filters(self):
+        make_loan(self.borrower, status='pending', loan_type='car')
+        make_loan(self.borrower, status='approved', loan_type='car')
+        make_loan(self.borrower, status='pending', loan_type='home')
+
+        res = self.client.get('/api/loans/', {'status': 'pending', 'loan_type': 'car'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data['results']), 1)
+
+        res = self.client.get('/api/loans/', {'status': 'pending,approved'})
+        self.assertEqual(len(res.data['results']), 3)
+
+    def test_amount_range_filter(self):
+        for amount in ('100.00', '500.00', '900.00'):
+            make_loan(self.borrower, requested_amount=Decimal(amount))
+
+        res = self.client.get('/api/loans/', {'min_amount': '200', 'max_amount': '900'})
+        amounts = sorted(row['requested_amount'] for row in res.data['results'])
+        self.assertEqual(amounts, ['500.00', '900.00'])
+
+    def test_invalid_filter_is_rejected(self):
+        res = self.client.get('/api/loans/', {'status': 'bogus'})
+        self.assertEqual(res.status_code, 400)
+        for params in ({'min_amount': 'NaN'}, {'max_amount': 'Infinity'}, {'created_after': '2020-13-45'},
+                       {'created_before': '9999-12-31'}, {'created_after': '2020-02-30T10:00:00'}):
+            self.assertEqual(self.client.get('/api/loans/', params).status_code, 400, params)
+
+    def test_created_before_a_date_keeps_that_day(self):
+        loan = make_loan(self.borrower)
+        day = timezone.localdate(loan.created_at).isoformat()
+        res = self.client.get('/api/loans/', {'created_before': day, 'created_after': day})
+        self.assertEqual([row['id'] for row in res.data['results']], [loan.id])
+
+    def test_keyset_pagination_walks_every_row_once(self):
+        loans = [make_loan(self.borrower) for _ in range(7)]
+        # Force identical timestamps so the id tie-breaker is exercised
+        LoanApplication.objects.update(created_at=loans[0].created_at)
+
+        seen = []
+        url = '/api/loans/?page_size=3'
+        while url:
+            res = self.client.get(url)
+            seen.extend(row['id'] for row in res.data['results'])
+            url = res.data['next']
+        self.assertEqual(seen, sorted((loan.id for loan in loans), reverse=True))
+
+    def test_malformed_cursors_are_not_found(self):
+        make_loan(self.borrower)
+        session = APIClient()  # served by the async read view
+        session.login(username='admin', password='pw')
+        for values in ([[1], [2]], [{'a': 1}, 2], [1.5, 'a'], [True, 1], ['soon', 'x']):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            for client in (self.client, session):
+                for ordering in ('-created_at', '-risk_score'):
+                    res = client.get('/api/loans/', {'cursor': cursor, 'ordering': ordering})
+                    self.assertEqual(res.status_code, 404, (values, ordering))
+
+    def test_borrower_only_sees_own_loans(self):
+        other = User.objects.create_user('other', password='pw')
+        make_loan(self.borrower)
+        make_loan(other)
+
+        self.client.force_authenticate(self.borrower)
+        res = self.client.get('/api/loans/')
+        self.assertEqual(len(res.data['results']), 1)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        self.loan = make_loan(self.admin)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_server_timing_headers(self):
+        res = self.client.get('/api/payments/')
+        self.assertIn('db;dur=', res['Server-Timing'])
+        self.assertIn('serialize;dur=', res['Server-Timing'])
+        self.assertGreater(int(res['X-Query-Count']), 0)
+
+    def test_payment_list_queries_do_not_grow_with_rows(self):
+        Payment.objects.create(loan=self.loan, amount=Decimal('10.00'), phone='+255700000000')
+        few = int(self.client.get('/api/payments/')['X-Query-Count'])
+        for _ in range(10):
+            Payment.objects.create(loan=self.loan, amount=Decimal('10.00'), phone='+255700000000')
+        many = int(self.client.get('/api/payments/')['X-Query-Count'])
+        self.assertEqual(few, many)
+
+    @override_settings(REQUEST_QUERY_BUDGETS={'GET payment-list': 0}, QUERY_BUDGET_STRICT=True)
+    def test_strict_budget_raises(self):
+        with self.assertLogs('loan_system_end.requests', 'WARNING'):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/payments/')
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """List and detail endpoints run a constant number of queries."""
+
+    def setUp(self):
+        self.borrower = User.objects.create_user('borrower', password='pw', first_name='Amina')
+        self.client = APIClient()
+        self.client.force_authenticate(self.borrower)
+
+    def query_count(self, url):
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return int(res['X-Query-Count'])
+
+    def test_loan_list_is_constant(self):
+        loan = make_loan(self.borrower)
+        Payment.objects.create(loan=loan, amount=Decimal('5.00'), phone='+255700000000')
+        few = self.query_count('/api/loans/?include=payments')
+        for _ in range(10):
+            loan = make_loan(self.borrower)
+            Payment.objects.create(loan=loan, amount=Decimal('5.00'), phone='+255700000000')
+        self.assertEqual(self.query_count('/api/loans/?include=payments'), few)
+        self.assertEqual(self.query_count('/api/loans/'), few - 1)
+
+    def test_include_payments_nests_rows(self):
+        loan = make_loan(self.borrower)
+        Payment.objects.create(loan=loan, amount=Decimal('5.00'), phone='+255700000000')
+        res = self.client.get(f'/api/loans/{loan.id}/', {'include': 'payments'})
+        self.assertEqual(res.data['name'], 'Amina')
+        self.assertEqual(len(res.data['payments']), 1)
+        self.assertNotIn('payments', self.client.get(f'/api/loans/{loan.id}/').data)
+
+    def test_payment_detail_checks_owner_without_extra_queries(self):
+        loan = make_loan(self.borrower)
+        payment = Payment.objects.create(loan=loan, amount=Decimal('5.00'), phone='+255700000000')
+        self.assertEqual(self.query_count(f'/api/payments/{payment.id}/'), 1)
+
+        other = User.objects.create_user('other', password='pw')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/payments/{payment.id}/').status_code, 404)
+
+
+class AmortizationTests(TestCase):
+    def test_schedule_pays_off_principal(self):
+        rows = build_schedule(Decimal('1200000'), 5.2, 12, date(2025, 1, 31))
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(sum(row.principal for row in rows), Decimal('1200000.00'))
+        self.assertEqual(rows[-1].balance, Decimal('0.00'))
+        self.assertEqual(rows[0].due_date, date(2025, 2, 28))
+        self.assertEqual(rows[0].interest, Decimal('5200.00'))
+
+    def test_zero_rate(self):
+        self.assertEqual(monthly_payment(Decimal('1200000'), 0, 12), Decimal('100000.00'))
+
+    def test_approve_endpoint_stores_schedule(self):
+        admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        loan = make_loan(admin, loan_type='car', requested_amount=Decimal('30000000'))
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        res = client.post(f'/api/loans/{loan.id}/approve/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['approved_amount'], '20000000.00')
+        self.assertEqual(len(res.data['schedule']), 24)
+        self.assertEqual(Installment.objects.filter(loan=loan).count(), 24)
+
+        # Re-approving is refused
+        self.assertEqual(client.post(f'/api/loans/{loan.id}/approve/').status_code, 400)
+
+    def test_interest_rate_is_bounded(self):
+        admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        loan = make_loan(admin)
+        client = APIClient()
+        client.force_authenticate(admin)
+        for rate in (1e308, 100.5, -1):
+            res = client.post(f'/api/loans/{loan.id}/approve/', {'interest_rate': rate}, format='json')
+            self.assertEqual(res.status_code, 400, rate)
+            res = client.post('/api/loans/decisions/', {'decisions': [
+                {'id': loan.id, 'status': 'approved', 'interest_rate': rate},
+            ]}, format='json')
+            self.assertEqual(res.status_code, 400, rate)
+            res = client.patch(f'/api/loans/{loan.id}/', {'status': 'approved', 'interest_rate': rate}, format='json')
+            self.assertEqual(res.status_code, 400, rate)
+        self.assertEqual(LoanApplication.objects.get().status, 'pending')
+
+    def test_reschedule_batches(self):
+        admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        loans = [make_loan(admin) for _ in range(3)]
+        for loan in loans:
+            client.post(f'/api/loans/{loan.id}/approve/', {'term': 12})
+
+        count = reschedule_loans(LoanApplication.objects.all(), interest_rate=0, term=6, batch_size=2)
+        self.assertEqual(count, 3)
+        self.assertEqual(Installment.objects.count(), 18)
+        loans[0].refresh_from_db()
+        self.assertEqual(loans[0].remaining_balance, Decimal('1000000.00'))
+
+    def test_bulk_decisions(self):
+        admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        loans = [make_loan(admin, loan_type='car') for _ in range(3)]
+        done = make_loan(admin, status='rejected')
+
+        def decide(*decisions):
+            return client.post('/api/loans/decisions/', {'decisions': list(decisions)}, format='json')
+
+        res = decide({'id': loans[0].id, 'status': 'approved'}, {'id': done.id, 'status': 'approved'})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.data['errors'], {done.id: 'Loan is rejected, not pending'})
+        self.assertFalse(Installment.objects.exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            res = decide(
+                {'id': loans[0].id, 'status': 'approved'},
+                {'id': loans[1].id, 'status': 'approved', 'approved_amount': '600000.00', 'term': 6},
+                {'id': loans[2].id, 'status': 'rejected'},
+            )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([row['status'] for row in res.data], ['approved', 'approved', 'rejected'])
+        self.assertEqual(res.data[1]['monthly_payment'], str(monthly_payment(Decimal('600000'), 4.5, 6)))
+        self.assertEqual(Installment.objects.filter(loan=loans[1]).count(), 6)
+        self.assertLess(len(queries), 25)
+
+        snapshot = sorted(PortfolioSummary.objects.exclude(loan_count=0).values_list('status', *MEASURES))
+        rebuild_summary()
+        self.assertEqual(snapshot, sorted(PortfolioSummary.objects.values_list('status', *MEASURES)))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class PaymentLedgerTests(TestCase):
+    def setUp(self):
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.loan = make_loan(self.borrower, status='approved', remaining_balance=Decimal('100.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.borrower)
+
+    def pay(self, amount, **extra):
+        return self.client.post('/api/payments/', {
+            'loan': self.loan.id, 'amount': amount, 'phone': '+255700000000',
+        }, **extra)
+
+    def test_posting_updates_running_totals(self):
+        self.assertEqual(self.pay('30.00').status_code, 201)
+        self.assertEqual(self.pay('20.00').status_code, 201)
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.amount_paid, Decimal('50.00'))
+        self.assertEqual(self.loan.remaining_balance, Decimal('50.00'))
+
+    def test_idempotency_key_deduplicates_retries(self):
+        first = self.pay('30.00', HTTP_IDEMPOTENCY_KEY='mpesa-123')
+        retry = self.pay('30.00', HTTP_IDEMPOTENCY_KEY='mpesa-123')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.amount_paid, Decimal('30.00'))
+
+        self.assertEqual(self.pay('31.00', HTTP_IDEMPOTENCY_KEY='mpesa-123').status_code, 409)
+
+    def test_idempotency_key_is_checked_after_loan_access(self):
+        self.pay('30.00', HTTP_IDEMPOTENCY_KEY='mpesa-123')
+        self.client.force_authenticate(User.objects.create_user('other', password='pw'))
+        res = self.pay('30.00', HTTP_IDEMPOTENCY_KEY='mpesa-123')
+        self.assertEqual(res.status_code, 400)
+        self.assertNotIn('id', res.data)
+
+    def test_long_idempotency_key_header_is_rejected(self):
+        res = self.pay('30.00', HTTP_IDEMPOTENCY_KEY='k' * 65)
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('idempotency_key', res.data)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_payment_beyond_the_balance_is_rejected(self):
+        for amount in ('100.01', '9999999999.99'):
+            res = self.pay(amount)
+            self.assertEqual(res.status_code, 400, amount)
+            self.assertIn('amount', res.data)
+        pending = make_loan(self.borrower)
+        LoanApplication.objects.filter(pk=pending.pk).update(amount_paid=Decimal('9999999999.00'))
+        with self.assertRaises(PaymentRejected):
+            post_payment(pending.id, Decimal('1.00'), '+255700000000')
+
+        self.assertEqual(self.pay('100.00').status_code, 201)
+        self.loan.refresh_from_db()
+        self.assertEqual((self.loan.amount_paid, self.loan.remaining_balance), (Decimal('100.00'), Decimal('0.00')))
+        self.assertFalse(Payment.objects.exclude(amount=Decimal('100.00')).exists())
+
+    def test_reversal_and_no_edits(self):
+        payment_id = self.pay('30.00').data['id']
+        self.assertEqual(self.client.patch(f'/api/payments/{payment_id}/', {'amount': '1.00'}).status_code, 405)
+        self.assertEqual(self.client.delete(f'/api/payments/{payment_id}/').status_code, 204)
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.amount_paid, Decimal('0.00'))
+        self.assertEqual(self.loan.remaining_balance, Decimal('100.00'))
+
+    def test_cannot_pay_someone_elses_loan(self):
+        other = User.objects.create_user('other', password='pw')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.pay('30.00').status_code, 400)
+
+
+class PaymentHistoryTests(TestCase):
+    def setUp(self):
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.loan = make_loan(self.borrower, status='approved', remaining_balance=Decimal('1000.00'))
+        make_loan(self.borrower, status='approved', remaining_balance=Decimal('500.00'))
+        other = LoanApplication.objects.exclude(pk=self.loan.pk).get()
+        for amount in ['10.00', '20.50', '30.00', '40.25', '50.00']:
+            post_payment(self.loan.id, Decimal(amount), '+255700000000')
+            post_payment(other.id, Decimal('1.00'), '+255700000000')
+        self.client = APIClient()
+        self.client.force_authenticate(self.borrower)
+
+    def pages(self, url):
+        rows = []
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            rows.extend(res.data['results'])
+            url = res.data['next']
+        return rows
+
+    def test_running_balances_across_pages(self):
+        rows = self.pages(f'/api/loans/{self.loan.id}/payments/?page_size=2')
+        self.assertEqual([row['amount'] for row in rows], ['50.00', '40.25', '30.00', '20.50', '10.00'])
+        self.assertEqual([row['paid_to_date'] for row in rows], ['150.75', '100.75', '60.50', '30.50', '10.00'])
+        self.assertEqual([row['balance'] for row in rows], ['849.25', '899.25', '939.50', '969.50', '990.00'])
+        self.assertNotIn('loan', rows[0])
+
+        summary = self.client.get(f'/api/loans/{self.loan.id}/payments/', {'profile': 'summary'}).data['results']
+        self.assertEqual(summary[0], {key: rows[0][key] for key in ('id', 'amount', 'date', 'balance')})
+
+    def test_pages_cost_the_same(self):
+        first = self.client.get(f'/api/loans/{self.loan.id}/payments/', {'page_size': 1})
+        with self.assertNumQueries(2):  # the loan, the page
+            self.client.get(first.data['next'])
+        page = Payment.objects.filter(loan=self.loan).order_by('-date', '-id')[:50]
+        self.assertIn('payment_loan_date_idx', page.explain())
+
+    def test_malformed_cursors_are_not_found(self):
+        url = f'/api/loans/{self.loan.id}/payments/'
+        for values in ([[1], [2]], [{'a': 1}, 2], [1.5, 'a'], [True, 1], ['soon', 'x'], ['2020-01-01T00:00:00Z']):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404, values)
+        request = mock.Mock(query_params={'cursor': base64.urlsafe_b64encode(b'["soon", "x"]').decode()})
+        paginator = PaymentHistoryPagination()
+        paginator.request = request
+        with self.assertRaises(NotFound):
+            paginator.preceding(Payment.objects.all())
+
+    def test_scoped_to_visible_loans(self):
+        self.client.force_authenticate(User.objects.create_user('other', password='pw'))
+        self.assertEqual(self.client.get(f'/api/loans/{self.loan.id}/payments/').status_code, 404)
+
+
+class BulkIngestTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        self.loan = make_loan(self.admin, status='approved', remaining_balance=Decimal('1000.00'))
+
+    def test_api_ingests_csv_with_error_report(self):
+        body = (
+            "loan,amount,phone,reference\n"
+            f"{self.loan.id},100.00,+255700000000,ref-1\n"
+            f"{self.loan.id},50.00,+255700000000,ref-2\n"
+            f"{self.loan.id},50.00,+255700000000,ref-2\n"
+            "999999,10.00,+255700000000,ref-3\n"
+            f"{self.loan.id},abc,+255700000000,ref-4\n"
+        )
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        res = client.post('/api/payments/bulk/', {
+            'file': SimpleUploadedFile('settlement.csv', body.encode()),
+        }, format='multipart')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((res.data['posted'], res.data['duplicates'], res.data['failed']), (2, 1, 2))
+        self.assertEqual([e['line'] for e in res.data['errors']], [5, 6])
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.amount_paid, Decimal('150.00'))
+        self.assertEqual(self.loan.remaining_balance, Decimal('850.00'))
+
+    def post_file(self, body, name='settlement.csv'):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        return client.post('/api/payments/bulk/', {'file': SimpleUploadedFile(name, body)}, format='multipart')
+
+    def test_reused_reference_is_a_conflict(self):
+        post_payment(self.loan.id, Decimal('100.00'), '+255700000000', 'ref-1')
+        other = make_loan(self.admin, status='approved', remaining_balance=Decimal('1000.00'))
+        body = (
+            "loan,amount,phone,reference\n"
+            f"{self.loan.id},100.00,+255700000000,ref-1\n"  # retry
+            f"{self.loan.id},99.00,+255700000000,ref-1\n"
+            f"{other.id},100.00,+255700000000,ref-1\n"
+            f"{other.id},20.00,+255700000000,ref-2\n"
+            f"{other.id},25.00,+255700000000,ref-2\n"
+        )
+        res = self.post_file(body.encode())
+        self.assertEqual((res.data['posted'], res.data['duplicates'], res.data['failed']), (1, 1, 3))
+        self.assertEqual([e['line'] for e in res.data['errors']], [3, 4, 6])
+        self.assertIn('different payment', res.data['errors'][0]['error'])
+
+    def test_rows_beyond_the_balance_are_rejected(self):
+        body = (
+            "loan,amount,phone,reference\n"
+            f"{self.loan.id},600.00,+255700000000,ref-1\n"
+            f"{self.loan.id},600.00,+255700000000,ref-2\n"
+            f"{self.loan.id},9999999999.99,+255700000000,ref-3\n"
+            f"{self.loan.id},400.00,+255700000000,ref-2\n"
+        )
+        res = self.post_file(body.encode())
+        self.assertEqual((res.data['posted'], res.data['failed']), (2, 2))
+        self.assertEqual([e['line'] for e in res.data['errors']], [3, 4])
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.remaining_balance, Decimal('0.00'))
+
+        with self.assertRaises(PaymentRejected):
+            apply_deltas({self.loan.id: Decimal('0.01')})
+
+    def test_non_utf8_upload_is_a_400(self):
+        body = f"loan,amount,phone,reference\n{self.loan.id},10.00,+255700000000,Jos\xe9\n".encode('latin-1')
+        res = self.post_file(body)
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('UTF-8', res.data['error'])
+        self.assertFalse(Payment.objects.exists())
+
+    def test_command_ingests_ndjson_in_chunks(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as f:
+            for n in range(5):
+                f.write(f'{{"loan": {self.loan.id}, "amount": "10", "phone": "+255700000000", "reference": "r{n}"}}\n')
+        self.addCleanup(os.remove, f.name)
+
+        call_command('ingest_payments', f.name, chunk_size=2, stdout=io.StringIO())
+        call_command('ingest_payments', f.name, chunk_size=2, stdout=io.StringIO())
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.amount_paid, Decimal('50.00'))
+        self.assertEqual(Payment.objects.count(), 5)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.borrower = User.objects.create_user('borrower', password='pw', first_name='Amina')
+        self.client = APIClient()
+        self.client.force_authenticate(self.borrower)
+
+    def body(self, res):
+        self.assertEqual(res.status_code, 200)
+        return b''.join(res.streaming_content)
+
+    def test_csv_export_streams_filtered_rows(self):
+        make_loan(self.borrower, status='pending')
+        make_loan(self.borrower, status='approved')
+        make_loan(User.objects.create_user('other', password='pw'), status='pending')
+
+        lines = self.body(self.client.get('/api/loans/export/', {'status': 'pending'})).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'name', 'loan_type'])
+        self.assertEqual(len(lines), 2)
+
+    def test_ndjson_matches_serializer_values(self):
+        loan = make_loan(self.borrower)
+        raw = self.body(self.client.get('/api/loans/export/', {'output': 'ndjson', 'gzip': '1'}))
+        row = json.loads(gzip.decompress(raw).decode().splitlines()[0])
+        api_row = self.client.get(f'/api/loans/{loan.id}/').data
+        for key in ('name', 'requested_amount', 'created_at', 'status'):
+            self.assertEqual(row[key], api_row[key])
+
+    def test_payment_export(self):
+        loan = make_loan(self.borrower)
+        Payment.objects.create(loan=loan, amount=Decimal('5.00'), phone='+255700000000')
+        lines = self.body(self.client.get('/api/payments/export/')).decode().splitlines()
+        self.assertEqual(lines[0], 'id,loan,amount,phone,date')
+        self.assertEqual(lines[1].split(',')[1:3], [str(loan.id), '5.00'])
+
+    def test_photo_urls_come_from_the_field_storage(self):
+        make_loan(self.borrower, sponsor_photo='sponsors/rama.jpg')
+        field = LoanApplication._meta.get_field('sponsor_photo')
+        with mock.patch.object(field, 'storage', FileSystemStorage(base_url='https://images.example.com/')):
+            raw = self.body(self.client.get('/api/loans/export/', {'output': 'ndjson'}))
+        self.assertEqual(json.loads(raw)['sponsor_photo'], 'https://images.example.com/sponsors/rama.jpg')
+
+    async def test_asgi_export_streams_without_buffering(self):
+        await sync_to_async(make_loan)(self.borrower)
+        await self.async_client.aforce_login(self.borrower)
+        with mock.patch('loans.views.aiter_chunks', wraps=aiter_chunks) as wrapped:
+            res = await self.async_client.get('/api/loans/export/')
+        wrapped.assert_called_once()
+        self.assertTrue(res.is_async)
+        body = b''.join([chunk async for chunk in res.streaming_content])
+        self.assertEqual(len(body.decode().splitlines()), 2)
+
+
+def png_bytes(color='red'):
+    out = io.BytesIO()
+    Image.new('RGB', (800, 600), color).save(out, format='PNG')
+    return out.getvalue()
+
+
+PNG_BYTES = png_bytes()
+
+
+def application_data(**extra):
+    data = {
+        'username': 'amina', 'password': 'S3cure-pass!', 'email': 'a@example.com',
+        'first_name': 'Amina', 'last_name': 'Juma', 'phone': '+255700000000',
+        'address': 'Dar', 'national_id': '1' * 20, 'loan_type': 'home',
+        'requested_amount': '1000000', 'assets_value': '5000000', 'monthly_income': '800000',
+        'sponsor_name': 'Rama', 'sponsor_address': 'Dar', 'sponsor_national_id': '2' * 20,
+        'sponsor_phone': '+255700000001', 'sponsor_email': 'r@example.com',
+    }
+    data.update(extra)
+    return data
+
+
+@override_settings(IMAGE_PROCESSING_SYNC=True)
+class ImageUploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = APIClient()
+
+    def test_multipart_register_and_apply(self):
+        res = self.client.post('/api/register-apply/', application_data(
+            profile_photo=SimpleUploadedFile('me.png', PNG_BYTES, 'image/png'),
+            sponsor_photo=SimpleUploadedFile('sponsor.png', PNG_BYTES, 'image/png'),
+        ), format='multipart')
+        self.assertEqual(res.status_code, 201)
+        user = User.objects.get(username='amina')
+        self.assertRegex(user.profile_photo.name, r'^profiles/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(user.applications.get().sponsor_photo.read(), PNG_BYTES)
+
+    def test_base64_compatibility_mode(self):
+        encoded = 'data:image/png;base64,' + base64.b64encode(PNG_BYTES).decode()
+        res = self.client.post('/api/register-apply/', application_data(profile_photo=encoded), format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(User.objects.get(username='amina').profile_photo.name.endswith('.png'))
+
+    def test_non_image_part_is_rejected(self):
+        res = self.client.post('/api/register-apply/', application_data(
+            profile_photo=SimpleUploadedFile('me.png', b'not an image at all', 'image/png'),
+        ), format='multipart')
+        self.assertEqual(res.status_code, 415)
+        self.assertFalse(User.objects.exists())
+
+    def test_identical_photos_are_stored_once_with_thumbnails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post('/api/register-apply/', application_data(
+                profile_photo=SimpleUploadedFile('me.png', PNG_BYTES, 'image/png'),
+                sponsor_photo=SimpleUploadedFile('sponsor.png', PNG_BYTES, 'image/png'),
+            ), format='multipart')
+        self.assertEqual(res.status_code, 201)
+        user = User.objects.get(username='amina')
+        loan = user.applications.get()
+        # Same bytes in two folders: one file per folder, named by hash
+        self.assertEqual(os.path.basename(user.profile_photo.name), os.path.basename(loan.sponsor_photo.name))
+        self.assertTrue(loan.sponsor_thumbnail.name.endswith('_320.webp'))
+
+        again = make_loan(user, sponsor_photo=SimpleUploadedFile('copy.png', PNG_BYTES, 'image/png'))
+        self.assertEqual(again.sponsor_photo.name, loan.sponsor_photo.name)
+
+        self.client.force_authenticate(User.objects.create_user('admin', password='pw', is_staff=True))
+        row = self.client.get('/api/loans/').data['results'][-1]
+        self.assertEqual(row['sponsor_thumbnail'], loan.sponsor_thumbnail.url)
+
+    def test_thumbnail_invalidates_cached_responses(self):
+        cache.clear()
+        borrower = User.objects.create_user('borrower', password='pw')
+        loan = make_loan(borrower, sponsor_photo=SimpleUploadedFile('sponsor.png', PNG_BYTES, 'image/png'))
+        self.client.force_authenticate(borrower)
+        self.assertIsNone(self.client.get(f'/api/loans/{loan.id}/').data['sponsor_thumbnail'])
+
+        process_photo(LoanApplication, loan.id, 'sponsor_photo', loan.sponsor_photo.name)
+        self.assertTrue(self.client.get(f'/api/loans/{loan.id}/').data['sponsor_thumbnail'].endswith('_320.webp'))
+
+    @override_settings(MAX_IMAGE_UPLOAD_SIZE=100)
+    def test_oversized_image_is_rejected_while_streaming(self):
+        res = self.client.post('/api/register-apply/', application_data(
+            profile_photo=SimpleUploadedFile('me.png', PNG_BYTES, 'image/png'),
+        ), format='multipart')
+        self.assertEqual(res.status_code, 413)
+
+
+class AuthHashingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_register_and_apply_logs_in_without_verifying_again(self):
+        with mock.patch('loans.hashing.check_password') as verify:
+            res = self.client.post('/api/register-apply/', application_data(), format='json')
+        self.assertEqual(res.status_code, 201)
+        verify.assert_not_called()
+        # The session from register-apply is authenticated
+        self.assertEqual(self.client.get('/api/loans/').status_code, 200)
+
+    def test_login(self):
+        User.objects.create_user('amina', password='S3cure-pass!')
+        bad = self.client.post('/api/login/', {'username': 'amina', 'password': 'nope'}, format='json')
+        self.assertEqual(bad.status_code, 401)
+        good = self.client.post('/api/login/', {'username': 'amina', 'password': 'S3cure-pass!'}, format='json')
+        self.assertEqual(good.status_code, 200)
+        self.assertEqual(self.client.get('/api/loans/').status_code, 200)
+
+    def test_failed_login_goes_through_authenticate(self):
+        User.objects.create_user('amina', password='S3cure-pass!')
+        failures = []
+        receiver = lambda sender, credentials, **kwargs: failures.append(credentials['username'])
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        self.client.post('/api/login/', {'username': 'amina', 'password': 'nope'}, format='json')
+        self.client.post('/api/token/', {'username': 'amina', 'password': 'nope'}, format='json')
+        self.assertEqual(failures, ['amina', 'amina'])
+
+    def test_saturated_pool_returns_503(self):
+        with mock.patch('loans.hashing.run_hashing', side_effect=HashingBusy):
+            res = self.client.post('/api/login/', {'username': 'a', 'password': 'b'}, format='json')
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res['Retry-After'], '1')
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE=0)
+    def test_full_pool_rejects_without_waiting(self):
+        started, release = threading.Event(), threading.Event()
+
+        def hold():
+            started.set()
+            release.wait()
+
+        with mock.patch.multiple('loans.hashing', _pool=None, _slots=None):
+            holder = threading.Thread(target=run_hashing, args=(hold,))
+            holder.start()
+            started.wait()
+            with self.assertRaises(HashingBusy):
+                run_hashing(len, 'x')
+            release.set()
+            holder.join()
+
+
+class PortfolioSummaryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def snapshot(self):
+        return sorted(PortfolioSummary.objects.exclude(loan_count=0).values_list(
+            'status', 'loan_type', 'month', *MEASURES,
+        ))
+
+    def test_incremental_totals_match_rebuild(self):
+        car = make_loan(self.borrower, loan_type='car')
+        home = make_loan(self.borrower)
+        make_loan(self.borrower, loan_type='education', status='rejected')
+        self.client.post(f'/api/loans/{home.id}/approve/', {}, format='json')
+        self.client.post('/api/payments/', {'loan': home.id, 'amount': '2500.00', 'phone': '+255700000000'}, format='json')
+        payment = Payment.objects.get()
+        self.client.delete(f'/api/payments/{payment.id}/')
+        self.client.post('/api/payments/', {'loan': home.id, 'amount': '1000.00', 'phone': '+255700000000'}, format='json')
+        reschedule_loans(LoanApplication.objects.all(), term=12)
+        car.delete()
+        home.refresh_from_db()
+        self.assertEqual(home.amount_paid, Decimal('1000.00'))
+
+        incremental = self.snapshot()
+        rebuild_summary()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_analytics_endpoint(self):
+        make_loan(self.borrower, loan_type='car', requested_amount=Decimal('300.00'))
+        make_loan(self.borrower, loan_type='car', requested_amount=Decimal('200.00'))
+        make_loan(self.borrower, status='approved', approved_amount=Decimal('100.00'))
+
+        res = self.client.get('/api/analytics/', {'group_by': 'loan_type', 'status': 'pending'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['buckets'], [
+            {'loan_type': 'car', 'loan_count': 2, 'requested_total': Decimal('500.00'),
+             'approved_total': Decimal('0.00'), 'amount_paid_total': Decimal('0.00'),
+             'outstanding_total': Decimal('0.00')},
+        ])
+        self.assertEqual(self.client.get('/api/analytics/').data['totals']['loan_count'], 3)
+        self.assertEqual(self.client.get('/api/analytics/', {'group_by': 'bogus'}).status_code, 400)
+
+        self.client.force_authenticate(self.borrower)
+        self.assertEqual(self.client.get('/api/analytics/').status_code, 403)
+
+
+class SponsorExposureTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def snapshot(self):
+        return sorted(SponsorExposure.objects.exclude(active_loans=0).values_list(
+            'sponsor_national_id', *EXPOSURE_MEASURES,
+        ))
+
+    def pay(self, loan, amount):
+        return self.client.post('/api/payments/', {'loan': loan.id, 'amount': amount, 'phone': '+255700000000'},
+                                format='json')
+
+    def test_incremental_totals_match_rebuild(self):
+        first, second, third = (make_loan(self.borrower, sponsor_national_id='S1') for _ in range(3))
+        other = make_loan(self.borrower, sponsor_national_id='S2')
+        make_loan(self.borrower)  # no sponsor
+
+        self.client.post(f'/api/loans/{first.id}/approve/', {'term': 12}, format='json')
+        self.client.post('/api/loans/decisions/', {'decisions': [
+            {'id': second.id, 'status': 'approved'}, {'id': third.id, 'status': 'rejected'},
+            {'id': other.id, 'status': 'approved'},
+        ]}, format='json')
+        exposure = SponsorExposure.objects.get(sponsor_national_id='S1')
+        self.assertEqual((exposure.active_loans, exposure.approved_total), (2, Decimal('2000000.00')))
+
+        self.pay(first, '2500.00')
+        self.client.delete(f'/api/payments/{Payment.objects.get().id}/')
+        self.pay(second, '1000.00')
+        apply_deltas({first.id: Decimal('300.00'), other.id: Decimal('50.00')})
+        reschedule_loans(LoanApplication.objects.filter(pk=second.pk), term=6)
+        # Paid off: no longer active
+        other.refresh_from_db()
+        self.pay(other, str(other.remaining_balance))
+        # Moving a loan to another sponsor moves its exposure
+        self.client.patch(f'/api/loans/{second.id}/', {'sponsor_national_id': 'S3'}, format='json')
+
+        incremental = self.snapshot()
+        self.assertEqual([row[:2] for row in incremental], [('S1', 1), ('S3', 1)])
+        rebuild_exposure()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_review_views_show_exposure(self):
+        pending = make_loan(self.borrower, sponsor_national_id='S1')
+        active = make_loan(self.borrower, sponsor_national_id='S1')
+        self.client.post(f'/api/loans/{active.id}/approve/', {'term': 12}, format='json')
+
+        res = self.client.post(f'/api/loans/{pending.id}/approve/', {'term': 12}, format='json')
+        self.assertEqual(res.data['sponsor_exposure']['active_loans'], 2)
+
+        outstanding = sum(LoanApplication.objects.filter(sponsor_national_id='S1')
+                          .values_list('remaining_balance', flat=True))
+        with self.assertNumQueries(2):  # the loan, its sponsor's exposure
+            detail = self.client.get(f'/api/loans/{pending.id}/').json()
+        self.assertEqual(detail['sponsor_exposure'], {
+            'sponsor_national_id': 'S1', 'active_loans': 2,
+            'approved_total': '2000000.00', 'outstanding_total': str(outstanding),
+        })
+        self.assertNotIn('sponsor_exposure', self.client.get(f'/api/loans/{pending.id}/', {'fields': 'id'}).data)
+
+        # Not shown to borrowers; the async detail matches the DRF one
+        self.client.force_authenticate(self.borrower)
+        self.assertNotIn('sponsor_exposure', self.client.get(f'/api/loans/{pending.id}/').data)
+        cache.clear()
+        session = APIClient()
+        session.login(username='admin', password='pw')
+        self.assertEqual(session.get(f'/api/loans/{pending.id}/').json(), detail)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.other = User.objects.create_user('other', password='pw')
+        self.loan = make_loan(self.borrower, status='approved', remaining_balance=Decimal('100.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.borrower)
+
+    def test_repeat_reads_are_served_from_cache(self):
+        first = self.client.get('/api/loans/')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/loans/')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_conditional_get_returns_304(self):
+        etag = self.client.get(f'/api/loans/{self.loan.id}/')['ETag']
+        with self.assertNumQueries(1):  # the loan must still exist and be visible
+            res = self.client.get(f'/api/loans/{self.loan.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+
+        with mock.patch('loans.cache.time') as clock:
+            clock.time.return_value = 1_700_000_000.5
+            self.loan.save()  # last write
+            clock.time.return_value += 5
+            modified = self.client.get('/api/loans/')['Last-Modified']
+            res = self.client.get('/api/loans/', HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(res.status_code, 304)
+
+    def test_same_second_write_is_not_hidden_by_if_modified_since(self):
+        with mock.patch('loans.cache.time') as clock:
+            clock.time.return_value = 1_700_000_000.2
+            modified = self.client.get('/api/loans/')['Last-Modified']
+            self.client.post('/api/payments/', {'loan': self.loan.id, 'amount': '10.00', 'phone': '+255700000000'})
+            clock.time.return_value = 1_700_000_000.7
+            res = self.client.get('/api/loans/', HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['results'][0]['amount_paid'], '10.00')
+
+    def test_no_304_for_missing_or_hidden_loans(self):
+        other_loan = make_loan(self.other)
+        for client in (self.client, self.session_client()):
+            for loan_id in (other_loan.id, 999999):
+                res = client.get(f'/api/loans/{loan_id}/', HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(res.status_code, 404)
+
+    def session_client(self):
+        # Session logins are served by the async read views
+        client = APIClient()
+        client.login(username='borrower', password='pw')
+        return client
+
+    def test_writes_invalidate(self):
+        etag = self.client.get('/api/payments/')['ETag']
+        self.client.post('/api/payments/', {'loan': self.loan.id, 'amount': '10.00', 'phone': '+255700000000'})
+
+        res = self.client.get('/api/payments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data), 1)
+        loan = self.client.get(f'/api/loans/{self.loan.id}/')
+        self.assertEqual(loan.data['amount_paid'], '10.00')
+
+    def test_entries_are_per_user(self):
+        self.client.get('/api/loans/')
+        self.client.force_authenticate(self.other)
+        res = self.client.get('/api/loans/')
+        self.assertEqual(res.data['results'], [])
+
+
+class AsyncReadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.other = User.objects.create_user('other', password='pw')
+        self.loan = make_loan(self.borrower, status='approved', remaining_balance=Decimal('100.00'))
+        make_loan(self.other)
+        Payment.objects.create(loan=self.loan, amount=Decimal('10.00'), phone='+255700000000')
+        self.client = APIClient()
+        self.client.login(username='borrower', password='pw')
+
+    def sync_body(self, url):
+        # force_authenticate goes through the DRF viewset
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(self.borrower)
+        return client.get(url).content
+
+    def test_output_matches_drf_views(self):
+        for url in ('/api/loans/', '/api/loans/?include=payments&page_size=1',
+                    f'/api/loans/{self.loan.id}/', '/api/payments/'):
+            cache.clear()
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            self.assertIsNone(getattr(res, 'data', None))  # not a DRF Response
+            self.assertEqual(res.content, self.sync_body(url), url)
+
+    def test_queries_are_instrumented(self):
+        res = self.client.get('/api/loans/')
+        self.assertGreater(int(res['X-Query-Count']), 0)
+        self.assertIn('ETag', res)
+
+    def test_scoping_and_errors(self):
+        other_loan = LoanApplication.objects.get(applicant=self.other)
+        self.assertEqual(self.client.get(f'/api/loans/{other_loan.id}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/loans/', {'status': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/loans/', {'cursor': 'junk'}).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/loans/').status_code, 403)
+
+    def test_writes_use_the_drf_view(self):
+        res = self.client.post('/api/payments/', {'loan': self.loan.id, 'amount': '5.00', 'phone': '+255700000000'})
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(len(self.client.get('/api/payments/').json()), 2)
+
+    async def test_served_by_the_async_handler(self):
+        await self.async_client.aforce_login(self.borrower)
+        res = await self.async_client.get('/api/loans/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([row['id'] for row in res.json()['results']], [self.loan.id])
+        self.assertGreater(int(res['X-Query-Count']), 0)
+        csrf = await self.async_client.get('/api/csrf/')
+        self.assertIn('csrfToken', csrf.json())
+
+
+class DatabaseRoutingTests(TestCase):
+    def test_reads_use_replica_only_inside_replica_reads(self):
+        router = ReplicaRouter()
+        with mock.patch('loans.routers.has_replica', return_value=True):
+            self.assertEqual(router.db_for_read(LoanApplication), 'default')
+            with replica_reads():
+                self.assertEqual(router.db_for_read(LoanApplication), 'replica')
+                self.assertEqual(router.db_for_write(LoanApplication), 'default')
+            self.assertEqual(on_replica(LoanApplication.objects.all()).db, 'replica')
+        # No replica configured: everything stays on default
+        with replica_reads():
+            self.assertEqual(router.db_for_read(LoanApplication), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'loans'))
+
+    def test_sqlite_settings(self):
+        writer = sqlite_database('/tmp/app.sqlite3')
+        self.assertIn('PRAGMA journal_mode=WAL', writer['OPTIONS']['init_command'])
+        self.assertEqual(writer['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        reader = sqlite_database('/tmp/app.sqlite3', read_only=True)
+        self.assertEqual(reader['NAME'], 'file:/tmp/app.sqlite3?mode=ro')
+        self.assertEqual(reader['TEST'], {'MIRROR': 'default'})
+        self.assertEqual(sqlite_database('/tmp/app.sqlite3', wal=False)['OPTIONS'], {})
+
+    def test_checked_in_database_is_not_switched_to_wal(self):
+        base_dir = Path('/srv/app')
+        with mock.patch.dict(os.environ, {'DB_ENGINE': 'sqlite'}, clear=True):
+            self.assertEqual(databases_from_env(base_dir)['default']['OPTIONS'], {})
+        with mock.patch.dict(os.environ, {'DB_NAME': '/var/lib/app.sqlite3'}, clear=True):
+            self.assertIn('journal_mode=WAL', databases_from_env(base_dir)['default']['OPTIONS']['init_command'])
+        with mock.patch.dict(os.environ, {'SQLITE_WAL': '1'}, clear=True):
+            self.assertIn('init_command', databases_from_env(base_dir)['default']['OPTIONS'])
+
+
+class RiskScoringTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_ratios_and_score(self):
+        make_loan(self.borrower, status='approved', remaining_balance=Decimal('2400000.00'))
+        safe = make_loan(self.borrower, loan_type='car', requested_amount=Decimal('1000000.00'),
+                         monthly_income=Decimal('1000000.00'), assets_value=Decimal('4000000.00'))
+        risky = make_loan(self.borrower, requested_amount=Decimal('9000000.00'), monthly_income=Decimal('0'))
+        self.assertEqual(score_loans(), 2)
+
+        safe.refresh_from_db()
+        payment = float(Decimal('1000000') * annuity_factor(Decimal('4.5'), 24))
+        self.assertAlmostEqual(safe.debt_to_income, payment / 1000000)
+        self.assertAlmostEqual(safe.loan_to_assets, 0.25)
+        self.assertAlmostEqual(safe.exposure_ratio, 0.2)
+        self.assertAlmostEqual(safe.risk_score, 50 * safe.debt_to_income / 0.5 + 30 * 0.25 + 20 * 0.1)
+        self.assertIsNotNone(safe.scored_at)
+
+        # No income and no assets: every component at its worst
+        risky.refresh_from_db()
+        self.assertIsNone(risky.debt_to_income)
+        self.assertEqual(risky.risk_score, 100)
+
+    def test_list_sorts_by_risk(self):
+        loans = [
+            make_loan(self.borrower, monthly_income=Decimal(income), assets_value=Decimal('1000000.00'))
+            for income in ('50000.00', '900000.00', '200000.00')
+        ]
+        unscored = [make_loan(self.borrower), make_loan(self.borrower)]
+        score_loans(LoanApplication.objects.filter(pk__in=[loan.pk for loan in loans]))
+
+        def walk(ordering, client=self.client):
+            ids = []
+            url = f'/api/loans/?ordering={ordering}&page_size=2'
+            while url:
+                page = client.get(url).json()
+                ids += [row['id'] for row in page['results']]
+                url = page['next']
+            return ids
+
+        # Unscored loans come last either way, so paging reaches every loan
+        ranked = [loans[0].id, loans[2].id, loans[1].id]
+        self.assertEqual(walk('-risk_score'), ranked + [unscored[1].id, unscored[0].id])
+        self.assertEqual(walk('risk_score'), ranked[::-1] + [unscored[0].id, unscored[1].id])
+        session = APIClient()  # served by the async read view
+        session.login(username='admin', password='pw')
+        self.assertEqual(walk('-risk_score', session), walk('-risk_score'))
+        self.assertEqual(self.client.get('/api/loans/', {'ordering': 'name'}).status_code, 400)
+
+
+class DelinquencyTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.late = approve_loan(make_loan(self.borrower))
+        self.paid = approve_loan(make_loan(self.borrower))
+        self.schedule = [(row.due_date, row.amount) for row in self.late.installments.order_by('number')]
+        # Five days after the second installment fell due
+        self.as_of = self.schedule[1][0] + timedelta(days=5)
+        post_payment(self.paid.id, self.schedule[0][1] + self.schedule[1][1], '+255700000000')
+
+    def test_loan_position(self):
+        (first, amount), (second, _) = self.schedule[:2]
+        self.assertEqual(loan_position(Decimal(0), self.schedule, first), (0, 0))
+        self.assertEqual(loan_position(Decimal(0), self.schedule, first + timedelta(days=1)), (1, amount))
+        self.assertEqual(loan_position(amount, self.schedule, self.as_of), ((self.as_of - second).days, amount))
+
+    def test_overdue_filter(self):
+        self.assertEqual(detect_delinquency(self.as_of), 2)
+        self.late.refresh_from_db()
+        self.assertEqual(self.late.days_past_due, (self.as_of - self.schedule[0][0]).days)
+        self.assertEqual(self.late.arrears, self.schedule[0][1] + self.schedule[1][1])
+        self.assertEqual(self.late.delinquency_status, 'delinquent')
+
+        res = self.client.get('/api/loans/', {'overdue': 'true'})
+        self.assertEqual([row['id'] for row in res.data['results']], [self.late.id])
+        res = self.client.get('/api/loans/', {'overdue': 'false'})
+        self.assertEqual([row['id'] for row in res.data['results']], [self.paid.id])
+        self.assertEqual(self.client.get('/api/loans/', {'overdue': 'maybe'}).status_code, 400)
+
+    def test_only_changed_loans_are_read(self):
+        # Daily runs happen "on" as_of; the clock ticks a second per call
+        start = timezone.make_aware(datetime.combine(self.as_of, time(2)))
+        ticks = (start + timedelta(seconds=n) for n in itertools.count())
+        clock = mock.patch('django.utils.timezone.now', side_effect=lambda: next(ticks))
+        self.enterContext(clock)
+
+        detect_delinquency(self.as_of)
+        # Nothing new: only the loan already in arrears is re-checked
+        self.assertEqual(detect_delinquency(self.as_of), 1)
+
+        post_payment(self.late.id, self.late.installments.get(number=1).amount, '+255700000000')
+        self.assertEqual(detect_delinquency(self.as_of), 1)
+        self.late.refresh_from_db()
+        self.assertEqual(self.late.delinquency_status, 'late')
+
+        # A reversal leaves no payment row behind; the loan is flagged instead
+        reverse_payment(self.paid.payments.get())
+        self.assertEqual(detect_delinquency(self.as_of), 2)
+        self.paid.refresh_from_db()
+        self.assertEqual(self.paid.delinquency_status, 'delinquent')
+
+
+class LiveEventTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.loan = make_loan(self.borrower)
+
+    def test_published_after_commit(self):
+        with mock.patch('loans.events.send') as send:
+            with self.captureOnCommitCallbacks(execute=True):
+                approve_loan(self.loan)
+                post_payment(self.loan.id, Decimal('10.00'), '+255700000000')
+                send.assert_not_called()
+        (status_event,), (payment_event,) = [call.args for call in send.call_args_list]
+        self.assertEqual(status_event, {'type': 'loan.status', 'user': self.borrower.id, 'loan': self.loan.id,
+                                        'status': 'approved', 'previous': 'pending'})
+        self.assertEqual(payment_event['amount'], '10.00')
+        self.assertEqual(payment_event['user'], self.borrower.id)
+
+    async def read_event(self, chunks):
+        return (await asyncio.wait_for(anext(chunks), 1)).decode()
+
+    async def test_stream_reaches_owner_and_admins(self):
+        other = await User.objects.acreate(username='other')
+        await self.async_client.aforce_login(self.borrower)
+        res = await self.async_client.get('/api/events/')
+        self.assertEqual(res['Content-Type'], 'text/event-stream')
+        chunks = aiter(res.streaming_content)
+        self.assertEqual(await self.read_event(chunks), 'retry: 5000\n\n')
+        admin_stream = broker.subscribe(self.admin.id, admin=True)
+        try:
+            broker.dispatch({'type': 'payment', 'user': other.id, 'loan': 1})
+            broker.dispatch({'type': 'loan.status', 'user': self.borrower.id, 'loan': self.loan.id})
+            self.assertEqual(await self.read_event(chunks),
+                             f'event: loan.status\ndata: {{"type": "loan.status", "loan": {self.loan.id}}}\n\n')
+            self.assertEqual(admin_stream.queue.qsize(), 2)
+        finally:
+            broker.unsubscribe(admin_stream)
+        # The ASGI handler cancels the response on client disconnect
+        pending = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(len(broker), 0)
+
+    async def test_requires_login(self):
+        res = await self.async_client.get('/api/events/')
+        self.assertEqual(res.status_code, 403)
+        res = await self.async_client.get('/api/events/', {'access_token': 'junk'})
+        self.assertEqual(res.status_code, 403)
+
+    async def test_access_token_in_query(self):
+        tokens = await sync_to_async(issue_tokens)(self.borrower)
+        res = await self.async_client.get('/api/events/', {'access_token': tokens['access']})
+        self.assertEqual(res['Content-Type'], 'text/event-stream')
+        chunks = aiter(res.streaming_content)
+        self.assertEqual(await self.read_event(chunks), 'retry: 5000\n\n')
+        self.assertEqual(len(broker), 1)
+        pending = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+
+
+class SeedingTests(TestCase):
+    def test_consistent_synthetic_portfolio(self):
+        counts = seed(users=10, loans=80, seed=3)
+        self.assertEqual((counts['users'], counts['loans']), (10, 80))
+        self.assertEqual(counts['payments'], Payment.objects.count())
+        self.assertEqual(set(LoanApplication.objects.values_list('status', flat=True)),
+                         {key for key, _ in LoanApplication.STATUS_CHOICES})
+        # Spread over the history rather than all stamped "now"
+        self.assertGreater(LoanApplication.objects.values('created_at').distinct().count(), 70)
+
+        for loan in LoanApplication.objects.filter(status='approved').prefetch_related('payments', 'installments'):
+            self.assertEqual(loan.amount_paid, sum(p.amount for p in loan.payments.all()))
+            self.assertEqual(loan.remaining_balance,
+                             sum(i.amount for i in loan.installments.all()) - loan.amount_paid)
+        self.assertEqual(sum(PortfolioSummary.objects.values_list('loan_count', flat=True)), 80)
+        self.assertTrue(self.client.login(username='synthetic-0', password=SEED_PASSWORD))
+
+
+class FastListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        make_loan(self.borrower, name='Zoë \u2028 "quoted"', sponsor_photo='sponsors/a.png')
+        approve_loan(make_loan(self.borrower, loan_type='car'))
+        make_loan(self.borrower, interest_rate=1e-05, risk_score=0.25, scored_at=timezone.now())
+
+    def test_rows_match_the_model_serializer(self):
+        loans = LoanApplication.objects.order_by('id')
+        expected = LoanApplicationSerializer(loans, many=True).data
+        rows = ValuesSerializer(LoanApplicationSerializer)
+        actual = rows.serialize(loans.values(*rows.columns))
+        self.assertEqual(actual, [dict(row) for row in expected])
+        self.assertEqual(FastJSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_renderer_matches_json_renderer(self):
+        for data in ({'a': [1, 2.5, None, True, 'é\u2029']}, {'tiny': 1e-05}, {'big': 1e20},
+                     {1: 'int key'}, {'amount': Decimal('1.50')}, [2 ** 70]):
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data), data)
+        with self.assertRaises(ValueError):  # NaN is refused, as by JSONRenderer
+            FastJSONRenderer().render([float('nan')])
+        self.assertTrue(orjson_compatible({'a': [0.0, 1.5, 'x']}))
+        self.assertFalse(orjson_compatible([1e-05]))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_list_endpoint_uses_rows(self):
+        client = APIClient()
+        client.force_authenticate(self.borrower)
+        res = client.get('/api/loans/')
+        self.assertEqual(len(res.data['results']), 3)
+        with mock.patch('loans.views.loan_list_rows', return_value=None):
+            cache.clear()
+            self.assertEqual(client.get('/api/loans/').content, res.content)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.loan = make_loan(self.borrower, status='approved', sponsor_address='Dodoma')
+        Payment.objects.create(loan=self.loan, amount=Decimal('10.00'), phone='+255700000000')
+        self.client = APIClient()
+        self.client.force_authenticate(self.borrower)
+
+    def test_paging_without_the_cursor_fields(self):
+        for _ in range(2):
+            make_loan(self.borrower)
+        session = APIClient()
+        session.login(username='borrower', password='pw')
+        for client in (self.client, session):  # DRF viewset, async view
+            for params in ({'fields': 'name'}, {'exclude': 'id'}):
+                cache.clear()
+                url, params, rows = '/api/loans/', {**params, 'page_size': 1}, []
+                while url:
+                    res = client.get(url, params)
+                    self.assertEqual(res.status_code, 200, params)
+                    rows.extend(res.json()['results'])
+                    url, params = res.json()['next'], None
+                self.assertEqual(len(rows), 3)
+                self.assertNotIn('id', rows[0])
+
+    def test_profiles_fields_and_exclude(self):
+        summary = LoanApplicationSerializer.Meta.profiles['summary']
+        row = self.client.get('/api/loans/', {'profile': 'summary'}).data['results'][0]
+        self.assertEqual(list(row), summary)
+        row = self.client.get('/api/loans/', {'profile': 'full'}).data['results'][0]
+        self.assertEqual(list(row), LoanApplicationSerializer.Meta.fields)
+        row = self.client.get('/api/loans/', {'fields': 'status,id', 'ordering': '-created_at'}).data['results'][0]
+        self.assertEqual(row, {'id': self.loan.id, 'status': 'approved'})
+        row = self.client.get(f'/api/loans/{self.loan.id}/', {'profile': 'summary', 'exclude': 'name'}).data
+        self.assertEqual(list(row), [name for name in summary if name != 'name'])
+        self.assertEqual(self.client.get('/api/payments/', {'fields': 'amount'}).data, [{'amount': '10.00'}])
+        res = self.client.get('/api/loans/', {'include': 'payments', 'profile': 'summary'})
+        self.assertEqual(len(res.data['results'][0]['payments']), 1)
+
+        self.client.force_authenticate(self.admin)
+        users = self.client.get('/api/users/', {'profile': 'summary'}).data
+        self.assertEqual(list(users[0]), UserSerializer.Meta.profiles['summary'])
+
+    def test_unknown_names_are_rejected(self):
+        for params in ({'fields': 'id,bogus'}, {'exclude': 'bogus'}, {'profile': 'tiny'}):
+            self.assertEqual(self.client.get('/api/loans/', params).status_code, 400, params)
+        self.assertEqual(self.client.get('/api/payments/', {'profile': 'tiny'}).status_code, 400)
+
+    def test_unused_columns_are_not_fetched(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/api/loans/{self.loan.id}/', {'fields': 'status'})
+        sql = next(q['sql'] for q in queries if 'loans_loanapplication' in q['sql'])
+        self.assertNotIn('sponsor_address', sql)
+        self.assertIn('applicant_id', sql)  # object permission check
+
+    def test_async_views_match(self):
+        session = APIClient()
+        session.login(username='borrower', password='pw')
+        for url in ('/api/loans/?profile=summary', '/api/loans/?fields=id&include=payments',
+                    f'/api/loans/{self.loan.id}/?exclude=sponsor_photo', '/api/payments/?profile=summary',
+                    '/api/loans/?fields=bogus'):
+            cache.clear()
+            expected = self.client.get(url)
+            cache.clear()
+            res = session.get(url)
+            self.assertEqual((res.status_code, res.content), (expected.status_code, expected.content), url)
+
+
+class TokenAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocations.clear()
+        self.borrower = User.objects.create_user('borrower', password='pw')
+        self.loan = make_loan(self.borrower)
+        make_loan(User.objects.create_user('other', password='pw'))
+        self.client = APIClient()
+        res = self.client.post('/api/token/', {'username': 'borrower', 'password': 'pw'})
+        self.assertEqual(res.status_code, 200)
+        self.tokens = res.data
+
+    def bearer(self, token):
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def test_access_token_authenticates_without_queries(self):
+        res = self.client.get('/api/loans/', **self.bearer(self.tokens['access']))
+        self.assertEqual([row['id'] for row in res.json()['results']], [self.loan.id])
+        with self.assertNumQueries(0):
+            user = authenticate_token(self.tokens['access'])
+        self.assertEqual((user.pk, user.username, user.is_staff), (self.borrower.pk, 'borrower', False))
+
+        # Sync DRF path (?format=), async path and session login, on a cold cache
+        counts = {}
+        for label, url, headers in (('drf', '/api/loans/?format=json', self.bearer(self.tokens['access'])),
+                                    ('async', '/api/loans/', self.bearer(self.tokens['access'])),
+                                    ('session', '/api/loans/?format=json', {})):
+            cache.clear()
+            client = self.client_class()
+            if not headers:
+                client.login(username='borrower', password='pw')
+            counts[label] = int(client.get(url, **headers)['X-Query-Count'])
+        self.assertEqual(counts['session'] - counts['drf'], 2)  # django_session + loans_user
+        self.assertEqual(counts['async'], counts['drf'])
+
+    def test_bad_tokens_get_401(self):
+        for token in ('junk', self.tokens['refresh']):
+            res = self.client.get('/api/loans/', **self.bearer(token))
+            self.assertEqual(res.status_code, 401)
+            self.assertEqual(res['WWW-Authenticate'], 'Bearer')
+        with override_settings(ACCESS_TOKEN_LIFETIME=-1):
+            res = self.client.get('/api/loans/', **self.bearer(self.tokens['access']))
+        self.assertEqual((res.status_code, res.json()['detail']), (401, 'Token has expired'))
+        self.assertEqual(self.client.get('/api/loans/').status_code, 403)
+
+    def test_refresh_rotates_and_reuse_revokes(self):
+        res = self.client.post('/api/token/refresh/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(res.status_code, 200)
+        rotated = res.data
+        self.assertEqual(self.client.get('/api/loans/', **self.bearer(rotated['access'])).status_code, 200)
+
+        # The old refresh token again: a stolen copy, so the session ends
+        res = self.client.post('/api/token/refresh/', {'refresh': self.tokens['refresh']})
+        self.assertEqual((res.status_code, res.data['code']), (401, 'token_revoked'))
+        self.assertEqual(self.client.get('/api/loans/', **self.bearer(rotated['access'])).status_code, 401)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': rotated['refresh']}).status_code, 401)
+
+    def test_revoke(self):
+        res = self.client.post('/api/token/revoke/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(res.status_code, 204)
+        self.assertEqual(self.client.get('/api/loans/', **self.bearer(self.tokens['access'])).status_code, 401)
+
+        # Another process only learns of it from the database, once its entry expires
+        tokens = self.client.post('/api/token/', {'username': 'borrower', 'password': 'pw'}).data
+        self.assertEqual(revoke_user_tokens(self.borrower), 1)
+        revocations.clear()
+        self.assertEqual(self.client.get('/api/loans/', **self.bearer(tokens['access'])).status_code, 401)
+        self.assertFalse(TokenSession.objects.filter(revoked_at=None).exists())
+
+    def test_password_change_and_deactivation_end_sessions(self):
+        for change in ('set_password', 'deactivate'):
+            tokens = self.client.post('/api/token/', {'username': 'borrower', 'password': 'pw'}).data
+            user = User.objects.get(pk=self.borrower.pk)
+            if change == 'set_password':
+                user.set_password('pw')  # same password, new hash
+            else:
+                user.is_active = False
+            with self.captureOnCommitCallbacks(execute=True):
+                user.save()
+            res = self.client.get('/api/loans/', **self.bearer(tokens['access']))
+            self.assertEqual(res.status_code, 401, change)
+            user.is_active = True
+            user.save()
+
+        tokens = self.client.post('/api/token/', {'username': 'borrower', 'password': 'pw'}).data
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.borrower.pk).save()
+        self.assertEqual(self.client.get('/api/loans/', **self.bearer(tokens['access'])).status_code, 200)
+
+    def test_login_is_rejected_without_valid_credentials(self):
+        self.assertEqual(self.client.post('/api/token/', {'username': 'borrower', 'password': 'x'}).status_code, 401)
+        self.assertEqual(self.client.post('/api/token/', {'username': 'borrower'}).status_code, 400)
+
+    def test_refresh_must_be_a_string(self):
+        for url in ('/api/token/refresh/', '/api/token/revoke/'):
+            for refresh in (123, ['x'], {'sid': 1}):
+                res = self.client.post(url, {'refresh': refresh}, format='json')
+                self.assertEqual(res.status_code, 400, (url, refresh))
+        with self.assertRaises(TokenError):
+            authenticate_token(123)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        self.exact = User.objects.create_user('neema', password='pw')
+        self.mushi = User.objects.create_user('nm', first_name='Neema', last_name='Mushi', phone='+255711000001',
+                                              national_id='19900101000011')
+        self.kimaro = User.objects.create_user('nk', first_name='Neema', last_name='Kimaro')
+        self.surname = User.objects.create_user('jn', first_name='Juma', last_name='Neemani')
+        self.accented = User.objects.create_user('zo', first_name='Zoë', last_name="N'gowi")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def search(self, url, **params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, 200, res.data)
+        return [(row['id'], row['match']) for row in res.data['results']]
+
+    def test_users_ranked_exact_then_name_then_surname(self):
+        self.assertEqual(self.search('/api/users/search/', q='neema'), [
+            (self.exact.id, 'exact'), (self.kimaro.id, 'name'), (self.mushi.id, 'name'),
+            (self.surname.id, 'surname'),
+        ])
+        self.assertEqual(self.search('/api/users/search/', q='Neema  Mu'), [(self.mushi.id, 'name')])
+        self.assertEqual(self.search('/api/users/search/', q='+255 711 000 001'), [(self.mushi.id, 'exact')])
+        self.assertEqual(self.search('/api/users/search/', q='19900101000011'), [(self.mushi.id, 'exact')])
+        self.assertEqual(self.search('/api/users/search/', q='zoe ng'), [(self.accented.id, 'name')])
+        row = self.client.get('/api/users/search/', {'q': 'nee', 'fields': 'id,username'}).data['results'][0]
+        self.assertEqual(row, {'id': self.exact.id, 'username': 'neema', 'match': 'name'})
+
+    def test_pages_walk_every_match_once(self):
+        seen = []
+        url = '/api/users/search/?q=neema&page_size=1'
+        while url:
+            res = self.client.get(url)
+            seen.extend(row['id'] for row in res.data['results'])
+            url = res.data['next']
+        self.assertEqual(seen, [self.exact.id, self.kimaro.id, self.mushi.id, self.surname.id])
+        self.assertEqual(self.client.get('/api/users/search/', {'q': 'x', 'cursor': 'junk'}).status_code, 404)
+        for values in ([0, 'a', 'x'], [1, 'amani', None], [True, 'a', 1], [0, 5, 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            res = self.client.get('/api/users/search/', {'q': 'neema', 'cursor': cursor})
+            self.assertEqual(res.status_code, 404, values)
+        self.assertEqual(self.client.get('/api/users/search/').status_code, 400)
+
+    def test_search_columns_follow_renames(self):
+        self.kimaro.last_name = 'Swai'
+        self.kimaro.save(update_fields=['last_name'])
+        self.assertEqual(User.objects.get(pk=self.kimaro.pk).search_surname, 'swai neema')
+        self.assertEqual(self.search('/api/users/search/', q='swai'), [(self.kimaro.id, 'surname')])
+
+    def test_name_ranks_use_the_search_indexes(self):
+        _, name, surname = user_matches(User.objects.all(), 'neema')
+        self.assertIn('user_search_name_idx', name[1].order_by('search_name', 'id')[:20].explain())
+        self.assertIn('user_search_surname_idx', surname[1].order_by('search_surname', 'id')[:20].explain())
+
+    def test_loans(self):
+        mine = make_loan(self.mushi, sponsor_national_id='555')
+        theirs = make_loan(self.kimaro)
+        self.assertEqual(mine.search_name, 'neema mushi')
+        self.assertEqual(self.search('/api/loans/search/', q='neema'), [(theirs.id, 'name'), (mine.id, 'name')])
+        self.assertEqual(self.search('/api/loans/search/', q='555'), [(mine.id, 'exact')])
+        self.assertEqual(self.search('/api/loans/search/', q='+255711000001'), [(mine.id, 'exact')])
+
+        self.client.force_authenticate(self.mushi)
+        self.assertEqual(self.search('/api/loans/search/', q='neema'), [(mine.id, 'name')])
+        self.assertEqual(self.client.get('/api/users/search/', {'q': 'neema'}).status_code, 403)
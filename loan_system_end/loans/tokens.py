@@ -0,0 +1,207 @@
+# loans/tokens.py
+"""
+Signed bearer tokens for the API.
+
+POST /api/token/ trades credentials for a short-lived access token and a
+refresh token. Both are django.core.signing payloads (HMAC-SHA256 with
+SECRET_KEY and a timestamp), so checking one is a signature and age
+check. The access token carries the user's id, username and admin flags
+and authenticates a request without loading the session or the user.
+
+Every login starts a TokenSession row. The refresh token names the
+session and its generation: refreshing bumps the generation (rotation),
+and presenting a refresh token that was already used revokes the whole
+session, since someone else holds a copy. Access tokens name their
+session too and are refused once it is revoked. Whether a session is
+still active is remembered in a small per-process LRU with a TTL, so the
+common case never touches the database; a revocation made by another
+process is seen within TOKEN_REVOCATION_CACHE_SECONDS. Flags in an
+access token are as of its issue, at most ACCESS_TOKEN_LIFETIME old.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils import timezone
+
+from .models import User, TokenSession
+
+ACCESS_SALT = 'loans.tokens.access'
+REFRESH_SALT = 'loans.tokens.refresh'
+# Loaded from the access token; any other field is fetched on first use
+TOKEN_USER_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser', 'is_admin')
+
+
+class TokenError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+def access_lifetime():
+    return getattr(settings, 'ACCESS_TOKEN_LIFETIME', 300)
+
+
+def refresh_lifetime():
+    return getattr(settings, 'REFRESH_TOKEN_LIFETIME', 14 * 24 * 3600)
+
+
+def bearer_token(request):
+    """The token of an ``Authorization: Bearer`` header, else None."""
+    scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'bearer':
+        return None
+    return token.strip() or None
+
+
+# ===== Revocation state =====
+class RevocationCache:
+    """LRU of session id -> active, each entry trusted for `ttl` seconds."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            self._entries.move_to_end(session_id)
+            return entry[0]
+
+    def set(self, session_id, active):
+        ttl = getattr(settings, 'TOKEN_REVOCATION_CACHE_SECONDS', 30)
+        size = getattr(settings, 'TOKEN_REVOCATION_CACHE_SIZE', 10000)
+        with self._lock:
+            self._entries[session_id] = (active, time.monotonic() + ttl)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+revocations = RevocationCache()
+
+
+def _active_sessions(session_id):
+    return TokenSession.objects.filter(pk=session_id, revoked_at=None)
+
+
+def session_active(session_id):
+    active = revocations.get(session_id)
+    if active is None:
+        active = _active_sessions(session_id).exists()
+        revocations.set(session_id, active)
+    return active
+
+
+async def asession_active(session_id):
+    active = revocations.get(session_id)
+    if active is None:
+        active = await _active_sessions(session_id).aexists()
+        revocations.set(session_id, active)
+    return active
+
+
+# ===== Issuing =====
+def _load(token, salt, max_age):
+    if not isinstance(token, str):
+        raise TokenError('Token is invalid', 'token_invalid')
+    try:
+        return signing.loads(token, salt=salt, max_age=max_age)
+    except signing.SignatureExpired:
+        raise TokenError('Token has expired', 'token_expired')
+    except signing.BadSignature:
+        raise TokenError('Token is invalid', 'token_invalid')
+
+
+def _pair(user, session_id, generation):
+    access = {'sid': session_id, 'user': [getattr(user, name) for name in TOKEN_USER_FIELDS]}
+    return {
+        'access': signing.dumps(access, salt=ACCESS_SALT),
+        'refresh': signing.dumps({'sid': session_id, 'gen': generation}, salt=REFRESH_SALT),
+        'token_type': 'Bearer',
+        'expires_in': access_lifetime(),
+    }
+
+
+def issue_tokens(user):
+    """Start a token session for `user`; returns the access / refresh pair."""
+    session = TokenSession.objects.create(
+        user=user, expires_at=timezone.now() + timedelta(seconds=refresh_lifetime()),
+    )
+    revocations.set(session.pk, True)
+    return _pair(user, session.pk, 0)
+
+
+def refresh_tokens(refresh):
+    """Rotate `refresh` into a new pair; reusing an old refresh token ends the session."""
+    payload = _load(refresh, REFRESH_SALT, refresh_lifetime())
+    session_id, generation = payload['sid'], payload['gen']
+    rotated = (
+        _active_sessions(session_id)
+        .filter(generation=generation, expires_at__gt=timezone.now())
+        .update(generation=F('generation') + 1)
+    )
+    if not rotated:
+        revoke_sessions(_active_sessions(session_id))
+        raise TokenError('Refresh token is no longer valid', 'token_revoked')
+
+    # Reload the user: flags and is_active may have changed since login
+    user = User.objects.get(token_sessions=session_id)
+    if not user.is_active:
+        revoke_sessions(_active_sessions(session_id))
+        raise TokenError('User is inactive', 'token_revoked')
+    return _pair(user, session_id, generation + 1)
+
+
+# ===== Revoking =====
+def revoke_sessions(sessions):
+    """Revoke the active sessions in the `sessions` queryset; returns how many."""
+    ids = list(sessions.values_list('id', flat=True))
+    TokenSession.objects.filter(pk__in=ids).update(revoked_at=timezone.now())
+    for session_id in ids:
+        revocations.set(session_id, False)
+    return len(ids)
+
+
+def revoke_token(refresh):
+    """Log out: end the session `refresh` belongs to (and its access tokens)."""
+    payload = _load(refresh, REFRESH_SALT, refresh_lifetime())
+    revoke_sessions(_active_sessions(payload['sid']))
+
+
+def revoke_user_tokens(user):
+    """End every token session of `user`; returns how many were active."""
+    return revoke_sessions(TokenSession.objects.filter(user=user, revoked_at=None))
+
+
+# ===== Verifying =====
+def token_user(payload):
+    """The user an access token names, built without a query."""
+    values = dict(zip(TOKEN_USER_FIELDS, payload['user']))
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+def authenticate_token(token):
+    payload = _load(token, ACCESS_SALT, access_lifetime())
+    if not session_active(payload['sid']):
+        raise TokenError('Token has been revoked', 'token_revoked')
+    return token_user(payload)
+
+
+async def aauthenticate_token(token):
+    payload = _load(token, ACCESS_SALT, access_lifetime())
+    if not await asession_active(payload['sid']):
+        raise TokenError('Token has been revoked', 'token_revoked')
+    return token_user(payload)
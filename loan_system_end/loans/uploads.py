@@ -0,0 +1,83 @@
+# loans/uploads.py
+"""
+Streaming image uploads.
+
+Multipart file parts go through Django's upload handlers, which spool
+them to memory or a temp file in chunks; ImageLimitUploadHandler sits in
+front of them and rejects oversized bodies, oversized images and
+non-image content before anything is buffered.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException, UnsupportedMediaType
+from rest_framework.parsers import MultiPartParser
+
+IMAGE_FIELDS = {'profile_photo', 'sponsor_photo'}
+
+# Leading bytes of each accepted format
+IMAGE_SIGNATURES = {
+    'image/jpeg': (b'\xff\xd8\xff',),
+    'image/png': (b'\x89PNG\r\n\x1a\n',),
+    'image/webp': (b'RIFF',),
+}
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Upload too large.'
+    default_code = 'upload_too_large'
+
+
+def max_image_size():
+    return getattr(settings, 'MAX_IMAGE_UPLOAD_SIZE', 5 * 1024 * 1024)
+
+
+def sniff_image_type(head):
+    """Return the image content type matching the first bytes, or None."""
+    for content_type, signatures in IMAGE_SIGNATURES.items():
+        if head.startswith(signatures):
+            if content_type == 'image/webp' and head[8:12] != b'WEBP':
+                continue
+            return content_type
+    return None
+
+
+class ImageLimitUploadHandler(FileUploadHandler):
+    """Enforce body size, image size and image type while streaming."""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        limit = getattr(settings, 'MAX_MULTIPART_BODY_SIZE', 2 * max_image_size() + 1024 * 1024)
+        if content_length and content_length > limit:
+            raise UploadTooLarge(f'Request body exceeds {limit} bytes.')
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.checked = field_name not in IMAGE_FIELDS
+        if not self.checked and content_type not in IMAGE_SIGNATURES:
+            raise UnsupportedMediaType(content_type, f'{field_name} must be a JPEG, PNG or WebP image.')
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.checked:
+            return raw_data
+        self.received += len(raw_data)
+        if self.received > max_image_size():
+            raise UploadTooLarge(f'{self.field_name} exceeds {max_image_size()} bytes.')
+        if start == 0 and sniff_image_type(raw_data[:16]) is None:
+            raise UnsupportedMediaType(self.content_type, f'{self.field_name} is not a valid image.')
+        return raw_data
+
+    def file_complete(self, file_size):
+        # Let the next handler (memory / temp file) build the UploadedFile
+        return None
+
+
+class ImageMultiPartParser(MultiPartParser):
+    """MultiPartParser with ImageLimitUploadHandler in front of the defaults."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']._request
+        if not any(isinstance(h, ImageLimitUploadHandler) for h in request.upload_handlers):
+            request.upload_handlers = [ImageLimitUploadHandler(request)] + list(request.upload_handlers)
+        return super().parse(stream, media_type, parser_context)
@@ -1,13 +1,39 @@
-from django.urls import path, include
+from django.urls import path, include, URLPattern
 from rest_framework import routers
-from . import views
+from . import async_views, views
 
 router = routers.DefaultRouter()
 router.register(r'users', views.UserViewSet)
 router.register(r'loans', views.LoanApplicationViewSet)
 router.register(r'payments', views.PaymentViewSet)
 
+# Hot GET endpoints served by async views; the DRF view stays behind them
+# for writes, the browsable API and basic auth
+ASYNC_READS = {
+    'loanapplication-list': async_views.loan_list,
+    'loanapplication-detail': async_views.loan_detail,
+    'payment-list': async_views.payment_list,
+}
+
+
+def with_async_reads(patterns):
+    routed = []
+    for pattern in patterns:
+        reader = ASYNC_READS.get(pattern.name)
+        # Leave the .json / .api suffix routes to DRF
+        if reader and 'format' not in pattern.pattern.regex.groupindex:
+            pattern = URLPattern(pattern.pattern, async_views.read_route(pattern.callback, reader),
+                                 pattern.default_args, pattern.name)
+        routed.append(pattern)
+    return routed
+
+
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(with_async_reads(router.urls))),
     path('register-apply/', views.register_and_apply, name='register-apply'),
+    path('token/', views.token_obtain, name='token'),
+    path('token/refresh/', views.token_refresh, name='token-refresh'),
+    path('token/revoke/', views.token_revoke, name='token-revoke'),
+    path('analytics/', views.portfolio_analytics, name='analytics'),
+    path('events/', async_views.event_stream, name='events'),
 ]
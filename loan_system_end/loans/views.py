@@ -1,38 +1,100 @@
 # loans/views.py
+import codecs
+from datetime import date
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch, Sum
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.middleware.csrf import get_token
 from django.contrib.auth import authenticate, login
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_safe
 
 from rest_framework import viewsets, permissions, status, serializers
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 
-from .models import User, LoanApplication, Payment
+from .models import User, LoanApplication, Installment, Payment, PortfolioSummary
 from .serializers import (
     UserSerializer,
     UserCreateSerializer,
     LoanApplicationSerializer,
+    LoanApplicationWithPaymentsSerializer,
     PaymentSerializer,
+    PaymentHistorySerializer,
     RegisterAndApplySerializer,
+    InstallmentSerializer,
+    ApprovalSerializer,
+    BulkDecisionSerializer,
+    SponsorExposureSerializer,
 )
+from .amortization import DecisionError, approve_loan, decide_loans
+from .cache import CachedResponseMixin
+from .exposure import sponsor_exposures
+from .ledger import IdempotencyConflict, PaymentRejected, payment_history, post_payment, reverse_payment
+from .ingest import UndecodableFile, detect_format, ingest_payments, iter_rows
+from .export import CONTENT_TYPES, LOAN_COLUMNS, PAYMENT_COLUMNS, aiter_chunks, export_stream
+from .hashing import HashingBusy
 from .permissions import IsOwnerOrAdmin
+from .fieldsets import SparseFieldsetMixin, narrow, selected_fields
+from .filters import LoanFilterBackend, filter_loans
+from .pagination import LoanCursorPagination, PaymentHistoryPagination, SearchPagination
+from .renderers import FastJSONRenderer
+from .rows import ValuesSerializer
+from .routers import on_replica, replica_reads
+from .search import loan_matches, user_matches
+from .tokens import TokenError, issue_tokens, refresh_tokens, revoke_token
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    """JSON rendered exactly like DRF's JSONRenderer, for plain Django views."""
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
 
 
 # ================= Home view =================
 @ensure_csrf_cookie
-def home(request):
+async def home(request):
     """Redirect to frontend home page"""
     return redirect("http://localhost:5173")
 
 
 # ================= CSRF Token =================
-@api_view(['GET'])
-@permission_classes([permissions.AllowAny])
-def get_csrf_token(request):
+@require_safe
+async def get_csrf_token(request):
     """Return CSRF token for frontend"""
     token = get_token(request)
-    return Response({'csrfToken': token})
+    return json_response({'csrfToken': token})
+
+
+# ================= Auth helpers =================
+# Credentials are checked by authenticate(); loans.hashing.PooledModelBackend
+# does the hashing on the bounded pool
+MODEL_BACKEND = 'loans.hashing.PooledModelBackend'
+
+
+def user_payload(request, user):
+    """The user as returned by login and registration."""
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'phone': user.phone,
+        'address': user.address,
+        'profile_photo': request.build_absolute_uri(user.profile_photo.url) if user.profile_photo else None,
+        'is_admin': user.is_staff or user.is_superuser,
+        'is_superuser': user.is_superuser,
+        'is_staff': user.is_staff,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+    }
+
+
+def hashing_busy_response():
+    response = Response({'error': 'Server busy, please retry'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = '1'
+    return response
 
 
 # ================= Login =================
@@ -46,50 +108,88 @@ def user_login(request):
         return Response({'error': 'Username and password are required'},
                         status=status.HTTP_400_BAD_REQUEST)
 
-    user = authenticate(request, username=username, password=password)
+    try:
+        user = authenticate(request, username=username, password=password)
+    except HashingBusy:
+        return hashing_busy_response()
     if not user:
         return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 
     login(request, user)
 
-    user_data = {
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'phone': user.phone,
-        'address': user.address,
-        'profile_photo': request.build_absolute_uri(user.profile_photo.url) if user.profile_photo else None,
-        'is_admin': user.is_staff or user.is_superuser,
-        'is_superuser': user.is_superuser,
-        'is_staff': user.is_staff,
-        'first_name': user.first_name,
-        'last_name': user.last_name,
-    }
+    user_data = user_payload(request, user)
 
     return Response({'message': 'Login successful', 'user': user_data})
 
 
+# ================= API tokens =================
+# Bearer tokens for the SPA (loans.tokens). No session is read or written,
+# so these need no CSRF token either.
+def token_error_response(exc):
+    return Response({'error': str(exc), 'code': exc.code}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def token_obtain(request):
+    """Trade username / password for an access and a refresh token."""
+    username = request.data.get('username')
+    password = request.data.get('password')
+    if not username or not password:
+        return Response({'error': 'Username and password are required'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        user = authenticate(request, username=username, password=password)
+    except HashingBusy:
+        return hashing_busy_response()
+    if not user:
+        return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response({**issue_tokens(user), 'user': user_payload(request, user)})
+
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def token_refresh(request):
+    """Rotate a refresh token into a new access / refresh pair."""
+    refresh = request.data.get('refresh')
+    if not refresh or not isinstance(refresh, str):
+        return Response({'error': 'refresh is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        return Response(refresh_tokens(refresh))
+    except TokenError as exc:
+        return token_error_response(exc)
+
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def token_revoke(request):
+    """Log out: revoke a refresh token and every access token issued with it."""
+    refresh = request.data.get('refresh')
+    if not refresh or not isinstance(refresh, str):
+        return Response({'error': 'refresh is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        revoke_token(refresh)
+    except TokenError as exc:
+        return token_error_response(exc)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 # ================= User Registration =================
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def user_register(request):
     serializer = UserCreateSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    user = serializer.save()
+    try:
+        user = serializer.save()
+    except HashingBusy:
+        return hashing_busy_response()
 
-    user_data = {
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'phone': user.phone,
-        'address': user.address,
-        'profile_photo': request.build_absolute_uri(user.profile_photo.url) if user.profile_photo else None,
-        'is_admin': user.is_staff or user.is_superuser,
-        'is_superuser': user.is_superuser,
-        'is_staff': user.is_staff,
-        'first_name': user.first_name,
-        'last_name': user.last_name,
-    }
+    user_data = user_payload(request, user)
 
     return Response({'message': 'User created successfully', 'user': user_data}, status=status.HTTP_201_CREATED)
 
@@ -100,79 +200,392 @@ def user_register(request):
 def register_and_apply(request):
     serializer = RegisterAndApplySerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    result = serializer.save()
-
-    # Auto-login
-    user = authenticate(request, username=request.data.get('username'), password=request.data.get('password'))
-    if user:
-        login(request, user)
-
-    user_data = {
-        'id': result['user'].id,
-        'username': result['user'].username,
-        'email': result['user'].email,
-        'phone': result['user'].phone,
-        'address': result['user'].address,
-        'profile_photo': request.build_absolute_uri(result['user'].profile_photo.url) if result['user'].profile_photo else None,
-        'is_admin': result['user'].is_staff or result['user'].is_superuser,
-        'is_superuser': result['user'].is_superuser,
-        'is_staff': result['user'].is_staff,
-        'first_name': result['user'].first_name,
-        'last_name': result['user'].last_name,
-    }
+    try:
+        result = serializer.save()
+    except HashingBusy:
+        return hashing_busy_response()
+
+    # Auto-login: the user was just created from these credentials, so
+    # there is nothing to verify (and no second PBKDF2 run)
+    login(request, result['user'], backend=MODEL_BACKEND)
+
+    user_data = user_payload(request, result['user'])
 
     loan_data = LoanApplicationSerializer(result['loan_application'], context={'request': request}).data
     if result['loan_application'].sponsor_photo:
         loan_data['sponsor_photo'] = request.build_absolute_uri(result['loan_application'].sponsor_photo.url)
 
-    return Response({'user': user_data, 'loan_application': loan_data}, status=status.HTTP_201_CREATED)
+    return Response({'user': user_data, 'loan_application': loan_data, 'tokens': issue_tokens(result['user'])},
+                    status=status.HTTP_201_CREATED)
+
+
+# ================= Analytics =================
+ANALYTICS_GROUPS = ('status', 'loan_type', 'month')
+ANALYTICS_MEASURES = ('loan_count', 'requested_total', 'approved_total', 'amount_paid_total', 'outstanding_total')
+
+
+def _month_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        year, month = (int(part) for part in value.split('-')[:2])
+        return date(year, month, 1)
+    except ValueError:
+        raise serializers.ValidationError({name: 'Use YYYY-MM'})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def portfolio_analytics(request):
+    """Portfolio totals read from PortfolioSummary (one row per bucket).
+
+    ?group_by=status,loan_type,month (any subset), filtered by ?status,
+    ?loan_type, ?month_from and ?month_to (YYYY-MM).
+    """
+    group_by = [g for g in request.query_params.get('group_by', ','.join(ANALYTICS_GROUPS)).split(',') if g]
+    if not set(group_by) <= set(ANALYTICS_GROUPS):
+        return Response({'error': f"group_by must use {', '.join(ANALYTICS_GROUPS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    queryset = PortfolioSummary.objects.all()
+    for field in ('status', 'loan_type'):
+        if request.query_params.get(field):
+            queryset = queryset.filter(**{f'{field}__in': request.query_params[field].split(',')})
+    month_from = _month_param(request, 'month_from')
+    month_to = _month_param(request, 'month_to')
+    if month_from:
+        queryset = queryset.filter(month__gte=month_from)
+    if month_to:
+        queryset = queryset.filter(month__lte=month_to)
+
+    sums = {measure: Sum(measure) for measure in ANALYTICS_MEASURES}
+    with replica_reads():
+        buckets = list(queryset.values(*group_by).annotate(**sums).order_by(*group_by)) if group_by else []
+        totals = queryset.aggregate(**sums)
+    return Response({'group_by': group_by, 'buckets': buckets, 'totals': totals})
+
+
+# ================= Exports =================
+def export_response(request, queryset, columns, basename):
+    """Stream `queryset` as ?output=csv|ndjson, gzipped when ?gzip=1."""
+    fmt = request.query_params.get('output', 'csv')
+    if fmt not in CONTENT_TYPES:
+        return Response({'error': 'output must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+    compress = request.query_params.get('gzip') in ('1', 'true')
+
+    chunks = export_stream(queryset, columns, fmt, compress)
+    if isinstance(request._request, ASGIRequest):
+        chunks = aiter_chunks(chunks)  # a sync iterator would be buffered whole
+    response = StreamingHttpResponse(
+        chunks,
+        content_type='application/gzip' if compress else CONTENT_TYPES[fmt],
+    )
+    filename = f"{basename}.{fmt}" + ('.gz' if compress else '')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# ================= Read querysets =================
+# Shared by the viewsets and the async read views (async_views.py)
+def is_admin(user):
+    return user.is_staff or user.is_superuser
+
+
+def visible_loans(user):
+    queryset = LoanApplication.objects.all()
+    if not is_admin(user):
+        queryset = queryset.filter(applicant_id=user.id)
+    return queryset
+
+
+def shows_exposure(user, fields):
+    """Admins reviewing a loan see its sponsor's exposure alongside the sponsor fields."""
+    return is_admin(user) and (fields is None or 'sponsor_national_id' in fields)
+
+
+def exposure_data(exposures, loan):
+    exposure = exposures.get(loan.sponsor_national_id)
+    return SponsorExposureSerializer(exposure).data if exposure else None
+
+
+def with_exposure(data, loans):
+    """Add each loan's ``sponsor_exposure`` to its serialized `data` (one indexed read)."""
+    exposures = sponsor_exposures([loan.sponsor_national_id for loan in loans])
+    for row, loan in zip(data, loans):
+        row['sponsor_exposure'] = exposure_data(exposures, loan)
+    return data
+
+
+def includes_payments(params):
+    return 'payments' in params.get('include', '').split(',')
+
+
+def loan_read_queryset(user, params):
+    queryset = visible_loans(user)
+    if includes_payments(params):
+        # One extra query for every loan on the page
+        queryset = queryset.prefetch_related(
+            Prefetch('payments', queryset=Payment.objects.order_by('date', 'id'))
+        )
+    return queryset
+
+
+# Read by the views whatever fields are serialized: the cursor, object permissions
+# Every column any ?ordering= of the list pages on, the id tiebreaker included
+LOAN_CURSOR_COLUMNS = tuple(dict.fromkeys(
+    field.lstrip('-') for ordering in LoanCursorPagination.orderings.values() for field in ordering
+))
+LOAN_REQUIRED_COLUMNS = ('applicant', *LOAN_CURSOR_COLUMNS)
+PAYMENT_REQUIRED_COLUMNS = ('loan', 'loan__applicant')
+
+
+def loan_serializer_class(params):
+    if includes_payments(params):
+        return LoanApplicationWithPaymentsSerializer
+    return LoanApplicationSerializer
+
+
+def loan_list_rows(params):
+    """
+    ValuesSerializer for list pages without nested payments (None with
+    them): rows come from values(), not model instances.
+    """
+    if includes_payments(params):
+        return None
+    return ValuesSerializer(LoanApplicationSerializer, selected_fields(LoanApplicationSerializer, params))
+
+
+def loan_list_values(queryset, rows):
+    return queryset.values(*dict.fromkeys([*rows.columns, *LOAN_CURSOR_COLUMNS]))
+
+
+def visible_payments(user, with_loan=False):
+    queryset = Payment.objects.all()
+    if not is_admin(user):
+        queryset = queryset.filter(loan__applicant_id=user.id)
+    if with_loan:
+        # IsOwnerOrAdmin reads payment.loan.applicant_id
+        queryset = queryset.select_related('loan')
+    return queryset
+
+
+# ================= Search =================
+def search_query(params):
+    query = params.get('q', '').strip()
+    if not query:
+        raise serializers.ValidationError({'q': 'This parameter is required.'})
+    return query
+
+
+def search_response(request, serializer_class, matches):
+    """A page of ranked matches (loans.search), each row tagged with how it matched."""
+    fields = selected_fields(serializer_class, request.query_params)
+    matches = [(label, narrow(queryset, serializer_class, fields, [key]), key) for label, queryset, key in matches]
+    paginator = SearchPagination()
+    with replica_reads():
+        page = paginator.paginate_matches(matches, request)
+    data = serializer_class([obj for *_, obj in page], many=True, fields=fields, context={'request': request}).data
+    for row, (_, label, _, _) in zip(data, page):
+        row['match'] = label
+    return paginator.get_paginated_response(data)
 
 
 # ================= DRF ViewSets =================
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]  # Only admin/staff
 
-    def list(self, request, *args, **kwargs):
-        # Debug: print request user
-        print("User making request:", request.user, "is_staff:", request.user.is_staff)
-        return super().list(request, *args, **kwargs)
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Users by exact national ID, phone or username, or name / surname prefix (?q=)."""
+        matches = user_matches(User.objects.all(), search_query(request.query_params))
+        return search_response(request, UserSerializer, matches)
 
 
-class LoanApplicationViewSet(viewsets.ModelViewSet):
+class LoanApplicationViewSet(CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = LoanApplication.objects.all()
     serializer_class = LoanApplicationSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
+    filter_backends = [LoanFilterBackend]
+    pagination_class = LoanCursorPagination
+    fieldset_required = LOAN_REQUIRED_COLUMNS
 
     def get_queryset(self):
-        user = self.request.user
-        if user.is_staff or user.is_superuser:
-            return LoanApplication.objects.all()
-        return LoanApplication.objects.filter(applicant=user)
+        return loan_read_queryset(self.request.user, self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        rows = loan_list_rows(request.query_params)
+        with replica_reads():
+            if rows is None:
+                return super().list(request, *args, **kwargs)
+            return self._cached_or(self.list_rows, request, rows)
+
+    def list_rows(self, request, rows):
+        queryset = loan_list_values(self.filter_queryset(self.get_queryset()), rows)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(rows.serialize(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_or(self.retrieve_loan, request, *args, **kwargs)
+
+    def retrieve_loan(self, request, *args, **kwargs):
+        loan = self.get_object()
+        data = self.get_serializer(loan).data
+        if shows_exposure(request.user, self.get_fieldset()):
+            with_exposure([data], [loan])
+        return Response(data)
+
+    def get_serializer_class(self):
+        return loan_serializer_class(self.request.query_params)
 
     def perform_create(self, serializer):
         serializer.save(applicant=self.request.user)
 
-
-class PaymentViewSet(viewsets.ModelViewSet):
+    def perform_update(self, serializer):
+        approving = (
+            serializer.validated_data.get('status') == 'approved'
+            and serializer.instance.status != 'approved'
+        )
+        loan = serializer.save()
+        if approving:
+            # Payment figures always come from the server-side schedule
+            approve_loan(loan, loan.approved_amount, loan.interest_rate, loan.term)
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def approve(self, request, pk=None):
+        """Approve a pending loan and return it with its stored schedule and sponsor exposure."""
+        loan = self.get_object()
+        if loan.status != 'pending':
+            return Response({'error': f'Loan is {loan.status}, not pending'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        terms = ApprovalSerializer(data=request.data)
+        terms.is_valid(raise_exception=True)
+        loan = approve_loan(loan, **terms.validated_data)
+
+        data = LoanApplicationSerializer(loan, context=self.get_serializer_context()).data
+        data['schedule'] = InstallmentSerializer(loan.installments.order_by('number'), many=True).data
+        return Response(with_exposure([data], [loan])[0])
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def decisions(self, request):
+        """
+        Approve / reject many pending loans at once:
+        ``{"decisions": [{"id", "status", "approved_amount"?, "interest_rate"?, "term"?}]}``.
+        All-or-nothing; returns only the changed loans, with their sponsors'
+        exposure after the batch.
+        """
+        batch = BulkDecisionSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        try:
+            loans = decide_loans(batch.validated_data['decisions'])
+        except DecisionError as exc:
+            return Response({'errors': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        data = LoanApplicationSerializer(loans, many=True, context=self.get_serializer_context()).data
+        return Response(with_exposure(data, loans))
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Loans by applicant national ID / phone, sponsor national ID or applicant name prefix (?q=)."""
+        matches = loan_matches(visible_loans(request.user), search_query(request.query_params))
+        return search_response(request, LoanApplicationSerializer, matches)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream every matching loan; accepts the same filters as the list."""
+        queryset = filter_loans(visible_loans(request.user), request.query_params).order_by('created_at', 'id')
+        return export_response(request, on_replica(queryset), LOAN_COLUMNS, 'loans')
+
+    @action(detail=True, methods=['get'], pagination_class=PaymentHistoryPagination)
+    def payments(self, request, pk=None):
+        """The loan's payments, newest first and cursor paged, each with the balance left after it."""
+        loan = self.get_object()
+        fields = selected_fields(PaymentHistorySerializer, request.query_params)
+        paginator = self.paginator
+        payments = Payment.objects.filter(loan_id=loan.id)
+        with replica_reads():
+            page = paginator.page_queryset(payments, request)
+            history = narrow(payment_history(page, paginator.preceding(payments)),
+                             PaymentHistorySerializer, fields, ['date'])
+            rows = paginator.finish_page(list(history))
+        data = PaymentHistorySerializer(rows, many=True, fields=fields, context=self.get_serializer_context()).data
+        return paginator.get_paginated_response(data)
+
+    @action(detail=True, methods=['get'])
+    def schedule(self, request, pk=None):
+        """Stored installment schedule of a loan."""
+        loan = self.get_object()
+        installments = Installment.objects.filter(loan_id=loan.id).order_by('number')
+        return Response(InstallmentSerializer(installments, many=True).data)
+
+
+IDEMPOTENCY_KEY_LENGTH = Payment._meta.get_field('idempotency_key').max_length
+
+
+class PaymentViewSet(CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
+    fieldset_required = PAYMENT_REQUIRED_COLUMNS
+    # Payments are ledger entries: posted or reversed, never edited
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
 
     def get_queryset(self):
-        user = self.request.user
-        if user.is_staff or user.is_superuser:
-            return Payment.objects.all()
-        return Payment.objects.filter(loan__applicant=user)
+        return visible_payments(self.request.user, with_loan=self.action != 'list')
 
-    def perform_create(self, serializer):
-        loan_id = self.request.data.get('loan')
+    def list(self, request, *args, **kwargs):
+        with replica_reads():
+            return super().list(request, *args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        loans = visible_loans(request.user)
+        key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        if key and len(key) > IDEMPOTENCY_KEY_LENGTH:
+            raise serializers.ValidationError(
+                {'idempotency_key': f"Ensure this field has no more than {IDEMPOTENCY_KEY_LENGTH} characters."}
+            )
         try:
-            if self.request.user.is_staff or self.request.user.is_superuser:
-                loan = LoanApplication.objects.get(id=loan_id)
-            else:
-                loan = LoanApplication.objects.get(id=loan_id, applicant=self.request.user)
-            serializer.save(loan=loan)
+            payment, created = post_payment(data['loan'].id, data['amount'], data['phone'], key, loans=loans)
         except LoanApplication.DoesNotExist:
             raise serializers.ValidationError("Loan not found or permission denied")
+        except PaymentRejected as exc:
+            raise serializers.ValidationError({'amount': [str(exc)]})
+        except IdempotencyConflict as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+
+        return Response(
+            self.get_serializer(payment).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    def perform_destroy(self, instance):
+        reverse_payment(instance)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream every payment visible to the caller."""
+        queryset = self.get_queryset().order_by('date', 'id')
+        return export_response(request, on_replica(queryset), PAYMENT_COLUMNS, 'payments')
+
+    @action(detail=False, methods=['post'], url_path='bulk',
+            permission_classes=[permissions.IsAdminUser], parser_classes=[MultiPartParser])
+    def bulk(self, request):
+        """Ingest a settlement file uploaded as multipart field `file`."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload a CSV or NDJSON file as "file"'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.data.get('format') or detect_format(upload.name)
+        # Iterating the upload yields lines without reading it all at once
+        lines = codecs.iterdecode(upload, 'utf-8-sig')
+        try:
+            report = ingest_payments(iter_rows(lines, fmt))
+        except UndecodableFile as exc:
+            return Response(dict(exc.report.as_dict(max_errors=1000), error=str(exc)),
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict(max_errors=1000))